@@ -0,0 +1,227 @@
+# functions/announcement_store.py
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from dotenv import load_dotenv
+
+# --------------------------------------------------------------------
+# CONFIG
+# --------------------------------------------------------------------
+
+load_dotenv()
+
+ANNOUNCEMENT_DB = os.getenv("ANNOUNCEMENT_DB", "./downloads/announcements.sqlite")
+
+# Database file whose schema has been set up by this process; SQLite (WAL +
+# busy timeout) handles concurrent access to the database itself
+_schema_lock = threading.Lock()
+_schema_ready_for: Optional[str] = None
+
+
+# --------------------------------------------------------------------
+# STORAGE
+# --------------------------------------------------------------------
+
+def _ensure_schema(conn: sqlite3.Connection):
+    global _schema_ready_for
+    if _schema_ready_for == ANNOUNCEMENT_DB:
+        return
+    with _schema_lock:
+        if _schema_ready_for == ANNOUNCEMENT_DB:
+            return
+        # WAL lets readers run alongside a writer
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS announcements (
+                scripcode TEXT NOT NULL,
+                news_id TEXT NOT NULL,
+                news_ts REAL NOT NULL,
+                has_pdf INTEGER NOT NULL,
+                row_json TEXT NOT NULL,
+                PRIMARY KEY (scripcode, news_id)
+            )
+            """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS announcements_by_time "
+            "ON announcements (scripcode, news_ts DESC)"
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sync_state (
+                scripcode TEXT PRIMARY KEY,
+                newest_ts REAL,
+                covered_from_ts REAL NOT NULL,
+                synced_at REAL NOT NULL
+            )
+            """
+        )
+        _schema_ready_for = ANNOUNCEMENT_DB
+
+
+def _connect() -> sqlite3.Connection:
+    db_dir = os.path.dirname(ANNOUNCEMENT_DB)
+    if db_dir:
+        os.makedirs(db_dir, exist_ok=True)
+    conn = sqlite3.connect(ANNOUNCEMENT_DB, timeout=30)
+    _ensure_schema(conn)
+    return conn
+
+
+@contextmanager
+def _db():
+    conn = _connect()
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def parse_news_dt(row: Dict[str, Any]) -> Optional[datetime]:
+    """
+    NEWS_DT as a naive datetime (BSE sends e.g. "2024-05-10T18:30:12.44").
+    """
+    dt_str = row.get("NEWS_DT") or ""
+    try:
+        dt = datetime.fromisoformat(dt_str.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return dt.replace(tzinfo=None)
+
+
+def news_id(row: Dict[str, Any]) -> str:
+    """
+    BSE NEWSID when present, otherwise a hash of the identifying fields.
+    """
+    if row.get("NEWSID"):
+        return str(row["NEWSID"])
+    raw = "|".join(
+        str(row.get(k) or "") for k in ("NEWS_DT", "ATTACHMENTNAME", "HEADLINE", "NEWSSUB")
+    )
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def has_pdf(row: Dict[str, Any]) -> bool:
+    return (row.get("ATTACHMENTNAME") or "").lower().endswith(".pdf")
+
+
+# --------------------------------------------------------------------
+# PUBLIC API
+# --------------------------------------------------------------------
+
+def get_sync_state(scripcode: str) -> Optional[Dict[str, Any]]:
+    """
+    {"newest": datetime | None, "covered_from": datetime, "synced_at": float}
+    or None if the scripcode was never synced. Everything between
+    covered_from and newest is known to be in the store.
+    """
+    with _db() as conn:
+        row = conn.execute(
+            "SELECT newest_ts, covered_from_ts, synced_at FROM sync_state WHERE scripcode = ?",
+            (scripcode,),
+        ).fetchone()
+    if row is None:
+        return None
+    return {
+        "newest": datetime.fromtimestamp(row[0]) if row[0] is not None else None,
+        "covered_from": datetime.fromtimestamp(row[1]),
+        "synced_at": row[2],
+    }
+
+
+def known_ids(scripcode: str, ids: Iterable[str]) -> set:
+    ids = list(ids)
+    if not ids:
+        return set()
+    with _db() as conn:
+        rows = conn.execute(
+            f"SELECT news_id FROM announcements WHERE scripcode = ? "
+            f"AND news_id IN ({','.join('?' * len(ids))})",
+            (scripcode, *ids),
+        ).fetchall()
+    return {r[0] for r in rows}
+
+
+def save_announcements(
+    scripcode: str,
+    rows: List[Dict[str, Any]],
+    covered_from: Optional[datetime] = None,
+    gap: bool = False,
+):
+    """
+    Upsert rows and advance the sync state. `covered_from` extends the
+    known-complete range backwards (only ever moves earlier).
+
+    `gap` means the rows do not connect to the stored range (there were
+    more new rows than could be fetched): the known-complete range then
+    restarts at these rows, so the missing ones are backfilled later.
+    """
+    now = time.time()
+    records = []
+    newest = oldest = None
+    for row in rows:
+        dt = parse_news_dt(row)
+        if dt is None:
+            continue
+        records.append((scripcode, news_id(row), dt.timestamp(), int(has_pdf(row)), json.dumps(row)))
+        newest = max(newest, dt.timestamp()) if newest is not None else dt.timestamp()
+        oldest = min(oldest, dt.timestamp()) if oldest is not None else dt.timestamp()
+
+    with _db() as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO announcements "
+            "(scripcode, news_id, news_ts, has_pdf, row_json) VALUES (?, ?, ?, ?, ?)",
+            records,
+        )
+        state = conn.execute(
+            "SELECT newest_ts, covered_from_ts FROM sync_state WHERE scripcode = ?",
+            (scripcode,),
+        ).fetchone()
+
+        old_newest, old_from = state if state else (None, now)
+        if gap and oldest is not None:
+            old_newest, old_from = None, oldest
+        if newest is None or (old_newest is not None and old_newest > newest):
+            newest = old_newest
+        covered_from_ts = old_from
+        if covered_from is not None:
+            covered_from_ts = min(old_from, covered_from.timestamp())
+
+        conn.execute(
+            "INSERT OR REPLACE INTO sync_state "
+            "(scripcode, newest_ts, covered_from_ts, synced_at) VALUES (?, ?, ?, ?)",
+            (scripcode, newest, covered_from_ts, now),
+        )
+
+
+def count_pdf_rows(scripcode: str, since: datetime) -> int:
+    with _db() as conn:
+        (count,) = conn.execute(
+            "SELECT COUNT(*) FROM announcements "
+            "WHERE scripcode = ? AND news_ts >= ? AND has_pdf = 1",
+            (scripcode, since.timestamp()),
+        ).fetchone()
+    return count
+
+
+def load_announcements(scripcode: str, since: datetime) -> List[Dict[str, Any]]:
+    """
+    Stored rows for the scripcode from `since` onwards, newest first.
+    """
+    with _db() as conn:
+        rows = conn.execute(
+            "SELECT row_json FROM announcements "
+            "WHERE scripcode = ? AND news_ts >= ? ORDER BY news_ts DESC",
+            (scripcode, since.timestamp()),
+        ).fetchall()
+    return [json.loads(r[0]) for r in rows]
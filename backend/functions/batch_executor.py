@@ -0,0 +1,116 @@
+# functions/batch_executor.py
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+# --------------------------------------------------------------------
+# CONFIG
+# --------------------------------------------------------------------
+
+load_dotenv()
+
+# Max concurrent calls per upstream service, shared by every request/job
+UPSTREAM_LIMITS = {
+    "bse": int(os.getenv("UPSTREAM_LIMIT_BSE", 4)),
+    "yahoo": int(os.getenv("UPSTREAM_LIMIT_YAHOO", 8)),
+    "groq": int(os.getenv("UPSTREAM_LIMIT_GROQ", 4)),
+    "tradingview": int(os.getenv("UPSTREAM_LIMIT_TRADINGVIEW", 2)),
+}
+
+# Threads available to batch endpoints for per-symbol work
+BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", 16))
+
+_semaphores = {
+    name: threading.BoundedSemaphore(max(1, limit))
+    for name, limit in UPSTREAM_LIMITS.items()
+}
+_held = threading.local()
+
+_executor = ThreadPoolExecutor(
+    max_workers=BATCH_MAX_WORKERS,
+    thread_name_prefix="batch",
+)
+
+
+# --------------------------------------------------------------------
+# UPSTREAM CONCURRENCY LIMITS
+# --------------------------------------------------------------------
+
+@contextmanager
+def upstream_limit(name: str):
+    """
+    Hold one concurrency slot for the given upstream ("bse", "yahoo",
+    "groq", "tradingview") for the duration of the block.
+
+    Re-entrant per thread: nested blocks for the same upstream only take
+    one slot, so helpers can be composed without deadlocking.
+    """
+    held = getattr(_held, "names", None)
+    if held is None:
+        held = _held.names = set()
+
+    if name in held:
+        yield
+        return
+
+    sem = _semaphores[name]
+    sem.acquire()
+    held.add(name)
+    try:
+        yield
+    finally:
+        held.discard(name)
+        sem.release()
+
+
+# --------------------------------------------------------------------
+# BATCH EXECUTION
+# --------------------------------------------------------------------
+
+def map_concurrent(
+    fn: Callable[[Any], Any],
+    items: Iterable[Any],
+) -> List[Tuple[Any, Any, Optional[Exception]]]:
+    """
+    Run fn(item) for every item on the shared pool.
+
+    Returns [(item, result, error), ...] in input order. An exception in one
+    item is returned as its `error` and never affects the others.
+    """
+    items = list(items)
+    futures = [_executor.submit(fn, item) for item in items]
+
+    results = []
+    for item, future in zip(items, futures):
+        try:
+            results.append((item, future.result(), None))
+        except Exception as e:
+            results.append((item, None, e))
+    return results
+
+
+def iter_concurrent(
+    fn: Callable[[Any], Any],
+    items: Iterable[Any],
+) -> Iterator[Tuple[Any, Any, Optional[Exception]]]:
+    """
+    Same as map_concurrent, but yields (item, result, error) as soon as each
+    item finishes instead of waiting for the whole batch. Used for streaming.
+    """
+    futures = {_executor.submit(fn, item): item for item in items}
+    try:
+        for future in as_completed(futures):
+            item = futures.pop(future)
+            try:
+                yield item, future.result(), None
+            except Exception as e:
+                yield item, None, e
+    finally:
+        # Client went away mid-stream: drop work that has not started yet
+        for future in futures:
+            future.cancel()
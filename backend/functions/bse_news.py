@@ -1,8 +1,13 @@
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
-from io import BytesIO
+from typing import Callable, List, Dict, Any, Optional, Tuple
 import os
+import re
 import json
+import hashlib
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 from PyPDF2 import PdfReader
@@ -11,7 +16,22 @@ from dotenv import load_dotenv
 
 # 🔹 NEW: Agno + Groq (agentic summarizer)
 from agno.agent import Agent
-from agno.models.groq import Groq
+
+from .announcement_store import (
+    count_pdf_rows,
+    get_sync_state,
+    has_pdf,
+    known_ids,
+    load_announcements,
+    news_id,
+    parse_news_dt,
+    save_announcements,
+)
+from . import filing_store
+from .batch_executor import BATCH_MAX_WORKERS, UPSTREAM_LIMITS, upstream_limit
+from .groq_clients import get_groq_client, groq_model
+from .security_master import scripcode as master_scripcode, security_master
+from .summary_cache import get_summary, put_summary
 
 # --------------------------------------------------------------------
 # ENV + AGENT SETUP
@@ -23,9 +43,14 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 if not GROQ_API_KEY:
     raise RuntimeError("GROQ_API_KEY not found in environment (.env)")
 
-# Agno uses GROQ_API_KEY from env internally, we just define the model ID here.
+SUMMARY_MODEL = "llama-3.3-70b-versatile"
+# Bump when the summary prompt changes meaning; old cached summaries then miss
+# (or clear them with POST /admin/summary-cache/invalidate)
+SUMMARY_PROMPT_VERSION = "1"
+
+# Model shares the process-wide Groq client (keep-alive pool + 429 retries).
 bse_summary_agent = Agent(
-    model=Groq(id="llama-3.3-70b-versatile"),
+    model=groq_model(SUMMARY_MODEL),
     description=(
         "You summarize official BSE / stock-exchange filings and announcements for investors. "
         "You MUST NOT hallucinate or guess, and you must strictly follow the requested output format."
@@ -36,20 +61,88 @@ bse_summary_agent = Agent(
 # Ensure downloads folder exists
 os.makedirs("./downloads", exist_ok=True)
 
+# Extra PDF rows fetched beyond max_news, in case some PDFs have no text
+PDF_ROW_SLACK = 2
+
+# Filing text sent to the summarizer; extraction stops once this much is read
+SUMMARY_MAX_CHARS = 12000
+# Hard cap on a single PDF download
+PDF_MAX_BYTES = int(os.getenv("PDF_MAX_BYTES", 25 * 1024 * 1024))
+# Downloads up to this size stay in RAM, larger ones spill to a temp file
+PDF_SPOOL_BYTES = int(os.getenv("PDF_SPOOL_BYTES", 2 * 1024 * 1024))
+# Never parse more pages than this, even for image-only (textless) PDFs
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", 40))
+
+# Filings downloaded + summarized in parallel, shared by every stock and
+# request. Own pool: this runs inside batch_executor workers, so it must not
+# wait on that pool. Sized so BSE downloads and Groq calls can both use all
+# their upstream_limit slots at once; those limits are the real bound.
+FILING_WORKERS = int(os.getenv(
+    "FILING_WORKERS",
+    max(BATCH_MAX_WORKERS, UPSTREAM_LIMITS["bse"] + UPSTREAM_LIMITS["groq"]),
+))
+# Filings of one stock in flight at once, so one stock cannot take the pool
+FILING_WORKERS_PER_STOCK = max(1, int(os.getenv("FILING_WORKERS_PER_STOCK", 3)))
+_filing_executor = ThreadPoolExecutor(
+    max_workers=max(1, FILING_WORKERS),
+    thread_name_prefix="filing",
+)
+
+_bse_lock = threading.Lock()
+_bse_client: Optional[BSE] = None
+
+# Scripcodes resolved over the network (identifier -> (code or None, time))
+SCRIPCODE_MISS_TTL = int(os.getenv("SCRIPCODE_MISS_TTL", 3600))
+_scripcode_lock = threading.Lock()
+_scripcode_cache: Dict[str, Tuple[Optional[str], float]] = {}
+
 
 # --------------------------------------------------------------------
 # PDF FETCH + TEXT EXTRACTION
 # --------------------------------------------------------------------
 
-def get_pdf_text_from_attachment(attach_name: str) -> tuple[str, str]:
+def get_pdf_text_from_attachment(
+    attach_name: str,
+    max_chars: int = SUMMARY_MAX_CHARS,
+) -> tuple[str, str]:
     """
     Given an ATTACHMENTNAME from BSE (e.g. 'abcd1234.pdf'),
-    try downloading from AttachLive, then AttachHis, and
     return (raw_text, final_url_used).
+
+    Attachment names are immutable, so results live in the filing store
+    (filing_store.py): stored text is returned without network or parsing,
+    a stored PDF is re-parsed only when a larger text budget is asked for,
+    and only unknown attachments are downloaded.
     """
     if not attach_name:
         return "", ""
 
+    cached = filing_store.get_text(attach_name, max_chars)
+    if cached is not None:
+        return cached["text"], cached["url"]
+
+    stored = filing_store.get_pdf(attach_name)
+    if stored is not None:
+        with open(stored["path"], "rb") as pdf_file:
+            text, complete = _extract_pdf_text(pdf_file, max_chars)
+        url = stored["url"]
+    else:
+        text, complete, url = _download_pdf_text(attach_name, max_chars)
+
+    filing_store.put_text(attach_name, url, text, max_chars, complete)
+    return text, url
+
+
+def _download_pdf_text(attach_name: str, max_chars: int) -> Tuple[str, bool, str]:
+    """
+    Try AttachLive, then AttachHis (or the location that worked before
+    first), store the PDF and return (text, complete, url).
+
+    Memory and CPU stay bounded whatever the filing size: the download is
+    streamed into a spooled temp file (RAM up to PDF_SPOOL_BYTES, then disk)
+    and aborted past PDF_MAX_BYTES, and pages are extracted lazily only
+    until `max_chars` of text (or PDF_MAX_PAGES pages) have been read.
+    """
     headers = {
         "User-Agent": (
             "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
@@ -64,67 +157,95 @@ def get_pdf_text_from_attachment(attach_name: str) -> tuple[str, str]:
         "https://www.bseindia.com/xml-data/corpfiling/AttachLive/",
         "https://www.bseindia.com/xml-data/corpfiling/AttachHis/",
     ]
+    known_url = filing_store.get_url(attach_name)
+    if known_url:
+        base_paths.sort(key=lambda base: not known_url.startswith(base))
 
     last_status = None
     last_url = None
-    resp_content = None
-    final_url = ""
 
     for base in base_paths:
         url = base + attach_name
         last_url = url
 
-        resp = requests.get(url, headers=headers, timeout=30)
-        last_status = resp.status_code
+        # The BSE slot covers the request and body only; storing and parsing
+        # happen after it is released so they never hold up other downloads
+        with upstream_limit("bse"), requests.get(
+            url, headers=headers, timeout=30, stream=True
+        ) as resp:
+            last_status = resp.status_code
+            if resp.status_code != 200:
+                continue  # 403 / 404 / other: try the next location
+            pdf_file = _download_to_spool(resp, url)
+
+        with pdf_file:
+            filing_store.put_pdf(attach_name, url, pdf_file)
+            text, complete = _extract_pdf_text(pdf_file, max_chars)
+            return text, complete, url
+
+    raise RuntimeError(
+        f"Could not fetch PDF after trying live & history. "
+        f"Last HTTP status: {last_status}, URL: {last_url}"
+    )
 
-        if resp.status_code == 200:
-            resp_content = resp.content
-            final_url = url
-            break
-        elif resp.status_code in (403, 404):
-            continue
-        else:
-            continue
 
-    if resp_content is None:
+def _download_to_spool(resp: requests.Response, url: str) -> tempfile.SpooledTemporaryFile:
+    """
+    Stream a response body into a SpooledTemporaryFile, enforcing PDF_MAX_BYTES.
+    """
+    declared = resp.headers.get("Content-Length")
+    if declared and declared.isdigit() and int(declared) > PDF_MAX_BYTES:
         raise RuntimeError(
-            f"Could not fetch PDF after trying live & history. "
-            f"Last HTTP status: {last_status}, URL: {last_url}"
+            f"PDF too large ({int(declared)} bytes > {PDF_MAX_BYTES}), URL: {url}"
         )
 
-    pdf_bytes = BytesIO(resp_content)
-    reader = PdfReader(pdf_bytes)
+    spool = tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_BYTES, dir="./downloads")
+    size = 0
+    try:
+        for chunk in resp.iter_content(chunk_size=64 * 1024):
+            size += len(chunk)
+            if size > PDF_MAX_BYTES:
+                raise RuntimeError(
+                    f"PDF too large (> {PDF_MAX_BYTES} bytes), URL: {url}"
+                )
+            spool.write(chunk)
+    except Exception:
+        spool.close()
+        raise
+
+    spool.seek(0)
+    return spool
+
+
+def _extract_pdf_text(pdf_file, max_chars: int) -> Tuple[str, bool]:
+    """
+    Extract text page by page, stopping once the character budget is met.
+    Returns (text, complete) where complete means every page was read.
+    """
+    reader = PdfReader(pdf_file)
 
     all_text_parts = []
-    for page in reader.pages:
+    total = 0
+    complete = True
+    for page_no, page in enumerate(reader.pages):
+        if page_no >= PDF_MAX_PAGES or total >= max_chars:
+            complete = False
+            break
         text = page.extract_text() or ""
         all_text_parts.append(text)
+        total += len(text) + 1
 
-    return "\n".join(all_text_parts), final_url
+    return "\n".join(all_text_parts), complete
 
 
 # --------------------------------------------------------------------
 # AGENTIC SUMMARIZATION (Agno + Groq)
 # --------------------------------------------------------------------
 
-def summarize_with_groq(
-    pdf_text: str,
-    heading: str,
-    news_date: str,
-    pdf_url: str,
-) -> str:
-    """
-    Use an Agno agent (Groq Llama) to turn raw PDF text + BSE heading into:
-    - Title
-    - Summary (no hallucinations)
-    Then append the source PDF link.
-
-    Output format stays EXACTLY like before so callers (main.py) do not change.
-    """
-    max_chars = 12000
+def _summary_prompt(pdf_text: str, heading: str, news_date: str) -> str:
     trimmed = (pdf_text or "").strip()
-    if len(trimmed) > max_chars:
-        trimmed = trimmed[:max_chars]
+    if len(trimmed) > SUMMARY_MAX_CHARS:
+        trimmed = trimmed[:SUMMARY_MAX_CHARS]
 
     short_text = len(trimmed) < 500
 
@@ -133,7 +254,7 @@ def summarize_with_groq(
         "If you cannot clearly find a detail, say 'not clearly specified in the filing'. "
     ) if short_text else ""
 
-    prompt = f"""
+    return f"""
 You are summarizing an official stock-exchange filing / corporate announcement for investors.
 You MUST NOT guess or invent details. Only state what is explicitly present in the text
 or in the BSE heading. If something is not clearly mentioned, say "not clearly specified in the filing".
@@ -170,39 +291,339 @@ Here is the filing text:
 
 \"\"\"{trimmed}\"\"\"""".strip()
 
+
+def _summary_cache_key(
+    model_input: str,
+    attach_name: Optional[str],
+    prompt_version: str = SUMMARY_PROMPT_VERSION,
+) -> Tuple[str, str, str, str]:
+    return (
+        attach_name or "",
+        hashlib.sha256(model_input.encode("utf-8")).hexdigest(),
+        SUMMARY_MODEL,
+        prompt_version,
+    )
+
+
+def _with_source_link(content: str, pdf_url: str) -> str:
+    return content + (f"\n\nSource PDF: {pdf_url}" if pdf_url else "")
+
+
+def summarize_with_groq(
+    pdf_text: str,
+    heading: str,
+    news_date: str,
+    pdf_url: str,
+    attach_name: Optional[str] = None,
+) -> str:
+    """
+    Use an Agno agent (Groq Llama) to turn raw PDF text + BSE heading into:
+    - Title
+    - Summary (no hallucinations)
+    Then append the source PDF link.
+
+    Filings never change, so summaries are memoized in summary_cache by
+    (attachment name, hash of the full prompt, model, prompt version).
+
+    Output format stays EXACTLY like before so callers (main.py) do not change.
+    """
+    prompt = _summary_prompt(pdf_text, heading, news_date)
+    cache_key = _summary_cache_key(prompt, attach_name)
+    content = get_summary(cache_key)
+
     # Use Agno agent instead of manual Groq client
-    try:
-        response = bse_summary_agent.run(input=prompt)
-        content = str(response.content).strip()
-    except Exception as e:
-        # Bubble up (caller already handles per-announcement errors)
-        raise RuntimeError(f"Groq summary error: {e}") from e
+    if content is None:
+        try:
+            with upstream_limit("groq"):
+                response = bse_summary_agent.run(input=prompt)
+            content = str(response.content).strip()
+        except Exception as e:
+            # Bubble up (caller already handles per-announcement errors)
+            raise RuntimeError(f"Groq summary error: {e}") from e
+        if content:
+            put_summary(cache_key, content)
 
-    content_with_link = content + (f"\n\nSource PDF: {pdf_url}" if pdf_url else "")
-    return content_with_link
+    return _with_source_link(content, pdf_url)
+
+
+# --------------------------------------------------------------------
+# Batched mode: several filings per summary request
+# --------------------------------------------------------------------
+
+# Several filings in one request. The prompt differs from single mode (no
+# per-filing short-text guard), so its answers are cached under their own
+# prompt version and single mode never serves them. Bump it whenever
+# BATCH_SUMMARY_PROMPT or BATCH_FILING_BLOCK changes meaning.
+BATCH_SUMMARY_PROMPT_VERSION = "batch-1"
+
+BATCH_SUMMARY_PROMPT = """
+You are summarizing {count} official stock-exchange filings / corporate announcements for investors.
+Treat EACH filing independently and never mix details between filings.
+You MUST NOT guess or invent details. Only state what is explicitly present in a filing's text
+or in its BSE heading. If something is not clearly mentioned, say "not clearly specified in the filing".
+Be extremely conservative for filings whose text is very short or noisy.
+
+For each filing write:
+
+1. A clear, short TITLE (max 120 characters) that is consistent with its heading.
+2. A concise SUMMARY (max 5 bullet points) that ONLY includes:
+   - What happened (as explicitly described)
+   - Any key numbers, amounts or dates that are clearly mentioned
+   - Impact / relevance to shareholders or business, but ONLY if the text mentions it
+
+If you are unsure about any detail, DO NOT guess. Instead say:
+"not clearly specified in the filing" for that point.
+
+Return EXACTLY one block per filing, in the same order, in this format:
+
+=== FILING 1 ===
+Title: <one-line title>
+
+Summary:
+- <point 1>
+- <point 2>
+
+=== FILING 2 ===
+Title: <one-line title>
+
+Summary:
+- <point 1>
+
+Here are the filings:
+
+{filings}
+"""
+
+BATCH_FILING_BLOCK = """
+=== FILING {number} ===
+BSE heading (from website): "{heading}"
+Announcement date (from website): "{news_date}"
+Filing text:
+\"\"\"{text}\"\"\"
+"""
+
+# Default for summarize_announcements_for_stock: several filings per request
+SUMMARY_BATCH = os.getenv("SUMMARY_BATCH", "false").lower() in ("1", "true", "yes")
+# Filings per batched request
+SUMMARY_BATCH_SIZE = max(1, int(os.getenv("SUMMARY_BATCH_SIZE", 4)))
+# Budget for the filing text of one batched request (~4 characters per
+# token). A filing longer than this on its own is summarized alone.
+SUMMARY_BATCH_MAX_CHARS = int(os.getenv("SUMMARY_BATCH_MAX_CHARS", 16000))
+
+_batch_lock = threading.Lock()
+_batch_stats = {"batched_calls": 0, "batched_filings": 0, "single_fallbacks": 0}
+
+_FILING_HEADER = re.compile(r"^\s*=+\s*FILING\s+(\d+)\s*=+\s*$", re.IGNORECASE | re.MULTILINE)
+
+
+def _count_batch(**deltas: int):
+    with _batch_lock:
+        for name, delta in deltas.items():
+            _batch_stats[name] += delta
+
+
+def get_summary_batch_stats() -> Dict[str, Any]:
+    with _batch_lock:
+        return dict(_batch_stats)
+
+
+def _parse_batch_summaries(text: str, count: int) -> Dict[int, str]:
+    """
+    Map each filing number (1-based) to its "Title: ...\\n\\nSummary:\\n- ..."
+    block. Blocks that are missing, duplicated or lack a title or bullet
+    points are left out so the caller can retry that filing on its own.
+    """
+    parts = _FILING_HEADER.split(text or "")
+    parsed: Dict[int, str] = {}
+    seen = set()
+    # parts = [preamble, number, block, number, block, ...]
+    for number_str, block in zip(parts[1::2], parts[2::2]):
+        number = int(number_str)
+        if not 1 <= number <= count:
+            continue
+        if number in seen:
+            # Two answers for one filing: trust neither
+            parsed.pop(number, None)
+            continue
+        seen.add(number)
+
+        title = re.search(r"^\s*Title:\s*(\S.*)$", block, re.MULTILINE)
+        summary = re.search(r"^\s*Summary:\s*$", block, re.MULTILINE)
+        if not title or not summary or summary.start() < title.start():
+            continue
+        bullets = [
+            line.strip()
+            for line in block[summary.end():].splitlines()
+            if line.strip().startswith("-")
+        ]
+        if not bullets:
+            continue
+        parsed[number] = (
+            f"Title: {title.group(1).strip()}\n\nSummary:\n" + "\n".join(bullets)
+        )
+    return parsed
+
+
+def _batch_filing_text(filing: Dict[str, Any]) -> str:
+    return (filing["pdf_text"] or "").strip()[:SUMMARY_MAX_CHARS]
+
+
+def _batch_cache_key(filing: Dict[str, Any]) -> Tuple[str, str, str, str]:
+    model_input = "\n".join((filing["heading"], filing["news_date"], _batch_filing_text(filing)))
+    return _summary_cache_key(
+        model_input, filing.get("attach_name"), BATCH_SUMMARY_PROMPT_VERSION
+    )
+
+
+def _summarize_batch_uncached(group: List[Dict[str, Any]]) -> Dict[int, str]:
+    """
+    One Groq request for a group of filings ({"pdf_text", "heading",
+    "news_date", ...}). Returns only the summaries that could be attributed
+    unambiguously, keyed by position in `group`.
+    """
+    blocks = [
+        BATCH_FILING_BLOCK.format(
+            number=number,
+            heading=filing["heading"],
+            news_date=filing["news_date"],
+            text=_batch_filing_text(filing),
+        )
+        for number, filing in enumerate(group, 1)
+    ]
+    prompt = BATCH_SUMMARY_PROMPT.format(count=len(group), filings="".join(blocks))
+
+    client = get_groq_client()
+    with upstream_limit("groq"):
+        response = client.chat.completions.create(
+            model=SUMMARY_MODEL,
+            messages=[
+                {"role": "system", "content": bse_summary_agent.description},
+                {"role": "user", "content": prompt},
+            ],
+            temperature=0,
+            max_tokens=500 * len(group),
+        )
+
+    _count_batch(batched_calls=1, batched_filings=len(group))
+    parsed = _parse_batch_summaries(response.choices[0].message.content or "", len(group))
+    return {number - 1: content for number, content in parsed.items()}
+
+
+def summarize_filings(filings: List[Dict[str, Any]]) -> List[Any]:
+    """
+    Batched variant of summarize_with_groq for a list of filings
+    ({"pdf_text", "heading", "news_date", "pdf_url", "attach_name"}).
+    Cached summaries are answered first (a batch answer, else the single
+    mode answer the fallback would return); the rest are packed into
+    requests of up to SUMMARY_BATCH_SIZE filings and SUMMARY_BATCH_MAX_CHARS
+    of text. Filings whose block is missing or malformed fall back to
+    single calls.
+
+    Returns one summary string (same format as summarize_with_groq) or
+    Exception per filing, in input order.
+    """
+    results: List[Any] = [None] * len(filings)
+    keys: Dict[int, Tuple[str, str, str, str]] = {}
+    groups: List[List[int]] = []
+    retry: List[int] = []
+    group_chars = 0
+
+    for i, filing in enumerate(filings):
+        keys[i] = _batch_cache_key(filing)
+        cached = get_summary(keys[i])
+        if cached is None:
+            prompt = _summary_prompt(filing["pdf_text"], filing["heading"], filing["news_date"])
+            cached = get_summary(_summary_cache_key(prompt, filing.get("attach_name")))
+        if cached is not None:
+            results[i] = _with_source_link(cached, filing["pdf_url"])
+            continue
+
+        chars = min(len((filing["pdf_text"] or "").strip()), SUMMARY_MAX_CHARS)
+        if chars > SUMMARY_BATCH_MAX_CHARS:
+            retry.append(i)
+            continue
+        if (
+            not groups
+            or len(groups[-1]) >= SUMMARY_BATCH_SIZE
+            or group_chars + chars > SUMMARY_BATCH_MAX_CHARS
+        ):
+            groups.append([])
+            group_chars = 0
+        groups[-1].append(i)
+        group_chars += chars
+
+    # A lone filing gains nothing from the batch prompt
+    batched = [g for g in groups if len(g) > 1]
+    retry += [i for g in groups if len(g) == 1 for i in g]
+
+    def _run_group(group: List[int]):
+        try:
+            return _summarize_batch_uncached([filings[i] for i in group]), None
+        except Exception as e:
+            return {}, e
+
+    for group, (parsed, error) in zip(batched, _filing_executor.map(_run_group, batched)):
+        if error is not None:
+            print(f"[BSE] Batched summary failed, retrying one by one: {error}")
+        for position, i in enumerate(group):
+            if position in parsed:
+                put_summary(keys[i], parsed[position])
+                results[i] = _with_source_link(parsed[position], filings[i]["pdf_url"])
+            else:
+                retry.append(i)
+                _count_batch(single_fallbacks=1)
+
+    def _run_single(i: int):
+        filing = filings[i]
+        try:
+            return summarize_with_groq(
+                filing["pdf_text"],
+                filing["heading"],
+                filing["news_date"],
+                filing["pdf_url"],
+                attach_name=filing.get("attach_name"),
+            )
+        except Exception as e:
+            return e
+
+    for i, summary in zip(retry, _filing_executor.map(_run_single, retry)):
+        results[i] = summary
+
+    return results
 
 
 # --------------------------------------------------------------------
 # BSE ANNOUNCEMENT FETCH + RESOLUTION HELPERS
 # --------------------------------------------------------------------
 
-def fetch_announcements_for_code(
-    scripcode: str,
-    days: int = 60,
-    max_pages: int = 10,
-) -> List[Dict[str, Any]]:
+def get_bse_client() -> BSE:
     """
-    Fetch latest BSE corporate announcements for a given scripcode.
+    One BSE client (and HTTP session) for the whole process.
     """
-    from_date = datetime.now() - timedelta(days=days)
-    to_date = datetime.now()
+    global _bse_client
+    with _bse_lock:
+        if _bse_client is None:
+            _bse_client = BSE(download_folder="./downloads")
+        return _bse_client
 
-    bse = BSE(download_folder="./downloads")
 
-    all_rows: List[Dict[str, Any]] = []
-    page_no = 1
+def _fetch_pages(
+    scripcode: str,
+    from_date: datetime,
+    to_date: datetime,
+    max_pages: int,
+    stop: Callable[[List[Dict[str, Any]]], bool],
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Page through announcements (BSE lists them newest first) until
+    stop(page_rows) is true, the listing ends or max_pages is reached.
 
-    while page_no <= max_pages:
+    Returns (rows, exhausted) where exhausted means the whole range was read.
+    """
+    bse = get_bse_client()
+    rows: List[Dict[str, Any]] = []
+
+    for page_no in range(1, max_pages + 1):
         data = bse.announcements(
             page_no=page_no,
             from_date=from_date,
@@ -212,27 +633,90 @@ def fetch_announcements_for_code(
 
         table = data.get("Table") or []
         if not table:
-            break
+            return rows, True
 
-        all_rows.extend(table)
+        rows.extend(table)
 
         table1 = data.get("Table1") or []
         if table1:
             total_rows = table1[0].get("ROWCNT")
-            if total_rows and len(all_rows) >= int(total_rows):
-                break
+            if total_rows and len(rows) >= int(total_rows):
+                return rows, True
 
-        page_no += 1
+        if stop(table):
+            return rows, False
 
-    def sort_key(row: Dict[str, Any]):
-        dt_str = row.get("NEWS_DT") or ""
-        try:
-            return datetime.fromisoformat(dt_str.replace("Z", "+00:00"))
-        except Exception:
-            return datetime.min
+    return rows, False
+
+
+def fetch_announcements_for_code(
+    scripcode: str,
+    days: int = 60,
+    max_pages: int = 10,
+    max_pdf_rows: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Latest BSE corporate announcements for a given scripcode, newest first,
+    served from the local announcement store (announcement_store.py):
+
+    1) Delta: fetch only what is newer than the newest stored row, stopping
+       at the first page that reaches an already known announcement
+       (usually a single page request). If max_pages runs out first, the
+       unread pages are left to the backfill instead of being skipped.
+    2) Backfill: only if the stored range does not reach back `days` yet,
+       fetch older rows, stopping early once `max_pdf_rows` PDF rows in the
+       window are known.
+    """
+    now = datetime.now()
+    window_start = now - timedelta(days=days)
+    state = get_sync_state(scripcode)
+
+    if state:
+        # No stored rows yet (the last sync found nothing): the range since
+        # covered_from was empty then, so the delta starts there
+        since = state["newest"] or max(state["covered_from"], window_start)
+        reached = False
+
+        def reached_known(page: List[Dict[str, Any]]) -> bool:
+            nonlocal reached
+            reached = bool(known_ids(scripcode, (news_id(r) for r in page)))
+            return reached
+
+        rows, exhausted = _fetch_pages(scripcode, since, now, max_pages, reached_known)
+        # Stopped at max_pages before reaching stored rows: the pages in
+        # between were never read, so the complete range restarts here
+        gap = not (reached or exhausted)
+        save_announcements(scripcode, rows, gap=gap)
+        if gap:
+            state = get_sync_state(scripcode)
+
+    covered_from = state["covered_from"] if state else now
+    if covered_from > window_start:
+        # Only rows inside the known-complete range count; older stored rows
+        # may sit behind a gap and are re-read by the backfill
+        found = count_pdf_rows(scripcode, covered_from)
+
+        def enough_pdfs(page: List[Dict[str, Any]]) -> bool:
+            nonlocal found
+            found += sum(
+                1 for r in page
+                if has_pdf(r)
+                and window_start <= (parse_news_dt(r) or datetime.min) < covered_from
+            )
+            return max_pdf_rows is not None and found >= max_pdf_rows
 
-    all_rows.sort(key=sort_key, reverse=True)
-    return all_rows
+        if max_pdf_rows is None or found < max_pdf_rows:
+            rows, exhausted = _fetch_pages(
+                scripcode, window_start, covered_from, max_pages, enough_pdfs
+            )
+            dates = [dt for dt in map(parse_news_dt, rows) if dt is not None]
+            if exhausted or not dates:
+                backfilled_to = window_start if exhausted else None
+            else:
+                backfilled_to = min(dates)
+            save_announcements(scripcode, rows, covered_from=backfilled_to)
+
+    return load_announcements(scripcode, window_start)
 
 
 def extract_heading_and_date(row: Dict[str, Any]) -> tuple[str, str]:
@@ -260,7 +744,9 @@ def extract_heading_and_date(row: Dict[str, Any]) -> tuple[str, str]:
 def resolve_scripcode(stock_identifier: str) -> Optional[str]:
     """
     If numeric, treat as scripcode directly.
-    Otherwise, try to resolve via BSE getScripCode.
+    Otherwise look it up in the security master (NSE symbol, ISIN, issuer
+    name), and only for misses ask BSE getScripCode. Network answers are
+    cached; unknown identifiers for SCRIPCODE_MISS_TTL seconds.
     """
     stock_identifier = (stock_identifier or "").strip()
     if not stock_identifier:
@@ -269,28 +755,125 @@ def resolve_scripcode(stock_identifier: str) -> Optional[str]:
     if stock_identifier.isdigit():
         return stock_identifier  # already a scripcode
 
-    bse = BSE(download_folder="./downloads")
+    entry = security_master.lookup(stock_identifier)
+    code = master_scripcode(entry) if entry else None
+    if code:
+        return code
+
+    key = stock_identifier.upper()
+    with _scripcode_lock:
+        cached = _scripcode_cache.get(key)
+    if cached is not None:
+        code, resolved_at = cached
+        if code is not None or time.time() - resolved_at < SCRIPCODE_MISS_TTL:
+            return code
+
+    bse = get_bse_client()
     try:
         code = bse.getScripCode(stock_identifier)
-        return str(code) if code else None
+        code = str(code) if code else None
     except Exception:
+        # Network / BSE error: do not cache, try again next time
         return None
 
+    with _scripcode_lock:
+        _scripcode_cache[key] = (code, time.time())
+    return code
+
 
 # --------------------------------------------------------------------
 # HIGH-LEVEL ENTRYPOINT (used by main.py)
 # --------------------------------------------------------------------
 
+def _load_filing(candidate: Tuple[int, Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Download + extract the PDF of one announcement row. Returns a filing
+    dict ("error" set if the PDF could not be fetched), or None when the
+    PDF has no text (the row is skipped).
+    """
+    idx, row = candidate
+    attach_name = row.get("ATTACHMENTNAME")
+    heading, news_date = extract_heading_and_date(row)
+    filing = {
+        "index": idx + 1,
+        "attach_name": attach_name,
+        "heading": heading,
+        "news_date": news_date,
+        "pdf_text": "",
+        "pdf_url": None,
+        "error": None,
+    }
+
+    try:
+        filing["pdf_text"], filing["pdf_url"] = get_pdf_text_from_attachment(attach_name)
+    except Exception as e:
+        filing["error"] = e
+        return filing
+
+    return filing if filing["pdf_text"].strip() else None
+
+
+def _news_item(filing: Dict[str, Any], summary: Any) -> Dict[str, Any]:
+    """
+    `news` entry for a filing and its summary text (or Exception).
+    """
+    if isinstance(summary, Exception):
+        # Add partial error info for this particular news
+        return {
+            "index": filing["index"],
+            "heading": filing["heading"],
+            "date": filing["news_date"],
+            "pdf_url": None,
+            "summary": None,
+            "attachment_name": filing["attach_name"],
+            "error": f"Error summarizing: {summary}",
+        }
+    return {
+        "index": filing["index"],
+        "heading": filing["heading"],
+        "date": filing["news_date"],
+        "pdf_url": filing["pdf_url"],
+        "summary": summary,  # full text: Title + bullets + source
+        "attachment_name": filing["attach_name"],
+    }
+
+
+def _summarize_row(candidate: Tuple[int, Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Download, extract and summarize one PDF announcement row into a `news`
+    item. None when the PDF has no text (the row is skipped).
+    """
+    filing = _load_filing(candidate)
+    if filing is None or filing["error"] is not None:
+        return filing and _news_item(filing, filing["error"])
+
+    try:
+        summary = summarize_with_groq(
+            filing["pdf_text"],
+            filing["heading"],
+            filing["news_date"],
+            filing["pdf_url"],
+            attach_name=filing["attach_name"],
+        )
+    except Exception as e:
+        summary = e
+    return _news_item(filing, summary)
+
+
 def summarize_announcements_for_stock(
     stock_identifier: str,
     days: int = 60,
     max_news: int = 3,
+    batch: Optional[bool] = None,
 ) -> Dict[str, Any]:
     """
     High-level helper:
     - Resolve stock_identifier -> scripcode
     - Fetch announcements
     - For each of top `max_news` announcements with PDF, extract text & summarize
+      (concurrently, up to FILING_WORKERS_PER_STOCK at a time; output stays in feed order)
+    - With `batch` (default SUMMARY_BATCH), texts are fetched first and
+      summarized several per request by summarize_filings
     - Return a dict ready to be JSON-ified
 
     IMPORTANT: Output shape is unchanged so main.py and callers don't need edits.
@@ -302,69 +885,62 @@ def summarize_announcements_for_stock(
         "error": None,
     }
 
-    scripcode = resolve_scripcode(stock_identifier)
-    if not scripcode:
-        result["error"] = "Could not resolve scrip code"
-        return result
+    # One BSE slot for the metadata calls only; PDF downloads take their own
+    # slots in the filing workers, so none is held while waiting on them.
+    with upstream_limit("bse"):
+        scripcode = resolve_scripcode(stock_identifier)
+        if not scripcode:
+            result["error"] = "Could not resolve scrip code"
+            return result
 
-    result["scripcode"] = scripcode
+        result["scripcode"] = scripcode
 
-    try:
-        rows = fetch_announcements_for_code(scripcode, days=days)
-    except Exception as e:
-        result["error"] = f"Error fetching announcements: {e}"
-        return result
+        try:
+            rows = fetch_announcements_for_code(
+                scripcode,
+                days=days,
+                max_pdf_rows=max_news + PDF_ROW_SLACK,
+            )
+        except Exception as e:
+            result["error"] = f"Error fetching announcements: {e}"
+            return result
 
     if not rows:
         result["error"] = "No announcements found"
         return result
 
-    news_items: List[Dict[str, Any]] = []
-    count = 0
-
-    for idx, row in enumerate(rows):
-        if count >= max_news:
-            break
-
-        attach_name = row.get("ATTACHMENTNAME")
-        if not attach_name or not attach_name.lower().endswith(".pdf"):
-            continue  # skip non-PDF or missing attachments
-
-        heading, news_date = extract_heading_and_date(row)
-
-        try:
-            pdf_text, pdf_url = get_pdf_text_from_attachment(attach_name)
-            if not pdf_text.strip():
-                continue
-
-            summary_text = summarize_with_groq(pdf_text, heading, news_date, pdf_url)
-
-            news_items.append(
-                {
-                    "index": idx + 1,
-                    "heading": heading,
-                    "date": news_date,
-                    "pdf_url": pdf_url,
-                    "summary": summary_text,  # full text: Title + bullets + source
-                    "attachment_name": attach_name,
-                }
-            )
-            count += 1
+    # Top PDF rows in feed order. Rows whose PDF has no text do not count
+    # towards max_news, so each wave (at most FILING_WORKERS_PER_STOCK rows)
+    # tops up with the next candidates until max_news items are done or
+    # candidates run out - the same rows a one-by-one walk would pick.
+    candidates = [
+        (idx, row)
+        for idx, row in enumerate(rows)
+        if (row.get("ATTACHMENTNAME") or "").lower().endswith(".pdf")
+    ]
 
-        except Exception as e:
-            # Add partial error info for this particular news
-            news_items.append(
-                {
-                    "index": idx + 1,
-                    "heading": heading,
-                    "date": news_date,
-                    "pdf_url": None,
-                    "summary": None,
-                    "attachment_name": attach_name,
-                    "error": f"Error summarizing: {e}",
-                }
-            )
-            count += 1
+    if batch is None:
+        batch = SUMMARY_BATCH
+    step = _load_filing if batch else _summarize_row
+
+    done: List[Dict[str, Any]] = []
+    pos = 0
+    while len(done) < max_news and pos < len(candidates):
+        wave_size = min(max_news - len(done), FILING_WORKERS_PER_STOCK)
+        wave = candidates[pos:pos + wave_size]
+        pos += len(wave)
+        # map() yields in input order, so items stay in feed order
+        done.extend(item for item in _filing_executor.map(step, wave) if item is not None)
+
+    if batch:
+        loaded = [filing for filing in done if filing["error"] is None]
+        summaries = iter(summarize_filings(loaded))
+        news_items = [
+            _news_item(filing, filing["error"] if filing["error"] is not None else next(summaries))
+            for filing in done
+        ]
+    else:
+        news_items = done
 
     result["news"] = news_items
     if not news_items and not result["error"]:
@@ -0,0 +1,246 @@
+# functions/chart_cache.py
+
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from datetime import time as dt_time
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+# --------------------------------------------------------------------
+# CONFIG
+# --------------------------------------------------------------------
+
+load_dotenv()
+
+CHART_CACHE_DIR = os.getenv("CHART_CACHE_DIR", "./charts/cache")
+CHART_CACHE_DB = os.path.join(CHART_CACHE_DIR, "index.sqlite")
+CHART_OBJECTS_DIR = os.path.join(CHART_CACHE_DIR, "objects")
+# Artifacts for candles older than this are dropped (and unreferenced images deleted)
+CHART_CACHE_RETENTION_DAYS = int(os.getenv("CHART_CACHE_RETENTION_DAYS", 7))
+
+# NSE session times (IST has no DST, so a fixed offset is exact)
+IST = timezone(timedelta(hours=5, minutes=30))
+MARKET_OPEN = dt_time(9, 15)
+MARKET_CLOSE = dt_time(15, 30)
+
+# SQLite (WAL + busy timeout) handles concurrent access; only the prune
+# is serialized
+_prune_lock = threading.Lock()
+_last_prune = 0.0
+
+# Database file whose schema has been set up by this process
+_schema_lock = threading.Lock()
+_schema_ready_for: Optional[str] = None
+
+
+# --------------------------------------------------------------------
+# FRESHNESS RULES
+# --------------------------------------------------------------------
+
+def _last_session_day(now_ist: datetime):
+    """
+    Trading day of the most recent candle: today once the market has opened,
+    otherwise the previous weekday (exchange holidays are not modelled).
+    """
+    day = now_ist.date()
+    if now_ist.time() < MARKET_OPEN:
+        day -= timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return day
+
+
+def last_candle_key(interval: str, now: Optional[datetime] = None) -> str:
+    """
+    Identify the latest candle for an interval. A cached chart is reused for
+    as long as this key does not change:
+      - D: trading date          (one image per session)
+      - W: ISO week, M: month
+      - N minutes: N-minute bucket within the current/last session
+    """
+    now_ist = (now or datetime.now(timezone.utc)).astimezone(IST)
+    day = _last_session_day(now_ist)
+    interval = (interval or "D").upper()
+
+    if interval in ("D", "1D"):
+        return day.isoformat()
+    if interval in ("W", "1W"):
+        year, week, _ = day.isocalendar()
+        return f"{year}-W{week:02d}"
+    if interval in ("M", "1M"):
+        return day.strftime("%Y-%m")
+    if interval.isdigit():
+        session_start = datetime.combine(day, MARKET_OPEN, IST)
+        session_end = datetime.combine(day, MARKET_CLOSE, IST)
+        until = min(now_ist, session_end)
+        bucket = int((until - session_start).total_seconds() // (int(interval) * 60))
+        return f"{day.isoformat()}T{bucket}"
+
+    # Unknown interval: hourly freshness
+    return now_ist.strftime("%Y-%m-%dT%H")
+
+
+# --------------------------------------------------------------------
+# STORAGE
+# --------------------------------------------------------------------
+
+def _ensure_schema(conn: sqlite3.Connection):
+    global _schema_ready_for
+    if _schema_ready_for == CHART_CACHE_DB:
+        return
+    with _schema_lock:
+        if _schema_ready_for == CHART_CACHE_DB:
+            return
+        # WAL lets readers run alongside a writer
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS artifacts (
+                symbol TEXT NOT NULL,
+                interval TEXT NOT NULL,
+                renderer TEXT NOT NULL,
+                candle_key TEXT NOT NULL,
+                sha256 TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (symbol, interval, renderer, candle_key)
+            )
+            """
+        )
+        _schema_ready_for = CHART_CACHE_DB
+
+
+def _connect() -> sqlite3.Connection:
+    os.makedirs(CHART_OBJECTS_DIR, exist_ok=True)
+    conn = sqlite3.connect(CHART_CACHE_DB, timeout=30)
+    _ensure_schema(conn)
+    return conn
+
+
+@contextmanager
+def _db():
+    conn = _connect()
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def image_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def object_path(sha256: str) -> str:
+    return os.path.abspath(os.path.join(CHART_OBJECTS_DIR, f"{sha256}.png"))
+
+
+def chart_artifact(
+    symbol: str,
+    interval: str,
+    renderer: str = "tradingview",
+) -> Optional[Dict[str, Any]]:
+    """
+    Cached image for the symbol's latest candle as
+    {"path", "sha256", "created_at"}, or None.
+    """
+    key = last_candle_key(interval)
+    with _db() as conn:
+        row = conn.execute(
+            "SELECT sha256, created_at FROM artifacts "
+            "WHERE symbol = ? AND interval = ? AND renderer = ? AND candle_key = ?",
+            (symbol, interval, renderer, key),
+        ).fetchone()
+
+    if row is None:
+        return None
+    path = object_path(row[0])
+    if not os.path.exists(path):
+        return None
+    return {"path": path, "sha256": row[0], "created_at": row[1]}
+
+
+def lookup_chart(symbol: str, interval: str, renderer: str = "tradingview") -> Optional[str]:
+    """
+    Path of the cached image for the symbol's latest candle, or None.
+    """
+    artifact = chart_artifact(symbol, interval, renderer)
+    return artifact["path"] if artifact else None
+
+
+def store_chart(
+    symbol: str,
+    interval: str,
+    image_path: str,
+    renderer: str = "tradingview",
+) -> str:
+    """
+    Copy a freshly captured image into the content-addressed store, index it
+    under the symbol's latest candle and return the stored path.
+    """
+    digest = image_digest(image_path)
+    path = object_path(digest)
+    if not os.path.exists(path):
+        os.makedirs(CHART_OBJECTS_DIR, exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        shutil.copyfile(image_path, tmp_path)
+        os.replace(tmp_path, path)
+
+    with _db() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO artifacts "
+            "(symbol, interval, renderer, candle_key, sha256, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (symbol, interval, renderer, last_candle_key(interval), digest, time.time()),
+        )
+
+    _maybe_prune()
+    return path
+
+
+# --------------------------------------------------------------------
+# RETENTION
+# --------------------------------------------------------------------
+
+def _maybe_prune():
+    """
+    At most once an hour: drop old artifact rows and delete image files that
+    no remaining row points to.
+    """
+    global _last_prune
+    now = time.time()
+    with _prune_lock:
+        if now - _last_prune < 3600:
+            return
+        _last_prune = now
+
+    cutoff = now - CHART_CACHE_RETENTION_DAYS * 86400
+    with _db() as conn:
+        conn.execute("DELETE FROM artifacts WHERE created_at < ?", (cutoff,))
+        live = {row[0] for row in conn.execute("SELECT DISTINCT sha256 FROM artifacts")}
+
+    # Derived images (image_prep) are named "<sha256>.<profile>...", so they
+    # go together with their source image
+    derived_dir = os.path.join(CHART_CACHE_DIR, "derived")
+    for directory in (CHART_OBJECTS_DIR, derived_dir):
+        if not os.path.isdir(directory):
+            continue
+        for name in os.listdir(directory):
+            sha256 = name.split(".", 1)[0]
+            path = os.path.join(directory, name)
+            try:
+                # mtime check keeps images stored while this prune was running
+                if sha256 not in live and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
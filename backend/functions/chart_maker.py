@@ -1,8 +1,13 @@
 # functions/chart_maker.py
 
+import atexit
+import os
+import queue
+import threading
 import time
+from contextlib import contextmanager
 from pathlib import Path
-import os
+from typing import Dict, Optional, Union
 
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
@@ -12,84 +17,436 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+from dotenv import load_dotenv
 
-def close_popups(driver):
-    """
-    Try closing various TradingView popups.
-    Safe to call every time after page load.
-    """
-    selectors = [
-        'button[aria-label="Close"]',
-        'div.tv-dialog__close',
-        "//button[contains(text(),'×')]",
-        "//button[contains(text(),'Close')]",
-        "//div[contains(@class,'close-button')]",
-    ]
+# --------------------------------------------------------------------
+# CHROME DRIVER POOL
+# --------------------------------------------------------------------
 
-    for sel in selectors:
-        try:
-            if sel.startswith("//"):
-                btn = WebDriverWait(driver, 3).until(
-                    EC.element_to_be_clickable((By.XPATH, sel))
-                )
-            else:
-                btn = WebDriverWait(driver, 3).until(
-                    EC.element_to_be_clickable((By.CSS_SELECTOR, sel))
-                )
+load_dotenv()
 
-            btn.click()
-            time.sleep(1)
-            print(f"[Popup] Closed using selector: {sel}")
-            return
-        except Exception:
-            continue
+# Max headless browsers alive at once (each one is a full Chrome process)
+CHROME_POOL_SIZE = int(os.getenv("CHROME_POOL_SIZE", 2))
+# Recycle a browser after this many screenshots to cap memory growth
+CHROME_MAX_USES = int(os.getenv("CHROME_MAX_USES", 25))
+# How long a caller waits for a free browser before giving up (seconds)
+CHROME_BORROW_TIMEOUT = float(os.getenv("CHROME_BORROW_TIMEOUT", 120))
+
+_driver_path = None
+_driver_path_lock = threading.Lock()
 
-    print("[Popup] No popup detected or unable to close")
 
+def resolve_driver_path() -> str:
+    """
+    Resolve the chromedriver binary once per process.
+    Uses CHROMEDRIVER_PATH if set, otherwise webdriver_manager (network + disk
+    check) on first call only.
+    """
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is None:
+            _driver_path = os.getenv("CHROMEDRIVER_PATH") or ChromeDriverManager().install()
+        return _driver_path
 
 
+def _chrome_options() -> Options:
     chrome_options = Options()
     chrome_options.add_argument("--headless=new")
     chrome_options.add_argument("--window-size=1600,900")
     chrome_options.add_argument("--disable-gpu")
     chrome_options.add_argument("--no-sandbox")
     chrome_options.add_argument("--disable-dev-shm-usage")
+    return chrome_options
 
-    driver = webdriver.Chrome(
-        service=Service(ChromeDriverManager().install()),
-        options=chrome_options
-    )
 
+class ChromeDriverPool:
+    """
+    Pool of warm headless Chrome drivers.
+
+    - At most `size` drivers exist at once; borrowers block until one is free.
+    - Idle drivers are health-checked before being handed out.
+    - A driver is quit after `max_uses` borrows, or when the borrower raised.
+    """
+
+    def __init__(self, size: int = CHROME_POOL_SIZE, max_uses: int = CHROME_MAX_USES):
+        self.size = max(1, size)
+        self.max_uses = max(1, max_uses)
+
+        self._idle: "queue.LifoQueue[tuple]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._closed = False
+
+    @contextmanager
+    def borrow(self, timeout: float = CHROME_BORROW_TIMEOUT):
+        if not self._slots.acquire(timeout=timeout):
+            raise RuntimeError(f"No Chrome driver available after {timeout:.0f}s")
+
+        driver = None
+        uses = 0
+        healthy = False
+        try:
+            driver, uses = self._checkout()
+            yield driver
+            healthy = True
+        finally:
+            if driver is not None:
+                self._checkin(driver, uses + 1, healthy)
+            self._slots.release()
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                driver, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._quit(driver)
+
+    def _checkout(self) -> tuple:
+        while True:
+            try:
+                driver, uses = self._idle.get_nowait()
+            except queue.Empty:
+                return webdriver.Chrome(
+                    service=Service(resolve_driver_path()),
+                    options=_chrome_options(),
+                ), 0
+
+            if self._is_healthy(driver):
+                return driver, uses
+            self._quit(driver)
+
+    def _checkin(self, driver, uses: int, healthy: bool):
+        if self._closed or not healthy or uses >= self.max_uses:
+            self._quit(driver)
+            return
+        self._idle.put((driver, uses))
+
+    @staticmethod
+    def _is_healthy(driver) -> bool:
+        try:
+            return driver.execute_script("return 1") == 1 and bool(driver.window_handles)
+        except Exception:
+            return False
+
+    @staticmethod
+    def _quit(driver):
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+
+driver_pool = ChromeDriverPool()
+atexit.register(driver_pool.close)
+
+
+# --------------------------------------------------------------------
+# CHART READINESS DETECTION
+# --------------------------------------------------------------------
+
+# Max time to wait for the chart canvas to finish drawing (seconds)
+CHART_RENDER_TIMEOUT = float(os.getenv("CHART_RENDER_TIMEOUT", 20))
+# Canvas is "drawn" once its pixel hash is identical for this many polls
+CHART_STABLE_SAMPLES = int(os.getenv("CHART_STABLE_SAMPLES", 3))
+CHART_POLL_INTERVAL = float(os.getenv("CHART_POLL_INTERVAL", 0.25))
+# Width (px) the canvas is downsampled to before hashing on each poll
+CHART_HASH_SAMPLE_WIDTH = int(os.getenv("CHART_HASH_SAMPLE_WIDTH", 160))
+
+# What the old fixed waits cost: sleep(6) + sleep(2), plus 3 s per popup
+# selector tried (15 s when no popup was present). Used for the saved-time metric.
+_LEGACY_FIXED_WAIT = 8.0
+_LEGACY_POPUP_WAIT_PER_SELECTOR = 3.0
+
+POPUP_CSS_SELECTORS = [
+    'button[aria-label="Close"]',
+    'div.tv-dialog__close',
+]
+POPUP_XPATH_SELECTORS = [
+    "//button[contains(text(),'×')]",
+    "//button[contains(text(),'Close')]",
+    "//div[contains(@class,'close-button')]",
+]
+
+# One round trip: click the first visible popup close button, if any
+_POPUP_PROBE_JS = """
+const css = arguments[0], xpaths = arguments[1];
+const visible = (el) => el && el.offsetParent !== null;
+for (const sel of css) {
+  const el = document.querySelector(sel);
+  if (visible(el)) { el.click(); return sel; }
+}
+for (const xp of xpaths) {
+  const el = document.evaluate(
+    xp, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+  ).singleNodeValue;
+  if (visible(el)) { el.click(); return xp; }
+}
+return null;
+"""
+
+# FNV-1a hash of the canvas pixels, downsampled to arguments[1] px wide so
+# each poll stays cheap (no full-size PNG encode); "blank" until something
+# has been drawn. The scratch canvas is reused across polls.
+_CANVAS_HASH_JS = """
+const c = arguments[0], maxWidth = arguments[1];
+if (!c || !c.width || !c.height) return null;
+const w = Math.min(maxWidth, c.width);
+const h = Math.max(1, Math.round(c.height * w / c.width));
+const s = window.__chartHashCanvas || (window.__chartHashCanvas = document.createElement("canvas"));
+s.width = w; s.height = h;
+const ctx = s.getContext("2d", { willReadFrequently: true });
+ctx.drawImage(c, 0, 0, w, h);
+let px;
+try { px = ctx.getImageData(0, 0, w, h).data; } catch (e) { return "tainted"; }
+let hash = 2166136261, drawn = false;
+for (let i = 0; i < px.length; i++) {
+  if (px[i]) drawn = true;
+  hash ^= px[i];
+  hash = Math.imul(hash, 16777619);
+}
+if (!drawn) return "blank";
+return w + "x" + h + ":" + (hash >>> 0);
+"""
+
+_stats_lock = threading.Lock()
+_capture_stats = {
+    "captures": 0,
+    "render_timeouts": 0,
+    "wait_seconds_total": 0.0,
+    "saved_seconds_total": 0.0,
+    "last": None,
+}
+
+
+def close_popups(driver):
+    """
+    Try closing various TradingView popups with a single combined probe.
+    Safe to call every time after page load; returns the selector used or None.
+    """
+    try:
+        sel = driver.execute_script(
+            _POPUP_PROBE_JS, POPUP_CSS_SELECTORS, POPUP_XPATH_SELECTORS
+        )
+    except Exception:
+        return None
+
+    if sel:
+        print(f"[Popup] Closed using selector: {sel}")
+    return sel
+
+
+def _find_chart_canvas(driver, timeout: float):
+    """
+    Main chart canvas, waiting at most `timeout` seconds for it to appear;
+    after that the largest canvas on the page is used.
+    """
     try:
-        driver.get(url)
-        time.sleep(6)  # allow chart + popup to appear
+        return WebDriverWait(driver, timeout).until(
+            EC.presence_of_element_located(
+                (By.CSS_SELECTOR, 'div[data-name="pane-0"] canvas')
+            )
+        )
+    except Exception:
+        canvases = driver.find_elements(By.TAG_NAME, "canvas")
+        if not canvases:
+            raise RuntimeError("No canvas found on TradingView page.")
+        return max(
+            canvases,
+            key=lambda c: c.size.get("width", 0) * c.size.get("height", 0)
+        )
 
-        # Close promo popup if visible
-        close_popups(driver)
 
-        # Look for canvas
-        wait = WebDriverWait(driver, 15)
-        canvas = None
+def wait_for_chart_render(
+    driver,
+    timeout: float = CHART_RENDER_TIMEOUT,
+    previous_hash: Optional[str] = None,
+):
+    """
+    Wait until the main chart canvas has been drawn and stopped changing,
+    dismissing any popup that shows up meanwhile. When `previous_hash` is
+    given (symbol switched in place), that old picture never counts as ready.
+
+    Returns (canvas, rendered, popup_selector, canvas_hash). `rendered` is
+    False when the timeout hit first; the caller still captures whatever is
+    on screen.
+    """
+    deadline = time.monotonic() + timeout
+    canvas = _find_chart_canvas(driver, timeout=timeout)
+
+    popup = None
+    last_hash = None
+    stable = 0
+
+    while time.monotonic() < deadline:
+        if popup is None:
+            popup = close_popups(driver)
 
         try:
-            canvas = wait.until(
-                EC.presence_of_element_located(
-                    (By.CSS_SELECTOR, 'div[data-name="pane-0"] canvas')
-                )
+            canvas_hash = driver.execute_script(
+                _CANVAS_HASH_JS, canvas, CHART_HASH_SAMPLE_WIDTH
             )
         except Exception:
-            canvases = driver.find_elements(By.TAG_NAME, "canvas")
-            if not canvases:
-                raise RuntimeError("No canvas found on TradingView page.")
-            canvas = max(
-                canvases,
-                key=lambda c: c.size.get("width", 0) * c.size.get("height", 0)
-            )
+            # Canvas was replaced while the chart re-laid out; find it again
+            canvas = _find_chart_canvas(driver, timeout=max(0.0, deadline - time.monotonic()))
+            last_hash, stable = None, 0
+            continue
+
+        if canvas_hash == "tainted":
+            # Pixels unreadable: fall back to a short fixed settle time
+            time.sleep(min(2.0, max(0.0, deadline - time.monotonic())))
+            return canvas, True, popup, None
+
+        if canvas_hash and canvas_hash not in ("blank", previous_hash):
+            stable = stable + 1 if canvas_hash == last_hash else 1
+            if stable >= CHART_STABLE_SAMPLES:
+                return canvas, True, popup, canvas_hash
+        last_hash = canvas_hash
+
+        time.sleep(CHART_POLL_INTERVAL)
+
+    return canvas, False, popup, last_hash
+
+
+def _record_capture(tv_symbol: str, waited: float, rendered: bool, popup):
+    if popup is None:
+        legacy_popup_wait = _LEGACY_POPUP_WAIT_PER_SELECTOR * 5
+    else:
+        selectors = POPUP_CSS_SELECTORS + POPUP_XPATH_SELECTORS
+        legacy_popup_wait = _LEGACY_POPUP_WAIT_PER_SELECTOR * selectors.index(popup) + 1
+    saved = _LEGACY_FIXED_WAIT + legacy_popup_wait - waited
+
+    with _stats_lock:
+        _capture_stats["captures"] += 1
+        _capture_stats["render_timeouts"] += 0 if rendered else 1
+        _capture_stats["wait_seconds_total"] += waited
+        _capture_stats["saved_seconds_total"] += saved
+        _capture_stats["last"] = {
+            "symbol": tv_symbol,
+            "wait_seconds": round(waited, 3),
+            "saved_seconds": round(saved, 3),
+            "rendered": rendered,
+        }
+
+    print(f"[Chart] {tv_symbol} ready in {waited:.2f}s (saved ~{saved:.1f}s vs fixed waits)")
+
+
+def get_capture_stats() -> dict:
+    """
+    Readiness metrics: captures, timeouts and time saved vs the old fixed sleeps.
+    """
+    with _stats_lock:
+        stats = dict(_capture_stats)
+    captures = stats["captures"] or 1
+    stats["avg_wait_seconds"] = round(stats["wait_seconds_total"] / captures, 3)
+    stats["avg_saved_seconds"] = round(stats["saved_seconds_total"] / captures, 3)
+    return stats
+
+
+# --------------------------------------------------------------------
+# TRADINGVIEW SCREENSHOT
+# --------------------------------------------------------------------
 
-        time.sleep(2)
-        output_path = str(out_path.resolve())
-        canvas.screenshot(output_path)
-        return output_path
+# Switch the already-loaded chart to another symbol via TradingView's page API.
+# Resolves false when the API is missing so the caller can reload the URL instead.
+_SET_SYMBOL_JS = """
+const symbol = arguments[0], done = arguments[arguments.length - 1];
+try {
+  const api = window.TradingViewApi;
+  const chart = api && api.activeChart && api.activeChart();
+  if (!chart || !chart.setSymbol) { done(false); return; }
+  const timer = setTimeout(() => done(true), 5000);
+  chart.setSymbol(symbol, () => { clearTimeout(timer); done(true); });
+} catch (e) {
+  done(false);
+}
+"""
+
+
+def _chart_url(tv_symbol: str, interval: str) -> str:
+    return f"https://www.tradingview.com/chart/?symbol={tv_symbol}&interval={interval}"
+
+
+def _switch_symbol(driver, tv_symbol: str) -> bool:
+    try:
+        return bool(driver.execute_async_script(_SET_SYMBOL_JS, tv_symbol))
+    except Exception:
+        return False
+
+
+def _capture_canvas(driver, tv_symbol: str, output_path: str, previous_hash=None):
+    """
+    Wait for the chart currently loaded in `driver` and save its canvas.
+    Returns (absolute_path, canvas_hash).
+    """
+    out_path = Path(output_path)
+    if not out_path.parent.exists():
+        os.makedirs(out_path.parent, exist_ok=True)
+
+    # Wait for the canvas to actually be drawn (closing popups meanwhile)
+    started = time.monotonic()
+    canvas, rendered, popup, canvas_hash = wait_for_chart_render(
+        driver, previous_hash=previous_hash
+    )
+    _record_capture(tv_symbol, time.monotonic() - started, rendered, popup)
+
+    output_path = str(out_path.resolve())
+    canvas.screenshot(output_path)
+    return output_path, canvas_hash
+
+
+def get_tradingview_chart_screenshot(
+    tv_symbol: str,
+    interval: str = "D",
+    output_path: str = "chart.png"
+) -> str:
+    """
+    Open TradingView chart for given symbol & interval,
+    screenshot the main canvas, save to output_path, and return the absolute path.
+    The browser is borrowed from `driver_pool` and stays warm for the next call.
+    """
+    with driver_pool.borrow() as driver:
+        driver.get(_chart_url(tv_symbol, interval))
+        path, _ = _capture_canvas(driver, tv_symbol, output_path)
+        return path
+
+
+def get_tradingview_chart_screenshots(
+    targets: Dict[str, str],
+    interval: str = "D",
+) -> Dict[str, Union[str, Exception]]:
+    """
+    Batch version of get_tradingview_chart_screenshot for one browser session.
+
+    `targets` maps tv_symbol -> output_path. The TradingView page is loaded once;
+    every following symbol is switched in place and its canvas captured in turn,
+    so page boot is paid once per batch instead of once per symbol. If in-page
+    switching is unavailable, the same tab is simply navigated to the next URL.
+
+    Returns tv_symbol -> absolute path, or the Exception raised for that symbol.
+    """
+    results: Dict[str, Union[str, Exception]] = {}
+    if not targets:
+        return results
+
+    with driver_pool.borrow() as driver:
+        page_loaded = False
+        previous_hash = None
+
+        for tv_symbol, output_path in targets.items():
+            try:
+                if not (page_loaded and _switch_symbol(driver, tv_symbol)):
+                    driver.get(_chart_url(tv_symbol, interval))
+                    page_loaded = True
+                    previous_hash = None
+
+                path, previous_hash = _capture_canvas(
+                    driver, tv_symbol, output_path, previous_hash=previous_hash
+                )
+                results[tv_symbol] = path
+            except Exception as e:
+                # Next symbol starts from a clean page load
+                results[tv_symbol] = e
+                page_loaded = False
 
-    finally:
-        driver.quit()
+    return results
@@ -4,15 +4,20 @@ import base64
 import json
 import os
 import re
-from typing import Dict, Any
+import threading
+from typing import Dict, Any, List, Optional, Tuple
 
 from dotenv import load_dotenv
-from groq import Groq
 
 # 🔹 NEW: Agno for agentic post-processing
 from pydantic import BaseModel, Field
 from agno.agent import Agent
-from agno.models.groq import Groq as AgnoGroq
+
+from .batch_executor import map_concurrent, upstream_limit
+from .chart_cache import image_digest
+from .groq_clients import get_groq_client, groq_model
+from .image_prep import image_mime, prepare_image, profile_signature
+from .pattern_cache import PatternCache
 
 # Load env vars
 load_dotenv()
@@ -29,25 +34,15 @@ if not API_KEY:
 # Agno agent schema: normalize + validate the pattern info
 # --------------------------------------------------------------------
 
-def get_tradingview_chart_screenshot(
-    tv_symbol: str,
-    interval: str = "D",
-    output_path: str = "chart.png"
-) -> str:
-    """
-    Open TradingView chart for given symbol & interval,
-    screenshot the main canvas, save to output_path, and return the absolute path.
-    """
-    # Ensure charts directory exists
-    out_path = Path(output_path)
-    if not out_path.parent.exists():
-        os.makedirs(out_path.parent, exist_ok=True)
-
-    url = f"https://www.tradingview.com/chart/?symbol={tv_symbol}&interval={interval}"
+class ChartPatternSchema(BaseModel):
+    pattern_found: bool = Field(..., description="Whether a clear classical chart pattern is visible.")
+    pattern_name: str = Field(..., description="Pattern name, or 'None' if nothing clear.")
+    confidence: str = Field(..., description="Confidence label: 'low', 'moderate' or 'high'.")
+    explanation: str = Field(..., description="Short reason for the pattern (or for no pattern).")
 
 
 chart_pattern_agent = Agent(
-    model=AgnoGroq(id="llama-3.3-70b-versatile"),
+    model=groq_model("llama-3.3-70b-versatile"),
     description=(
         "You are a cautious assistant that cleans and normalizes the result of a separate vision model "
         "for candlestick chart patterns. You do NOT analyze the image yourself; instead you read the "
@@ -59,47 +54,14 @@ chart_pattern_agent = Agent(
 )
 
 # --------------------------------------------------------------------
-# Image encoding helper (unchanged)
+# Vision prompt + result cache
 # --------------------------------------------------------------------
 
-def encode_image(path: str) -> str:
-    """
-    Read image and return base64-encoded string.
-    """
-    with open(path, "rb") as f:
-        return base64.b64encode(f.read()).decode("utf-8")
-
+# Bump whenever PATTERN_PROMPT or the normalization step changes meaning,
+# so cached results from the old prompt are no longer served.
+PROMPT_VERSION = "2"
 
-# --------------------------------------------------------------------
-# Vision + Agentic normalization
-# --------------------------------------------------------------------
-
-def detect_chart_pattern(image_path: str) -> Dict[str, Any]:
-    """
-    Call Groq vision model on the given candlestick chart image.
-    NOW agentic (two step):
-      1) Vision model returns a raw JSON-ish description of pattern.
-      2) Agno agent (text model) normalizes & validates into a strict schema.
-
-    Still returns a Python dict with:
-    {
-      "pattern_found": bool,
-      "pattern_name": str,
-      "confidence": str,
-      "explanation": str
-    }
-    so main.py / callers don't need to change.
-    """
-    b64 = encode_image(image_path)
-
-    # ---------- Step 1: Vision model (unchanged core logic) ----------
-    client = Groq(api_key=API_KEY)
-
-    prompt = """
-You are an expert stock market technical analyst.
-You look at a candlestick chart image and identify if any classical chart pattern
-is clearly visible, such as:
-- Head and Shoulders
+PATTERN_LIST = """- Head and Shoulders
 - Inverse Head and Shoulders
 - Double Top / Double Bottom
 - Cup and Handle
@@ -109,7 +71,13 @@ is clearly visible, such as:
 - Wedge patterns (Rising/Falling)
 - Rounding Bottom
 - Trend reversal / breakout setup
+"""
 
+PATTERN_PROMPT = """
+You are an expert stock market technical analyst.
+You look at a candlestick chart image and identify if any classical chart pattern
+is clearly visible, such as:
+""" + PATTERN_LIST + """
 Respond only in JSON like this example:
 
 {
@@ -129,33 +97,323 @@ If no clear pattern appears, return:
 }
 """
 
-    response = client.chat.completions.create(
-        model=VISION_MODEL,
-        messages=[
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": prompt},
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/png;base64,{b64}"
-                        }
-                    }
-                ]
-            }
-        ],
-        temperature=0,
-        max_tokens=700,
+# Several charts in one vision request. Results share the cache with
+# single mode, so the per-chart criteria must stay the same as above.
+BATCH_PATTERN_PROMPT = """
+You are an expert stock market technical analyst.
+You are given {count} candlestick chart images, attached in this order:
+{labels}
+
+Judge EACH chart independently and identify if any classical chart pattern
+is clearly visible in it, such as:
+""" + PATTERN_LIST + """
+Respond only in JSON with exactly one entry per chart, like this example:
+
+{{
+  "results": [
+    {{
+      "chart": 1,
+      "symbol": "NSE:EXAMPLE",
+      "pattern_found": true,
+      "pattern_name": "Double Bottom",
+      "confidence": "moderate",
+      "explanation": "two clear lows forming W-shape near same level, strong bounce after second low"
+    }}
+  ]
+}}
+
+For a chart with no clear pattern use pattern_found false, pattern_name "None",
+confidence "low".
+"""
+
+# Images per batched vision request (Groq accepts at most 5)
+VISION_BATCH_SIZE = min(5, max(1, int(os.getenv("VISION_BATCH_SIZE", 4))))
+
+pattern_cache = PatternCache()
+
+
+def get_pattern_cache_stats() -> Dict[str, Any]:
+    return pattern_cache.stats()
+
+# --------------------------------------------------------------------
+# Local parsing: fast path that skips the normalization agent
+# --------------------------------------------------------------------
+
+CONFIDENCE_LABELS = {
+    "low": "low",
+    "weak": "low",
+    "very low": "low",
+    "moderate": "moderate",
+    "medium": "moderate",
+    "mid": "moderate",
+    "fair": "moderate",
+    "high": "high",
+    "strong": "high",
+    "very high": "high",
+}
+
+_BOOL_WORDS = {
+    "true": True, "yes": True, "y": True, "1": True,
+    "false": False, "no": False, "n": False, "0": False,
+}
+
+_normalization_lock = threading.Lock()
+_normalization_stats = {"local": 0, "agent": 0, "raw_json": 0, "failed": 0}
+
+
+def _count_normalization(outcome: str):
+    with _normalization_lock:
+        _normalization_stats[outcome] += 1
+
+
+def get_normalization_stats() -> Dict[str, Any]:
+    """
+    How vision outputs were normalized: "local" = parsed here (one LLM call
+    saved), "agent" = needed the Agno fallback, "raw_json" = the agent failed
+    and the raw vision JSON was used as-is, "failed" = nothing worked.
+    """
+    with _normalization_lock:
+        stats = dict(_normalization_stats)
+    total = sum(stats.values())
+    stats["agent_fallback_rate"] = round(stats["agent"] / total, 3) if total else 0.0
+    return stats
+
+
+def _extract_json_object(text: str) -> Optional[str]:
+    """
+    First balanced {...} block in the text (ignores braces inside strings),
+    so prose or markdown around the JSON does not matter.
+    """
+    start = text.find("{")
+    if start < 0:
+        return None
+
+    depth, in_string, escaped = 0, False, False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+
+    # Truncated output: close the object ourselves
+    return text[start:] + "}" * depth if depth > 0 else None
+
+
+def _repair_json(block: str) -> str:
+    """
+    Fix the usual near-JSON mistakes: smart quotes, single quotes,
+    Python literals and trailing commas.
+    """
+    block = (
+        block.replace("\u201c", '"').replace("\u201d", '"')
+        .replace("\u2018", "'").replace("\u2019", "'")
+    )
+    if '"' not in block:
+        block = block.replace("'", '"')
+    block = re.sub(r":\s*True\b", ": true", block)
+    block = re.sub(r":\s*False\b", ": false", block)
+    block = re.sub(r":\s*None\b(?=\s*[,}])", ": null", block)
+    block = re.sub(r",\s*([}\]])", r"\1", block)
+    return block
+
+
+def _normalize_confidence(value: Any) -> Optional[str]:
+    """
+    Map labels ("Medium", "strong") and numbers (0-1 or 0-100) onto
+    low / moderate / high. None if the value is not recognisable.
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        score = value / 100 if value > 1 else value
+        if not 0 <= score <= 1:
+            return None
+        return "high" if score >= 0.7 else "moderate" if score >= 0.4 else "low"
+    if isinstance(value, str):
+        label = re.sub(r"[\s_-]+", " ", value.strip().lower())
+        if label.endswith(" confidence"):
+            label = label[: -len(" confidence")]
+        if label in CONFIDENCE_LABELS:
+            return CONFIDENCE_LABELS[label]
+        try:
+            return _normalize_confidence(float(label.rstrip("%")))
+        except ValueError:
+            return None
+    return None
+
+
+def parse_pattern_output(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Strictly parse and validate raw vision output against ChartPatternSchema.
+    Returns the normalized dict, or None when the output is too far off and
+    the normalization agent has to take over.
+    """
+    data = _load_json_object(text)
+    return _validate_pattern(data) if isinstance(data, dict) else None
+
+
+def _load_json_object(text: str) -> Optional[Any]:
+    block = _extract_json_object(text)
+    if block is None:
+        return None
+    try:
+        return json.loads(block)
+    except json.JSONDecodeError:
+        try:
+            return json.loads(_repair_json(block))
+        except json.JSONDecodeError:
+            return None
+
+
+def _validate_pattern(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    found = data.get("pattern_found")
+    if isinstance(found, str):
+        found = _BOOL_WORDS.get(found.strip().lower())
+    if not isinstance(found, bool):
+        return None
+
+    name = data.get("pattern_name")
+    if name is None and not found:
+        name = "None"
+    if not isinstance(name, str) or not name.strip():
+        return None
+
+    confidence = _normalize_confidence(data.get("confidence"))
+    explanation = data.get("explanation")
+    if confidence is None or not isinstance(explanation, str) or not explanation.strip():
+        return None
+
+    try:
+        pattern = ChartPatternSchema(
+            pattern_found=found,
+            pattern_name=name.strip(),
+            confidence=confidence,
+            explanation=explanation.strip(),
+        )
+    except Exception:
+        return None
+    return pattern.model_dump()
+
+# --------------------------------------------------------------------
+# Image encoding helper (unchanged)
+# --------------------------------------------------------------------
+
+def encode_image(path: str) -> str:
+    """
+    Read image and return base64-encoded string.
+    """
+    with open(path, "rb") as f:
+        return base64.b64encode(f.read()).decode("utf-8")
+
+
+def _image_content(path: str) -> Dict[str, Any]:
+    """
+    Vision message part for a chart, downscaled / re-encoded by image_prep.
+    """
+    prepared = prepare_image(path, "vision")
+    return {
+        "type": "image_url",
+        "image_url": {
+            "url": f"data:{image_mime(prepared)};base64,{encode_image(prepared)}"
+        },
+    }
+
+
+def _cache_key(path: str) -> Tuple[str, str, str]:
+    # Preprocessing settings change what the model sees, so they are part
+    # of the prompt version
+    return (
+        image_digest(path),
+        VISION_MODEL,
+        f"{PROMPT_VERSION}/{profile_signature('vision')}",
     )
 
+
+# --------------------------------------------------------------------
+# Vision + Agentic normalization
+# --------------------------------------------------------------------
+
+def detect_chart_pattern(image_path: str) -> Dict[str, Any]:
+    """
+    Memoized pattern detection. Results are cached by image content hash,
+    vision model ID and prompt version, so an unchanged chart returns from
+    memory (or SQLite) without any LLM call. See _detect_chart_pattern_uncached.
+    """
+    key = _cache_key(image_path)
+
+    cached = pattern_cache.get(key)
+    if cached is not None:
+        return cached
+
+    result = _detect_chart_pattern_uncached(image_path)
+
+    # Parse failures are not worth remembering
+    if result.get("pattern_name") != "ParseError":
+        pattern_cache.put(key, result)
+    return result
+
+
+def _detect_chart_pattern_uncached(image_path: str) -> Dict[str, Any]:
+    """
+    Call Groq vision model on the given candlestick chart image.
+    Two step:
+      1) Vision model returns a raw JSON-ish description of pattern.
+      2) parse_pattern_output validates it locally; only if that fails does
+         the Agno agent (text model) normalize it into the strict schema.
+
+    Still returns a Python dict with:
+    {
+      "pattern_found": bool,
+      "pattern_name": str,
+      "confidence": str,
+      "explanation": str
+    }
+    so main.py / callers don't need to change.
+    """
+    # ---------- Step 1: Vision model (shared pooled client) ----------
+    client = get_groq_client()
+
+    with upstream_limit("groq"):
+        response = client.chat.completions.create(
+            model=VISION_MODEL,
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": PATTERN_PROMPT},
+                        _image_content(image_path),
+                    ]
+                }
+            ],
+            temperature=0,
+            max_tokens=700,
+        )
+
     raw = response.choices[0].message.content.strip()
 
     # Strip markdown fences if present
     clean = re.sub(r"^```(?:json)?", "", raw).strip()
     clean = re.sub(r"```$", "", clean).strip()
 
-    # ---------- Step 2: Agentic normalization via Agno ----------
+    # ---------- Step 2a: Local parse (no LLM round trip) ----------
+    parsed = parse_pattern_output(clean)
+    if parsed is not None:
+        _count_normalization("local")
+        return parsed
+
+    # ---------- Step 2b: Agentic normalization via Agno ----------
     try:
         # Let the Agno agent read the raw vision output and normalize it.
         instruction = (
@@ -172,9 +430,11 @@ If no clear pattern appears, return:
             f"{clean}\n"
         )
 
-        agent_resp = chart_pattern_agent.run(input=instruction)
+        with upstream_limit("groq"):
+            agent_resp = chart_pattern_agent.run(input=instruction)
         pattern_obj: ChartPatternSchema = agent_resp.content
 
+        _count_normalization("agent")
         return {
             "pattern_found": bool(pattern_obj.pattern_found),
             "pattern_name": str(pattern_obj.pattern_name),
@@ -187,6 +447,7 @@ If no clear pattern appears, return:
         # if that also fails, return a safe default.
         try:
             data = json.loads(clean)
+            _count_normalization("raw_json")
             return {
                 "pattern_found": bool(data.get("pattern_found", False)),
                 "pattern_name": str(data.get("pattern_name", "ParseError")),
@@ -200,9 +461,145 @@ If no clear pattern appears, return:
             }
         except json.JSONDecodeError:
             # ultimate fallback
+            _count_normalization("failed")
             return {
                 "pattern_found": False,
                 "pattern_name": "ParseError",
                 "confidence": "low",
                 "explanation": f"Could not parse model JSON. Raw output: {clean}",
             }
+
+
+# --------------------------------------------------------------------
+# Batched mode: several charts per vision call
+# --------------------------------------------------------------------
+
+_batch_lock = threading.Lock()
+_batch_stats = {"batched_calls": 0, "batched_charts": 0, "single_fallbacks": 0}
+
+
+def _count_batch(**deltas: int):
+    with _batch_lock:
+        for name, delta in deltas.items():
+            _batch_stats[name] += delta
+
+
+def get_vision_batch_stats() -> Dict[str, Any]:
+    with _batch_lock:
+        return dict(_batch_stats)
+
+
+def _parse_batch_output(text: str, labels: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Map each label to its validated result. Entries are matched by chart
+    number and, when present, must also name the right symbol. Anything
+    missing, duplicated or invalid is left out so the caller can retry
+    that chart on its own.
+    """
+    data = _load_json_object(text)
+    entries = data.get("results") if isinstance(data, dict) else None
+    if not isinstance(entries, list):
+        return {}
+
+    parsed: Dict[str, Dict[str, Any]] = {}
+    seen = set()
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        try:
+            number = int(entry.get("chart"))
+        except (TypeError, ValueError):
+            continue
+        if not 1 <= number <= len(labels):
+            continue
+        label = labels[number - 1]
+        symbol = entry.get("symbol")
+        if symbol is not None and str(symbol).strip().upper() != label.upper():
+            continue
+        if label in seen:
+            # Two answers for one chart: trust neither
+            parsed.pop(label, None)
+            continue
+        seen.add(label)
+
+        pattern = _validate_pattern(entry)
+        if pattern is not None:
+            parsed[label] = pattern
+    return parsed
+
+
+def _detect_batch_uncached(group: List[Tuple[str, str]]) -> Dict[str, Dict[str, Any]]:
+    """
+    One vision request for up to VISION_BATCH_SIZE (label, image_path) pairs.
+    Returns only the results that could be attributed unambiguously.
+    """
+    labels = [label for label, _ in group]
+    prompt = BATCH_PATTERN_PROMPT.format(
+        count=len(group),
+        labels="\n".join(f"{i}. {label}" for i, label in enumerate(labels, 1)),
+    )
+    content = [{"type": "text", "text": prompt}]
+    content += [_image_content(path) for _, path in group]
+
+    client = get_groq_client()
+    with upstream_limit("groq"):
+        response = client.chat.completions.create(
+            model=VISION_MODEL,
+            messages=[{"role": "user", "content": content}],
+            temperature=0,
+            max_tokens=400 * len(group),
+        )
+
+    _count_batch(batched_calls=1, batched_charts=len(group))
+    return _parse_batch_output(response.choices[0].message.content or "", labels)
+
+
+def detect_chart_patterns(image_paths: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Batched variant of detect_chart_pattern for {label: image_path}, where
+    label is usually the symbol. Cached charts are answered first; the rest
+    go to the vision model VISION_BATCH_SIZE images per request. Charts whose
+    result is missing or ambiguous fall back to single mode.
+
+    Returns {label: pattern_dict or Exception}.
+    """
+    results: Dict[str, Any] = {}
+    keys: Dict[str, Tuple[str, str, str]] = {}
+    pending: List[Tuple[str, str]] = []
+
+    for label, path in image_paths.items():
+        try:
+            keys[label] = _cache_key(path)
+        except OSError as e:
+            results[label] = e
+            continue
+        cached = pattern_cache.get(keys[label])
+        if cached is not None:
+            results[label] = cached
+        else:
+            pending.append((label, path))
+
+    groups = [
+        pending[i:i + VISION_BATCH_SIZE]
+        for i in range(0, len(pending), VISION_BATCH_SIZE)
+    ]
+    # A lone chart gains nothing from the batch prompt
+    batched = [g for g in groups if len(g) > 1]
+    retry = [pair for g in groups if len(g) == 1 for pair in g]
+
+    for group, parsed, error in map_concurrent(_detect_batch_uncached, batched):
+        for label, path in group:
+            if error is None and label in parsed:
+                results[label] = parsed[label]
+                pattern_cache.put(keys[label], parsed[label])
+            else:
+                retry.append((label, path))
+                _count_batch(single_fallbacks=1)
+
+    if retry:
+        for (label, _), pattern, error in map_concurrent(
+            lambda pair: detect_chart_pattern(pair[1]), retry
+        ):
+            results[label] = error if error is not None else pattern
+
+    return results
@@ -0,0 +1,227 @@
+# functions/chart_renderer.py
+
+import os
+import struct
+import zlib
+from pathlib import Path
+from typing import Any, Dict
+
+import numpy as np
+from dotenv import load_dotenv
+
+# --------------------------------------------------------------------
+# CONFIG
+# --------------------------------------------------------------------
+
+load_dotenv()
+
+# Optional local OHLCV store: <dir>/<SYMBOL>_<interval>.parquet or <dir>/<SYMBOL>.parquet
+CHART_OHLCV_DIR = os.getenv("CHART_OHLCV_DIR", "./ohlcv")
+# Candles drawn per chart
+CHART_RENDER_BARS = int(os.getenv("CHART_RENDER_BARS", 120))
+
+# Same canvas size as the TradingView screenshots
+CHART_WIDTH = 1600
+CHART_HEIGHT = 900
+
+# TradingView interval -> (yfinance interval, history period)
+INTERVALS = {
+    "1": ("1m", "5d"),
+    "5": ("5m", "1mo"),
+    "15": ("15m", "1mo"),
+    "30": ("30m", "1mo"),
+    "60": ("60m", "3mo"),
+    "D": ("1d", "1y"),
+    "1D": ("1d", "1y"),
+    "W": ("1wk", "5y"),
+    "1W": ("1wk", "5y"),
+    "M": ("1mo", "max"),
+    "1M": ("1mo", "max"),
+}
+
+# TradingView light theme colours (RGB)
+BACKGROUND = (255, 255, 255)
+GRID = (240, 243, 250)
+UP = (8, 153, 129)
+DOWN = (242, 54, 69)
+UP_VOLUME = (157, 212, 203)
+DOWN_VOLUME = (249, 177, 183)
+
+
+# --------------------------------------------------------------------
+# OHLCV LOADING
+# --------------------------------------------------------------------
+
+def load_ohlcv(yahoo_symbol: str, interval: str = "D", bars: int = CHART_RENDER_BARS) -> Dict[str, Any]:
+    """
+    Load the last `bars` candles for a symbol, preferring the local Parquet
+    store and falling back to yfinance history.
+
+    Returns numpy arrays: {"time", "open", "high", "low", "close", "volume"}.
+    """
+    if interval not in INTERVALS:
+        raise ValueError(f"Unsupported interval for local rendering: {interval}")
+    yf_interval, period = INTERVALS[interval]
+
+    df = None
+    for name in (f"{yahoo_symbol}_{interval}.parquet", f"{yahoo_symbol}.parquet"):
+        path = os.path.join(CHART_OHLCV_DIR, name)
+        if os.path.exists(path):
+            import pandas as pd
+            df = pd.read_parquet(path)
+            break
+
+    if df is None:
+        import yfinance as yf
+        df = yf.Ticker(yahoo_symbol).history(period=period, interval=yf_interval)
+
+    if df is None or df.empty:
+        raise RuntimeError(f"No OHLCV data for {yahoo_symbol} ({interval})")
+
+    columns = {c.lower(): c for c in df.columns}
+    missing = [c for c in ("open", "high", "low", "close") if c not in columns]
+    if missing:
+        raise RuntimeError(f"OHLCV data for {yahoo_symbol} missing columns: {missing}")
+
+    df = df.dropna(subset=[columns[c] for c in ("open", "high", "low", "close")]).tail(bars)
+    if df.empty:
+        raise RuntimeError(f"No OHLCV data for {yahoo_symbol} ({interval})")
+
+    times = df[columns["date"]] if "date" in columns else df.index
+    return {
+        "time": np.asarray(times),
+        "open": df[columns["open"]].to_numpy(dtype=float),
+        "high": df[columns["high"]].to_numpy(dtype=float),
+        "low": df[columns["low"]].to_numpy(dtype=float),
+        "close": df[columns["close"]].to_numpy(dtype=float),
+        "volume": (
+            df[columns["volume"]].to_numpy(dtype=float)
+            if "volume" in columns
+            else np.zeros(len(df))
+        ),
+    }
+
+
+# --------------------------------------------------------------------
+# VECTORIZED DRAWING
+# --------------------------------------------------------------------
+
+def draw_candlesticks(
+    ohlcv: Dict[str, Any],
+    width: int = CHART_WIDTH,
+    height: int = CHART_HEIGHT,
+) -> np.ndarray:
+    """
+    Draw candles (top ~80%) and volume bars (bottom ~20%) into an RGB array.
+    Every pixel mask is computed with numpy broadcasting over (rows, columns);
+    there is no per-candle Python loop.
+    """
+    o, h, l, c = ohlcv["open"], ohlcv["high"], ohlcv["low"], ohlcv["close"]
+    v = ohlcv["volume"]
+    n = len(c)
+
+    img = np.empty((height, width, 3), dtype=np.uint8)
+    img[:] = BACKGROUND
+
+    left, right = 10, width - 70
+    price_top, price_bottom = 20, int(height * 0.78)
+    volume_top, volume_bottom = int(height * 0.82), height - 10
+
+    # Horizontal grid lines (price pane)
+    for y in np.linspace(price_top, price_bottom, 9).astype(int):
+        img[y, left:right] = GRID
+
+    # Map every column to the candle it belongs to
+    step = (right - left) / n
+    cols = np.arange(width)
+    idx = np.floor((cols - left) / step).astype(int)
+    in_plot = (cols >= left) & (cols < right) & (idx >= 0) & (idx < n)
+    idx = np.clip(idx, 0, n - 1)
+    offset = np.abs((cols - left) - (idx + 0.5) * step)
+
+    body_cols = in_plot & (offset <= max(step * 0.35, 0.5))
+    wick_cols = in_plot & (offset <= 0.5)
+    up_cols = (c >= o)[idx]
+
+    # Price -> pixel row
+    p_max, p_min = float(np.max(h)), float(np.min(l))
+    span = (p_max - p_min) or 1.0
+
+    def to_y(price):
+        return price_top + (p_max - price) / span * (price_bottom - price_top)
+
+    body_top = np.floor(to_y(np.maximum(o, c)))[idx]
+    body_bottom = np.maximum(np.ceil(to_y(np.minimum(o, c)))[idx], body_top + 1)
+    wick_top = np.floor(to_y(h))[idx]
+    wick_bottom = np.ceil(to_y(l))[idx]
+
+    v_max = float(np.max(v)) or 1.0
+    vol_top = (volume_bottom - v / v_max * (volume_bottom - volume_top))[idx]
+
+    rows = np.arange(height)[:, None]
+    up = up_cols[None, :]
+
+    candle = (
+        (body_cols[None, :] & (rows >= body_top) & (rows <= body_bottom))
+        | (wick_cols[None, :] & (rows >= wick_top) & (rows <= wick_bottom))
+    )
+    volume = body_cols[None, :] & (rows >= vol_top) & (rows <= volume_bottom)
+
+    img[volume & up] = UP_VOLUME
+    img[volume & ~up] = DOWN_VOLUME
+    img[candle & up] = UP
+    img[candle & ~up] = DOWN
+    return img
+
+
+def encode_png(img: np.ndarray) -> bytes:
+    """
+    Minimal RGB PNG encoder (zlib + struct), so rendering needs no imaging library.
+    """
+    height, width, _ = img.shape
+    # Each scanline is prefixed with filter type 0 (None)
+    raw = np.concatenate(
+        [np.zeros((height, 1), dtype=np.uint8), img.reshape(height, width * 3)],
+        axis=1,
+    ).tobytes()
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return (
+            struct.pack(">I", len(data))
+            + tag
+            + data
+            + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+        )
+
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(raw, 6))
+        + chunk(b"IEND", b"")
+    )
+
+
+# --------------------------------------------------------------------
+# HIGH-LEVEL ENTRYPOINT
+# --------------------------------------------------------------------
+
+def render_candlestick_chart(
+    yahoo_symbol: str,
+    interval: str = "D",
+    output_path: str = "chart.png",
+    bars: int = CHART_RENDER_BARS,
+) -> str:
+    """
+    Render a candlestick PNG from OHLCV data, save it to output_path and return
+    the absolute path — the same contract as get_tradingview_chart_screenshot,
+    so the file can go straight into detect_chart_pattern.
+    """
+    ohlcv = load_ohlcv(yahoo_symbol, interval=interval, bars=bars)
+
+    out_path = Path(output_path)
+    if not out_path.parent.exists():
+        os.makedirs(out_path.parent, exist_ok=True)
+
+    with open(out_path, "wb") as f:
+        f.write(encode_png(draw_candlesticks(ohlcv)))
+    return str(out_path.resolve())
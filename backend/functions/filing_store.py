@@ -0,0 +1,228 @@
+# functions/filing_store.py
+
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Dict, Optional
+
+from dotenv import load_dotenv
+
+# --------------------------------------------------------------------
+# CONFIG
+# --------------------------------------------------------------------
+
+load_dotenv()
+
+FILING_STORE_DIR = os.getenv("FILING_STORE_DIR", "./downloads/filings")
+FILING_STORE_DB = os.path.join(FILING_STORE_DIR, "index.sqlite")
+# Total size of stored PDFs + text; least recently used filings go first
+FILING_STORE_MAX_BYTES = int(os.getenv("FILING_STORE_MAX_BYTES", 512 * 1024 * 1024))
+
+# SQLite (WAL + busy timeout) handles concurrent reads and writes; only
+# eviction is serialized so two threads never pick the same victims
+_evict_lock = threading.Lock()
+
+# Database file whose schema has been set up by this process
+_schema_lock = threading.Lock()
+_schema_ready_for: Optional[str] = None
+
+# Stored size of a filing: PDF bytes plus UTF-8 bytes of the extracted text
+_ROW_BYTES = "pdf_bytes + COALESCE(LENGTH(CAST(text AS BLOB)), 0)"
+
+
+# --------------------------------------------------------------------
+# STORAGE
+# --------------------------------------------------------------------
+
+def _ensure_schema(conn: sqlite3.Connection):
+    global _schema_ready_for
+    if _schema_ready_for == FILING_STORE_DB:
+        return
+    with _schema_lock:
+        if _schema_ready_for == FILING_STORE_DB:
+            return
+        # WAL lets readers run alongside a writer
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS filings (
+                attach_name TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                pdf_file TEXT,
+                pdf_bytes INTEGER NOT NULL DEFAULT 0,
+                text TEXT,
+                text_budget INTEGER,
+                text_complete INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL
+            )
+            """
+        )
+        _schema_ready_for = FILING_STORE_DB
+
+
+def _connect() -> sqlite3.Connection:
+    os.makedirs(FILING_STORE_DIR, exist_ok=True)
+    conn = sqlite3.connect(FILING_STORE_DB, timeout=30)
+    _ensure_schema(conn)
+    return conn
+
+
+@contextmanager
+def _db():
+    conn = _connect()
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _file_name(attach_name: str) -> str:
+    # Attachment names are BSE-generated ("<uuid>.pdf"); keep them path-safe
+    return re.sub(r"[^A-Za-z0-9._-]", "_", attach_name)
+
+
+def _touch(conn: sqlite3.Connection, attach_name: str):
+    conn.execute(
+        "UPDATE filings SET last_used_at = ? WHERE attach_name = ?",
+        (time.time(), attach_name),
+    )
+
+
+# --------------------------------------------------------------------
+# PUBLIC API
+# --------------------------------------------------------------------
+
+def get_text(attach_name: str, max_chars: int) -> Optional[Dict[str, Any]]:
+    """
+    Stored text if it was extracted with at least `max_chars` of budget (or
+    covers the whole document): {"text", "url"}. None otherwise.
+    """
+    with _db() as conn:
+        row = conn.execute(
+            "SELECT text, url, text_budget, text_complete FROM filings WHERE attach_name = ?",
+            (attach_name,),
+        ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        text, url, budget, complete = row
+        if not complete and (budget or 0) < max_chars:
+            return None
+        _touch(conn, attach_name)
+    return {"text": text[:max_chars] if len(text) > max_chars else text, "url": url}
+
+
+def get_pdf(attach_name: str) -> Optional[Dict[str, Any]]:
+    """
+    Stored PDF as {"path", "url"}, or None if never fetched / evicted.
+    """
+    with _db() as conn:
+        row = conn.execute(
+            "SELECT pdf_file, url FROM filings WHERE attach_name = ?",
+            (attach_name,),
+        ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        _touch(conn, attach_name)
+
+    path = os.path.join(FILING_STORE_DIR, row[0])
+    return {"path": path, "url": row[1]} if os.path.exists(path) else None
+
+
+def get_url(attach_name: str) -> Optional[str]:
+    """
+    The URL (AttachLive or AttachHis) the attachment was last fetched from.
+    """
+    with _db() as conn:
+        row = conn.execute(
+            "SELECT url FROM filings WHERE attach_name = ?", (attach_name,)
+        ).fetchone()
+    return row[0] if row else None
+
+
+def put_pdf(attach_name: str, url: str, pdf_file: BinaryIO) -> str:
+    """
+    Copy a downloaded PDF (any readable binary file object) into the store
+    and return its path. The file object is rewound afterwards.
+    """
+    name = _file_name(attach_name)
+    path = os.path.join(FILING_STORE_DIR, name)
+    os.makedirs(FILING_STORE_DIR, exist_ok=True)
+
+    pdf_file.seek(0)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as out:
+        shutil.copyfileobj(pdf_file, out)
+    os.replace(tmp_path, path)
+    pdf_file.seek(0)
+
+    now = time.time()
+    with _db() as conn:
+        conn.execute(
+            "INSERT INTO filings (attach_name, url, pdf_file, pdf_bytes, created_at, last_used_at) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(attach_name) DO UPDATE SET "
+            "url = excluded.url, pdf_file = excluded.pdf_file, "
+            "pdf_bytes = excluded.pdf_bytes, last_used_at = excluded.last_used_at",
+            (attach_name, url, name, os.path.getsize(path), now, now),
+        )
+
+    _evict()
+    return path
+
+
+def put_text(attach_name: str, url: str, text: str, max_chars: int, complete: bool):
+    now = time.time()
+    with _db() as conn:
+        conn.execute(
+            "INSERT INTO filings "
+            "(attach_name, url, text, text_budget, text_complete, created_at, last_used_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(attach_name) DO UPDATE SET "
+            "url = excluded.url, text = excluded.text, text_budget = excluded.text_budget, "
+            "text_complete = excluded.text_complete, last_used_at = excluded.last_used_at",
+            (attach_name, url, text, max_chars, int(complete), now, now),
+        )
+
+    _evict()
+
+
+def _evict():
+    """
+    Keep PDFs + text under FILING_STORE_MAX_BYTES, dropping the least
+    recently used filings first.
+    """
+    with _evict_lock:
+        with _db() as conn:
+            (total,) = conn.execute(
+                f"SELECT COALESCE(SUM({_ROW_BYTES}), 0) FROM filings"
+            ).fetchone()
+            if total <= FILING_STORE_MAX_BYTES:
+                return
+
+            victims = []
+            for attach_name, pdf_file, size in conn.execute(
+                f"SELECT attach_name, pdf_file, {_ROW_BYTES} "
+                "FROM filings ORDER BY last_used_at ASC"
+            ):
+                if total <= FILING_STORE_MAX_BYTES:
+                    break
+                victims.append((attach_name, pdf_file))
+                total -= size
+
+            conn.executemany(
+                "DELETE FROM filings WHERE attach_name = ?",
+                [(attach_name,) for attach_name, _ in victims],
+            )
+
+        for _, pdf_file in victims:
+            if pdf_file:
+                try:
+                    os.remove(os.path.join(FILING_STORE_DIR, pdf_file))
+                except OSError:
+                    pass
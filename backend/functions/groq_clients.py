@@ -0,0 +1,94 @@
+# functions/groq_clients.py
+
+import os
+import threading
+from typing import Optional
+
+import httpx
+from dotenv import load_dotenv
+from groq import Groq
+from agno.models.groq import Groq as AgnoGroq
+
+# --------------------------------------------------------------------
+# CONFIG
+# --------------------------------------------------------------------
+
+load_dotenv()
+
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+# Connection pool shared by every Groq call in the process
+GROQ_MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", 20))
+GROQ_KEEPALIVE_CONNECTIONS = int(os.getenv("GROQ_KEEPALIVE_CONNECTIONS", 10))
+GROQ_KEEPALIVE_EXPIRY = float(os.getenv("GROQ_KEEPALIVE_EXPIRY", 60))
+GROQ_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", 60))
+# Retries on 429 / 5xx / connection errors. The SDK backs off exponentially
+# and honours the retry-after header Groq sends with rate limit errors.
+GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", 4))
+
+_lock = threading.Lock()
+_http_client: Optional[httpx.Client] = None
+_client: Optional[Groq] = None
+
+
+# --------------------------------------------------------------------
+# SHARED CLIENTS
+# --------------------------------------------------------------------
+
+def get_http_client() -> httpx.Client:
+    """
+    Process-wide keep-alive pool, so TLS handshakes happen once per
+    connection instead of once per call. httpx.Client is thread-safe.
+    """
+    global _http_client
+    with _lock:
+        if _http_client is None or _http_client.is_closed:
+            _http_client = httpx.Client(
+                timeout=GROQ_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=GROQ_MAX_CONNECTIONS,
+                    max_keepalive_connections=GROQ_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=GROQ_KEEPALIVE_EXPIRY,
+                ),
+            )
+        return _http_client
+
+
+def get_groq_client() -> Groq:
+    """
+    Shared Groq SDK client on top of the shared pool.
+    """
+    global _client
+    http_client = get_http_client()
+    with _lock:
+        if _client is None or _client.is_closed():
+            if not GROQ_API_KEY:
+                raise RuntimeError("GROQ_API_KEY not found in environment (.env)")
+            _client = Groq(
+                api_key=GROQ_API_KEY,
+                timeout=GROQ_TIMEOUT,
+                max_retries=GROQ_MAX_RETRIES,
+                http_client=http_client,
+            )
+        return _client
+
+
+def groq_model(model_id: str) -> AgnoGroq:
+    """
+    Agno model that reuses the shared Groq client instead of opening its own
+    connection. Use this wherever an Agent is built with a Groq model.
+    """
+    return AgnoGroq(
+        id=model_id,
+        client=get_groq_client(),
+        timeout=GROQ_TIMEOUT,
+        max_retries=GROQ_MAX_RETRIES,
+    )
+
+
+def close_clients():
+    global _http_client, _client
+    with _lock:
+        if _http_client is not None:
+            _http_client.close()
+        _http_client = None
+        _client = None
@@ -0,0 +1,166 @@
+# functions/image_prep.py
+
+import hashlib
+import os
+import threading
+from typing import Any, Dict, Tuple
+
+from dotenv import load_dotenv
+
+from .chart_cache import CHART_CACHE_DIR, image_digest
+
+# Pillow is optional: without it images are passed through unchanged
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# --------------------------------------------------------------------
+# CONFIG
+# --------------------------------------------------------------------
+
+load_dotenv()
+
+# Derived (resized / re-encoded) images, named after the source image hash
+CHART_DERIVED_DIR = os.path.join(CHART_CACHE_DIR, "derived")
+
+
+def _crop_fractions(value: str) -> Tuple[float, float, float, float]:
+    """
+    "left,top,right,bottom" as fractions of the image size, each 0..0.5.
+    """
+    parts = [float(p) for p in value.split(",")]
+    if len(parts) != 4:
+        raise ValueError(f"Expected 4 crop fractions, got: {value!r}")
+    return tuple(min(max(p, 0.0), 0.5) for p in parts)
+
+
+# Vision model input. The default crop trims the right price axis and the
+# bottom time axis, which carry labels but no pattern information.
+# Charts are flat colour, so a small-palette PNG beats JPEG on size and has
+# no compression artefacts around thin wicks.
+# Grayscale is off by default: the up/down candle colours have almost the
+# same luminance, so grayscale makes them hard to tell apart.
+VISION_IMAGE = {
+    "max_width": int(os.getenv("VISION_IMAGE_MAX_WIDTH", 1024)),
+    "grayscale": os.getenv("VISION_IMAGE_GRAYSCALE", "false").lower() in ("1", "true", "yes"),
+    "format": os.getenv("VISION_IMAGE_FORMAT", "png").lower(),
+    "quality": int(os.getenv("VISION_IMAGE_QUALITY", 85)),
+    # PNG only: quantize to this many colours (0 = keep full colour)
+    "colors": int(os.getenv("VISION_IMAGE_COLORS", 64)),
+    "crop": _crop_fractions(os.getenv("VISION_IMAGE_CROP", "0,0,0.04,0.035")),
+}
+
+# Small preview for API responses
+THUMBNAIL_IMAGE = {
+    "max_width": int(os.getenv("THUMBNAIL_MAX_WIDTH", 480)),
+    "grayscale": False,
+    "format": os.getenv("THUMBNAIL_FORMAT", "webp").lower(),
+    "quality": int(os.getenv("THUMBNAIL_QUALITY", 70)),
+    "colors": 0,
+    "crop": (0.0, 0.0, 0.0, 0.0),
+}
+
+IMAGE_PROFILES: Dict[str, Dict[str, Any]] = {
+    "vision": VISION_IMAGE,
+    "thumbnail": THUMBNAIL_IMAGE,
+}
+
+FORMATS = {
+    "jpeg": ("JPEG", ".jpg", "image/jpeg"),
+    "webp": ("WEBP", ".webp", "image/webp"),
+    "png": ("PNG", ".png", "image/png"),
+}
+
+for _name, _profile in IMAGE_PROFILES.items():
+    if _profile["format"] not in FORMATS:
+        raise RuntimeError(
+            f"Unsupported {_name} image format {_profile['format']!r}; "
+            f"use one of {sorted(FORMATS)}"
+        )
+
+
+# --------------------------------------------------------------------
+# PREPROCESSING
+# --------------------------------------------------------------------
+
+def profile_signature(profile: str) -> str:
+    """
+    Short stable id of a profile's settings ("original" when Pillow is not
+    installed). Part of every derived file name and of the vision result
+    cache key, so changing a setting never reuses stale output.
+    """
+    if Image is None:
+        return "original"
+    settings = IMAGE_PROFILES[profile]
+    raw = repr(sorted(settings.items()))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:10]
+
+
+def image_mime(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    for _, suffix, mime in FORMATS.values():
+        if ext == suffix:
+            return mime
+    return "image/png"
+
+
+def _transform(source_path: str, settings: Dict[str, Any], out_path: str):
+    pil_format = FORMATS[settings["format"]][0]
+
+    with Image.open(source_path) as img:
+        img.load()
+
+    width, height = img.size
+    left, top, right, bottom = settings["crop"]
+    if any(settings["crop"]):
+        img = img.crop((
+            int(width * left),
+            int(height * top),
+            width - int(width * right),
+            height - int(height * bottom),
+        ))
+
+    if img.width > settings["max_width"]:
+        new_height = max(1, round(img.height * settings["max_width"] / img.width))
+        img = img.resize((settings["max_width"], new_height), Image.LANCZOS)
+
+    if settings["grayscale"]:
+        img = img.convert("L")
+    elif img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+
+    if pil_format == "PNG" and settings["colors"]:
+        img = img.quantize(colors=min(256, settings["colors"]))
+
+    save_kwargs = {"optimize": True}
+    if pil_format in ("JPEG", "WEBP"):
+        save_kwargs["quality"] = settings["quality"]
+
+    tmp_path = f"{out_path}.{threading.get_ident()}.tmp"
+    img.save(tmp_path, format=pil_format, **save_kwargs)
+    os.replace(tmp_path, out_path)
+
+
+def prepare_image(path: str, profile: str = "vision") -> str:
+    """
+    Return the path of `path` resized / cropped / re-encoded for the given
+    profile ("vision" or "thumbnail"). Results are written once under
+    CHART_DERIVED_DIR and reused for the same source image and settings.
+    Without Pillow the original path is returned.
+    """
+    if Image is None:
+        return path
+
+    settings = IMAGE_PROFILES[profile]
+    suffix = FORMATS[settings["format"]][1]
+    name = f"{image_digest(path)}.{profile}.{profile_signature(profile)}{suffix}"
+    out_path = os.path.abspath(os.path.join(CHART_DERIVED_DIR, name))
+
+    # No lock: each writer renders to its own temp file and os.replace makes
+    # the result appear atomically, so concurrent callers at worst repeat
+    # the transform for the same output
+    if not os.path.exists(out_path):
+        os.makedirs(CHART_DERIVED_DIR, exist_ok=True)
+        _transform(path, settings, out_path)
+    return out_path
@@ -0,0 +1,146 @@
+# functions/job_queue.py
+
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class JobQueue:
+    """
+    Small in-process job queue with a fixed pool of worker threads.
+
+    - At most `workers` jobs run at the same time; the rest wait in FIFO order.
+    - Jobs are deduplicated by `key`: submitting a key that is already queued
+      or running returns the existing job instead of starting a second one.
+    - Finished jobs are kept (up to `history`) so clients can poll their status.
+    """
+
+    def __init__(self, workers: int = 2, history: int = 500, name: str = "jobs"):
+        self.name = name
+        self.history = history
+
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._tasks: Dict[str, tuple] = {}
+        self._inflight: Dict[str, str] = {}  # key -> job_id
+
+        self._workers: List[threading.Thread] = []
+        for i in range(max(1, workers)):
+            t = threading.Thread(
+                target=self._worker_loop,
+                name=f"{name}-worker-{i + 1}",
+                daemon=True,
+            )
+            t.start()
+            self._workers.append(t)
+
+    # ----------------------------------------------------------------
+    # Public API
+    # ----------------------------------------------------------------
+
+    def submit(self, key: str, fn: Callable, *args, **kwargs) -> Dict[str, Any]:
+        """
+        Queue fn(*args, **kwargs) under `key` and return the job status dict.
+        If a job with the same key is still queued/running, that job is returned.
+        """
+        with self._lock:
+            existing_id = self._inflight.get(key)
+            if existing_id:
+                return self._snapshot(self._jobs[existing_id])
+
+            job_id = uuid.uuid4().hex
+            job = {
+                "id": job_id,
+                "key": key,
+                "status": JOB_QUEUED,
+                "submittedAt": time.time(),
+                "startedAt": None,
+                "finishedAt": None,
+                "result": None,
+                "error": None,
+            }
+            self._jobs[job_id] = job
+            self._tasks[job_id] = (fn, args, kwargs)
+            self._inflight[key] = job_id
+            self._trim_history()
+
+        self._queue.put(job_id)
+        return self._snapshot(job)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._snapshot(job) if job else None
+
+    def latest_for_key(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Most recently submitted job for `key` (in-flight or finished).
+        """
+        with self._lock:
+            for job in reversed(self._jobs.values()):
+                if job["key"] == key:
+                    return self._snapshot(job)
+        return None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counts = {JOB_QUEUED: 0, JOB_RUNNING: 0, JOB_DONE: 0, JOB_FAILED: 0}
+            for job in self._jobs.values():
+                counts[job["status"]] += 1
+        counts["workers"] = len(self._workers)
+        return counts
+
+    # ----------------------------------------------------------------
+    # Internals
+    # ----------------------------------------------------------------
+
+    def _worker_loop(self):
+        while True:
+            job_id = self._queue.get()
+            with self._lock:
+                job = self._jobs.get(job_id)
+                fn, args, kwargs = self._tasks.pop(job_id)
+                job["status"] = JOB_RUNNING
+                job["startedAt"] = time.time()
+
+            try:
+                result = fn(*args, **kwargs)
+                status, error = JOB_DONE, None
+            except Exception as e:
+                print(f"[{self.name}] job {job['key']} failed: {e}")
+                result, status, error = None, JOB_FAILED, f"{e}"
+
+            with self._lock:
+                job["status"] = status
+                job["result"] = result
+                job["error"] = error
+                job["finishedAt"] = time.time()
+                if self._inflight.get(job["key"]) == job_id:
+                    del self._inflight[job["key"]]
+
+            self._queue.task_done()
+
+    def _trim_history(self):
+        # Drop the oldest finished jobs; queued/running jobs are never evicted
+        excess = len(self._jobs) - self.history
+        if excess <= 0:
+            return
+        for job_id in list(self._jobs.keys()):
+            if excess <= 0:
+                break
+            if self._jobs[job_id]["status"] in (JOB_DONE, JOB_FAILED):
+                del self._jobs[job_id]
+                excess -= 1
+
+    @staticmethod
+    def _snapshot(job: Dict[str, Any]) -> Dict[str, Any]:
+        return dict(job)
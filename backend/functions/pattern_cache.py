@@ -0,0 +1,159 @@
+# functions/pattern_cache.py
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+# --------------------------------------------------------------------
+# CONFIG
+# --------------------------------------------------------------------
+
+load_dotenv()
+
+PATTERN_CACHE_DB = os.getenv("PATTERN_CACHE_DB", "./charts/pattern_cache.sqlite")
+# Max rows kept on disk; least recently used rows are evicted first
+PATTERN_CACHE_MAX_ENTRIES = int(os.getenv("PATTERN_CACHE_MAX_ENTRIES", 5000))
+# Hot entries also kept in process memory for sub-millisecond hits
+PATTERN_CACHE_MEMORY_ENTRIES = int(os.getenv("PATTERN_CACHE_MEMORY_ENTRIES", 512))
+
+# (image sha256, vision model id, prompt version)
+CacheKey = Tuple[str, str, str]
+
+
+class PatternCache:
+    """
+    Two-level LRU cache for chart pattern results: an in-memory OrderedDict
+    in front of a SQLite table. Keys include the vision model and prompt
+    version, so changing either naturally misses instead of serving stale
+    answers.
+    """
+
+    def __init__(
+        self,
+        db_path: str = PATTERN_CACHE_DB,
+        max_entries: int = PATTERN_CACHE_MAX_ENTRIES,
+        memory_entries: int = PATTERN_CACHE_MEMORY_ENTRIES,
+    ):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[CacheKey, Dict[str, Any]]" = OrderedDict()
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+        }
+
+    # ----------------------------------------------------------------
+    # Public API
+    # ----------------------------------------------------------------
+
+    def get(self, key: CacheKey) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return dict(self._memory[key])
+
+        with self._db() as conn:
+            row = conn.execute(
+                "SELECT result_json FROM pattern_results "
+                "WHERE image_sha256 = ? AND model = ? AND prompt_version = ?",
+                key,
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE pattern_results SET last_used_at = ? "
+                    "WHERE image_sha256 = ? AND model = ? AND prompt_version = ?",
+                    (time.time(), *key),
+                )
+
+        with self._lock:
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["disk_hits"] += 1
+            result = json.loads(row[0])
+            self._remember(key, result)
+            return dict(result)
+
+    def put(self, key: CacheKey, result: Dict[str, Any]):
+        now = time.time()
+        with self._db() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO pattern_results "
+                "(image_sha256, model, prompt_version, result_json, created_at, last_used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (*key, json.dumps(result), now, now),
+            )
+            (count,) = conn.execute("SELECT COUNT(*) FROM pattern_results").fetchone()
+            excess = count - self.max_entries
+            if excess > 0:
+                conn.execute(
+                    "DELETE FROM pattern_results WHERE rowid IN ("
+                    "SELECT rowid FROM pattern_results ORDER BY last_used_at ASC LIMIT ?)",
+                    (excess,),
+                )
+
+        with self._lock:
+            self._stats["stores"] += 1
+            self._stats["evictions"] += max(0, excess)
+            self._remember(key, result)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round(
+            (stats["memory_hits"] + stats["disk_hits"]) / lookups, 3
+        ) if lookups else 0.0
+        return stats
+
+    # ----------------------------------------------------------------
+    # Internals
+    # ----------------------------------------------------------------
+
+    def _remember(self, key: CacheKey, result: Dict[str, Any]):
+        # Caller holds self._lock
+        self._memory[key] = dict(result)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    @contextmanager
+    def _db(self):
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS pattern_results (
+                        image_sha256 TEXT NOT NULL,
+                        model TEXT NOT NULL,
+                        prompt_version TEXT NOT NULL,
+                        result_json TEXT NOT NULL,
+                        created_at REAL NOT NULL,
+                        last_used_at REAL NOT NULL,
+                        PRIMARY KEY (image_sha256, model, prompt_version)
+                    )
+                    """
+                )
+                yield conn
+        finally:
+            conn.close()
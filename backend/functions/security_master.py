@@ -0,0 +1,381 @@
+# functions/security_master.py
+
+import bisect
+import heapq
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+# --------------------------------------------------------------------
+# CONFIG
+# --------------------------------------------------------------------
+
+load_dotenv()
+
+# Same file the frontend ships (client/public/data/master-stock.json)
+SECURITY_MASTER_PATH = os.getenv(
+    "SECURITY_MASTER_PATH",
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "..", "..", "client", "public", "data", "master-stock.json",
+    ),
+)
+
+# How often (seconds) the file's mtime is checked for hot reload
+SECURITY_MASTER_RELOAD_INTERVAL = float(os.getenv("SECURITY_MASTER_RELOAD_INTERVAL", 10))
+
+# Search key kinds (lower sorts first when ranking)
+KEY_SYMBOL, KEY_ISIN, KEY_NAME = 0, 1, 2
+# Share of the query's trigrams a key must contain to count as a fuzzy match
+FUZZY_MIN_OVERLAP = 0.6
+
+# BSE equity scripcodes are 6 digits starting with 5 (RELIANCE = 500325).
+# Anything else in the master file is treated as bad data and not used.
+_BSE_EQUITY_SCRIPCODE = re.compile(r"^5\d{5}$")
+
+# Suffixes ignored when matching issuer / security names
+_NAME_SUFFIXES = re.compile(r"\b(LIMITED|LTD|CO|COMPANY|CORPORATION|CORP|INC)\b")
+
+
+# --------------------------------------------------------------------
+# KEY NORMALIZATION
+# --------------------------------------------------------------------
+
+def symbol_key(identifier: str) -> str:
+    """
+    'NSE:RELIANCE', 'reliance.ns', 'RELIANCE#' -> 'RELIANCE'
+    """
+    key = (identifier or "").strip().upper()
+    if ":" in key:
+        key = key.split(":", 1)[1]
+    for suffix in (".NS", ".BO"):
+        if key.endswith(suffix):
+            key = key[: -len(suffix)]
+    return key.rstrip("#").strip()
+
+
+def name_key(name: str) -> str:
+    """
+    '3M India Ltd.' and '3M INDIA LIMITED' -> '3MINDIA'
+    """
+    upper = (name or "").upper().replace("&", " AND ")
+    upper = re.sub(r"[^A-Z0-9 ]+", " ", upper)
+    return re.sub(r"\s+", "", _NAME_SUFFIXES.sub(" ", upper))
+
+
+# --------------------------------------------------------------------
+# INDEX
+# --------------------------------------------------------------------
+
+def trigrams(key: str) -> set:
+    return {key[i:i + 3] for i in range(len(key) - 2)}
+
+
+def scripcode(entry: Dict[str, Any]) -> Optional[str]:
+    """
+    The entry's BSE scripcode, or None if missing or not a valid BSE
+    equity code.
+    """
+    code = str(entry.get("bse_scripcode") or "").strip()
+    return code if _BSE_EQUITY_SCRIPCODE.match(code) else None
+
+
+def identifiers(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Every identifier form of a master entry.
+    """
+    base = symbol_key(entry.get("nse_symbol") or entry.get("id"))
+    return {
+        "base": base,
+        "yahoo": f"{base}.NS",
+        "tv": f"NSE:{base}",
+        "scripcode": scripcode(entry),
+        "isin": entry.get("isin"),
+        "name": entry.get("issuer_name") or entry.get("security_name"),
+    }
+
+
+class SecurityMaster:
+    """
+    In-memory index over the master stock list with O(1) lookups by NSE
+    symbol, ISIN, BSE scripcode and issuer/security name, plus prefix
+    search. The file is reloaded automatically when it changes on disk.
+    """
+
+    def __init__(self, path: str = SECURITY_MASTER_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: List[Dict[str, Any]] = []
+        self._by_symbol: Dict[str, Dict[str, Any]] = {}
+        self._by_isin: Dict[str, Dict[str, Any]] = {}
+        self._by_scripcode: Dict[str, Dict[str, Any]] = {}
+        self._by_name: Dict[str, Dict[str, Any]] = {}
+        # Search index: sorted (key, kind, position) for prefix matches and
+        # trigram -> {(key, kind, position)} for substring / fuzzy matches
+        self._prefix_keys: List[Tuple[str, int, int]] = []
+        self._trigrams: Dict[str, set] = {}
+        self._browse_order: List[int] = []
+        self._loaded = False
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+
+    def load(self):
+        mtime = os.path.getmtime(self.path)
+        with open(self.path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+
+        by_symbol, by_isin, by_scripcode, by_name = {}, {}, {}, {}
+        ambiguous_names = set()
+        bad_scripcodes = 0
+        for entry in entries:
+            for raw in (entry.get("nse_symbol"), entry.get("id")):
+                if raw:
+                    by_symbol.setdefault(symbol_key(raw), entry)
+            if entry.get("isin"):
+                by_isin.setdefault(entry["isin"].strip().upper(), entry)
+            if scripcode(entry):
+                by_scripcode.setdefault(scripcode(entry), entry)
+            elif entry.get("bse_scripcode"):
+                bad_scripcodes += 1
+            for raw in {name_key(entry.get("issuer_name")), name_key(entry.get("security_name"))}:
+                if not raw:
+                    continue
+                if raw in by_name and by_name[raw] is not entry:
+                    ambiguous_names.add(raw)
+                by_name.setdefault(raw, entry)
+
+        # A name shared by two securities identifies neither
+        for raw in ambiguous_names:
+            by_name.pop(raw, None)
+
+        prefix_keys = set()
+        for position, entry in enumerate(entries):
+            prefix_keys.add((symbol_key(entry.get("nse_symbol") or entry.get("id")), KEY_SYMBOL, position))
+            if entry.get("isin"):
+                prefix_keys.add((entry["isin"].strip().upper(), KEY_ISIN, position))
+            for name in (entry.get("issuer_name"), entry.get("security_name")):
+                if name_key(name):
+                    prefix_keys.add((name_key(name), KEY_NAME, position))
+
+        trigram_index: Dict[str, set] = {}
+        for item in prefix_keys:
+            if item[1] == KEY_ISIN:
+                continue  # ISINs are only matched by prefix
+            for gram in trigrams(item[0]):
+                trigram_index.setdefault(gram, set()).add(item)
+
+        with self._lock:
+            self._entries = entries
+            self._by_symbol = by_symbol
+            self._by_isin = by_isin
+            self._by_scripcode = by_scripcode
+            self._by_name = by_name
+            self._prefix_keys = sorted(prefix_keys)
+            self._trigrams = trigram_index
+            self._browse_order = [p for _, kind, p in self._prefix_keys if kind == KEY_SYMBOL]
+            self._mtime = mtime
+            self._checked_at = time.time()
+            self._loaded = True
+
+        print(f"[SecurityMaster] Loaded {len(entries)} securities from {self.path}")
+        if bad_scripcodes:
+            print(f"[SecurityMaster] Ignored {bad_scripcodes} invalid BSE scripcodes")
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            self._maybe_reload()
+            return
+        try:
+            self.load()
+        except (OSError, ValueError) as e:
+            # No master file: every lookup misses and callers use their fallbacks
+            print(f"[SecurityMaster] Could not load {self.path}: {e}")
+            self._checked_at = time.time()
+            self._loaded = True
+
+    def _maybe_reload(self):
+        """
+        Hot reload: at most every SECURITY_MASTER_RELOAD_INTERVAL seconds,
+        re-read the file if its mtime changed. A broken file keeps the
+        previous index.
+        """
+        now = time.time()
+        with self._lock:
+            if now - self._checked_at < SECURITY_MASTER_RELOAD_INTERVAL:
+                return
+            self._checked_at = now
+
+        try:
+            if os.path.getmtime(self.path) != self._mtime:
+                self.load()
+        except (OSError, ValueError) as e:
+            print(f"[SecurityMaster] Reload of {self.path} failed, keeping old index: {e}")
+
+    def lookup(self, identifier: str) -> Optional[Dict[str, Any]]:
+        """
+        Entry for a scripcode, ISIN, NSE / Yahoo / TradingView symbol or
+        issuer name, or None.
+        """
+        self._ensure_loaded()
+        raw = (identifier or "").strip().upper()
+        if not raw:
+            return None
+
+        if raw.isdigit():
+            return self._by_scripcode.get(raw)
+        return (
+            self._by_isin.get(raw)
+            or self._by_symbol.get(symbol_key(raw))
+            or self._by_name.get(name_key(raw))
+        )
+
+    def search(self, query: str, limit: int = 10, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Ranked top-`limit` matches over NSE symbol, ISIN and issuer/security
+        name. Tiers, best first:
+          exact symbol > symbol prefix > ISIN prefix > name prefix
+          > symbol substring > name substring > fuzzy (trigram overlap)
+        Ties go to shorter keys, then alphabetical. Prefixes use binary
+        search on the sorted keys; substring and fuzzy matches come from the
+        trigram index, so no query scans the whole list. An empty query
+        lists securities by symbol (for browsing). `offset` skips that many
+        ranked results (paging).
+        """
+        self._ensure_loaded()
+        keys = self._prefix_keys
+        queries = {symbol_key(query), name_key(query)} - {""}
+        if not queries:
+            page = self._browse_order[offset:offset + limit]
+            return [self._entries[position] for position in page]
+
+        best: Dict[int, Tuple] = {}
+
+        def offer(score: Tuple, position: int):
+            if position not in best or score < best[position]:
+                best[position] = score
+
+        for q in queries:
+            # Prefix matches
+            i = bisect.bisect_left(keys, (q,))
+            while i < len(keys) and keys[i][0].startswith(q):
+                key, kind, position = keys[i]
+                if kind == KEY_SYMBOL and key == q:
+                    tier = 0
+                else:
+                    tier = {KEY_SYMBOL: 1, KEY_ISIN: 2, KEY_NAME: 3}[kind]
+                offer((tier, len(key), key), position)
+                i += 1
+
+            # Substring and fuzzy matches via trigrams
+            grams = trigrams(q)
+            if not grams:
+                continue
+            counts: Dict[Tuple[str, int, int], int] = {}
+            for gram in grams:
+                for item in self._trigrams.get(gram, ()):
+                    counts[item] = counts.get(item, 0) + 1
+
+            for (key, kind, position), shared in counts.items():
+                if q in key:
+                    tier = 4 if kind == KEY_SYMBOL else 5
+                    offer((tier, len(key), key), position)
+                elif shared / len(grams) >= FUZZY_MIN_OVERLAP:
+                    offer((6, -shared, len(key), key), position)
+
+        top = heapq.nsmallest(offset + limit, best.items(), key=lambda kv: kv[1])
+        return [self._entries[position] for position, _ in top[offset:]]
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self._entries)
+
+
+security_master = SecurityMaster()
+
+
+# --------------------------------------------------------------------
+# SYMBOL NORMALIZATION
+# --------------------------------------------------------------------
+
+def normalize_symbol(raw_symbol: str) -> Dict[str, Any]:
+    """
+    Take whatever the frontend sends (e.g. 'RELIANCE.NS', 'NSE:RELIANCE', '500325', 'RELIANCE')
+    and derive:
+      - base: e.g. 'RELIANCE'
+      - yahoo: e.g. 'RELIANCE.NS'
+      - tv: e.g. 'NSE:RELIANCE'
+      - bse_identifier: BSE scripcode (or base name) for BSE helper
+      - isin, name: from the security master, None if unknown
+
+    Known securities (scripcode, ISIN, NSE/Yahoo/TradingView symbol,
+    '#'-suffixed master id or company name) are resolved through the
+    security master; anything else falls back to string heuristics. An
+    unknown numeric code is taken as a BSE scripcode (Yahoo '<code>.BO').
+    """
+    sym = (raw_symbol or "").strip().upper()
+
+    entry = security_master.lookup(sym)
+    if entry is not None:
+        ids = identifiers(entry)
+        return {
+            "raw": sym,
+            "base": ids["base"],
+            "yahoo": ids["yahoo"],
+            "tv": ids["tv"],
+            "bse_identifier": ids["scripcode"] or ids["base"],
+            "isin": ids["isin"],
+            "name": ids["name"],
+        }
+
+    sym = sym.rstrip("#")
+
+    base = sym
+    yahoo = sym
+    tv = sym
+    bse_identifier = sym
+
+    # Case 1: TradingView-style "NSE:RELIANCE"
+    if ":" in sym:
+        _, base_part = sym.split(":", 1)
+        base_part = base_part.strip().upper()
+        base = base_part
+        yahoo = base_part + ".NS"
+        tv = "NSE:" + base_part
+        bse_identifier = base_part
+
+    # Case 2: Yahoo-style "RELIANCE.NS"
+    elif sym.endswith(".NS"):
+        base_part = sym[:-3]
+        base = base_part
+        yahoo = sym
+        tv = "NSE:" + base_part
+        bse_identifier = base_part
+
+    # Case 3: pure digits -> BSE code not in the master
+    elif sym.isdigit():
+        base = sym
+        yahoo = sym + ".BO"  # Yahoo lists BSE securities by scripcode
+        tv = sym     # TradingView has no numeric BSE symbols; left as-is
+        bse_identifier = sym  # BSE helper already accepts numeric scripcode
+
+    # Case 4: plain name like "RELIANCE"
+    else:
+        base = sym
+        yahoo = sym + ".NS"
+        tv = "NSE:" + sym
+        bse_identifier = sym
+
+    return {
+        "raw": sym,
+        "base": base,
+        "yahoo": yahoo,
+        "tv": tv,
+        "bse_identifier": bse_identifier,
+        "isin": None,
+        "name": None,
+    }
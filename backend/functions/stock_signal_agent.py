@@ -4,9 +4,11 @@ from typing import Dict, List, Literal
 from pydantic import BaseModel, Field
 
 from agno.agent import Agent
-from agno.models.groq import Groq
 from agno.tools.duckduckgo import DuckDuckGoTools
 
+from .batch_executor import upstream_limit
+from .groq_clients import groq_model
+
 
 # ---------- INPUT (what we feed from backend) ----------
 
@@ -51,7 +53,7 @@ class StockSignalOutput(BaseModel):
 # ---------- AGNO AGENT ----------
 
 stock_signal_agent = Agent(
-    model=Groq(id="llama-3.3-70b-versatile"),
+    model=groq_model("llama-3.3-70b-versatile"),
     input_schema=StockSignalInput,
     output_schema=StockSignalOutput,
     description=(
@@ -69,5 +71,6 @@ def run_stock_signal(input_data: StockSignalInput) -> StockSignalOutput:
     """
     Wrapper for Flask: runs agent and returns a Pydantic StockSignalOutput.
     """
-    resp = stock_signal_agent.run(input=input_data)
+    with upstream_limit("groq"):
+        resp = stock_signal_agent.run(input=input_data)
     return resp.content
@@ -0,0 +1,147 @@
+# functions/summary_cache.py
+
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+# --------------------------------------------------------------------
+# CONFIG
+# --------------------------------------------------------------------
+
+load_dotenv()
+
+SUMMARY_CACHE_DB = os.getenv("SUMMARY_CACHE_DB", "./downloads/summary_cache.sqlite")
+
+# (attachment name, input sha256, model id, prompt version)
+SummaryKey = Tuple[str, str, str, str]
+
+# Guards the counters only; SQLite (WAL + busy timeout) handles concurrent
+# access to the database itself
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "stores": 0, "invalidated": 0}
+
+# Database file whose schema has been set up by this process
+_schema_lock = threading.Lock()
+_schema_ready_for: Optional[str] = None
+
+
+# --------------------------------------------------------------------
+# STORAGE
+# --------------------------------------------------------------------
+
+def _ensure_schema(conn: sqlite3.Connection):
+    global _schema_ready_for
+    if _schema_ready_for == SUMMARY_CACHE_DB:
+        return
+    with _schema_lock:
+        if _schema_ready_for == SUMMARY_CACHE_DB:
+            return
+        # WAL lets readers run alongside a writer
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS summaries (
+                attach_name TEXT NOT NULL,
+                input_sha256 TEXT NOT NULL,
+                model TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (attach_name, input_sha256, model, prompt_version)
+            )
+            """
+        )
+        _schema_ready_for = SUMMARY_CACHE_DB
+
+
+def _connect() -> sqlite3.Connection:
+    db_dir = os.path.dirname(SUMMARY_CACHE_DB)
+    if db_dir:
+        os.makedirs(db_dir, exist_ok=True)
+    conn = sqlite3.connect(SUMMARY_CACHE_DB, timeout=30)
+    _ensure_schema(conn)
+    return conn
+
+
+@contextmanager
+def _db():
+    conn = _connect()
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _count(name: str, delta: int = 1):
+    with _lock:
+        _stats[name] += delta
+
+
+# --------------------------------------------------------------------
+# PUBLIC API
+# --------------------------------------------------------------------
+
+def get_summary(key: SummaryKey) -> Optional[str]:
+    with _db() as conn:
+        row = conn.execute(
+            "SELECT summary FROM summaries "
+            "WHERE attach_name = ? AND input_sha256 = ? AND model = ? AND prompt_version = ?",
+            key,
+        ).fetchone()
+    _count("hits" if row else "misses")
+    return row[0] if row else None
+
+
+def put_summary(key: SummaryKey, summary: str):
+    with _db() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO summaries "
+            "(attach_name, input_sha256, model, prompt_version, summary, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (*key, summary, time.time()),
+        )
+    _count("stores")
+
+
+def invalidate(
+    attach_name: Optional[str] = None,
+    model: Optional[str] = None,
+    prompt_version: Optional[str] = None,
+) -> int:
+    """
+    Delete cached summaries matching every given filter (all of them when no
+    filter is given). Returns the number of rows removed.
+    """
+    filters = {
+        "attach_name": attach_name,
+        "model": model,
+        "prompt_version": prompt_version,
+    }
+    clauses = [f"{column} = ?" for column, value in filters.items() if value is not None]
+    params = [value for value in filters.values() if value is not None]
+
+    sql = "DELETE FROM summaries"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+
+    with _db() as conn:
+        removed = conn.execute(sql, params).rowcount
+    _count("invalidated", removed)
+    return removed
+
+
+def get_summary_cache_stats() -> Dict[str, Any]:
+    with _db() as conn:
+        (entries,) = conn.execute("SELECT COUNT(*) FROM summaries").fetchone()
+    with _lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["entries"] = entries
+    stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+    return stats
@@ -1,12 +1,22 @@
 import os
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 from functools import wraps
 
-from flask import Flask, request, jsonify
+from flask import (
+    Flask,
+    Response,
+    jsonify,
+    request,
+    send_file,
+    stream_with_context,
+)
 from flask_cors import CORS
 from dotenv import load_dotenv
-import threading
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+from urllib.parse import quote
 
 
 
@@ -16,12 +26,45 @@ from firebase_admin import credentials, auth, firestore as admin_fs
 from google.cloud import firestore as gc_fs
 import requests
 
-from functions.bse_news import summarize_announcements_for_stock
-from functions.chart_maker import get_tradingview_chart_screenshot
-from functions.chart_prediction import detect_chart_pattern, encode_image
+from functions.batch_executor import (
+    UPSTREAM_LIMITS,
+    iter_concurrent,
+    map_concurrent,
+    upstream_limit,
+)
+from functions.bse_news import get_summary_batch_stats, summarize_announcements_for_stock
+from functions.chart_cache import (
+    chart_artifact,
+    lookup_chart,
+    store_chart,
+)
+from functions.chart_maker import (
+    driver_pool,
+    get_capture_stats,
+    get_tradingview_chart_screenshots,
+    resolve_driver_path,
+)
+from functions.chart_prediction import (
+    detect_chart_pattern,
+    detect_chart_patterns,
+    encode_image,
+    get_normalization_stats,
+    get_pattern_cache_stats,
+    get_vision_batch_stats,
+)
+from functions.chart_renderer import render_candlestick_chart
+from functions.image_prep import (
+    image_mime,
+    prepare_image,
+    profile_signature,
+)
 from functions.financial_ratios import analyze_stock_ratios
 from functions.financial_ratios import get_ratios_for_ticker
+from functions.job_queue import JOB_QUEUED, JOB_RUNNING, JobQueue
+from functions.security_master import identifiers, normalize_symbol, security_master
 from functions.stock_signal_agent import StockSignalInput, run_stock_signal
+from functions.summary_cache import get_summary_cache_stats
+from functions.summary_cache import invalidate as invalidate_summaries
 
 
 
@@ -32,6 +75,18 @@ load_dotenv()
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
 
+# Resolve chromedriver once at startup instead of on every screenshot
+try:
+    resolve_driver_path()
+except Exception as e:
+    print(f"[startup] chromedriver not resolved yet, will retry on first chart: {e}")
+
+# Symbol index used by normalize_symbol and symbol search
+try:
+    security_master.load()
+except Exception as e:
+    print(f"[startup] security master not loaded, will retry on first lookup: {e}")
+
 # ================== FIREBASE SETUP ===================
 
 FIREBASE_CREDENTIALS = os.getenv("FIREBASE_CREDENTIALS", "firebase_credentials.json")
@@ -52,6 +107,17 @@ db = admin_fs.client()
 ArrayUnion = gc_fs.ArrayUnion
 ArrayRemove = gc_fs.ArrayRemove
 SERVER_TIMESTAMP = gc_fs.SERVER_TIMESTAMP
+DELETE_FIELD = gc_fs.DELETE_FIELD
+
+# ================== BACKGROUND JOBS ==================
+
+# Worker count bounds how many symbol refreshes (Chrome + Groq) run at once
+CACHE_WORKERS = int(os.getenv("CACHE_WORKERS", 2))
+cache_jobs = JobQueue(workers=CACHE_WORKERS, name="cache")
+
+# Firebase uids allowed to call /admin routes, in addition to users with an
+# "admin" custom claim
+ADMIN_UIDS = {uid.strip() for uid in os.getenv("ADMIN_UIDS", "").split(",") if uid.strip()}
 
 FIREBASE_SIGNIN_URL = (
     f"https://identitytoolkit.googleapis.com/v1/accounts:signInWithPassword?key={WEB_API_KEY}"
@@ -78,62 +144,54 @@ def verify_firebase_token(f):
     return wrapper
 
 
-def normalize_symbol(raw_symbol: str) -> Dict[str, str]:
-    """
-    Take whatever the frontend sends (e.g. 'RELIANCE.NS', 'NSE:RELIANCE', '500325', 'RELIANCE')
-    and derive:
-      - base: e.g. 'RELIANCE'
-      - yahoo: e.g. 'RELIANCE.NS'
-      - tv: e.g. 'NSE:RELIANCE'
-      - bse_identifier: base name or numeric code for BSE helper
-
-    This is a simple heuristic for Indian largecaps; you can refine later.
-    """
-    sym = (raw_symbol or "").strip().upper()
-
-    base = sym
-    yahoo = sym
-    tv = sym
-    bse_identifier = sym
-
-    # Case 1: TradingView-style "NSE:RELIANCE"
-    if ":" in sym:
-        _, base_part = sym.split(":", 1)
-        base_part = base_part.strip().upper()
-        base = base_part
-        yahoo = base_part + ".NS"
-        tv = "NSE:" + base_part
-        bse_identifier = base_part
-
-    # Case 2: Yahoo-style "RELIANCE.NS"
-    elif sym.endswith(".NS"):
-        base_part = sym[:-3]
-        base = base_part
-        yahoo = sym
-        tv = "NSE:" + base_part
-        bse_identifier = base_part
-
-    # Case 3: pure digits -> BSE code
-    elif sym.isdigit():
-        base = sym
-        yahoo = sym  # may not be valid, but we leave as-is
-        tv = sym     # likely invalid for TV
-        bse_identifier = sym  # BSE helper already accepts numeric scripcode
-
-    # Case 4: plain name like "RELIANCE"
-    else:
-        base = sym
-        yahoo = sym + ".NS"
-        tv = "NSE:" + sym
-        bse_identifier = sym
-
-    return {
-        "raw": sym,
-        "base": base,
-        "yahoo": yahoo,
-        "tv": tv,
-        "bse_identifier": bse_identifier,
+def require_admin(f):
+    """
+    Use after @verify_firebase_token: only admins (custom claim or ADMIN_UIDS).
+    """
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        user = getattr(request, "user", None) or {}
+        if not user.get("admin") and user.get("uid") not in ADMIN_UIDS:
+            return jsonify({"error": "Forbidden"}), 403
+        return f(*args, **kwargs)
+
+    return wrapper
+
+
+# ====================== SYMBOL SEARCH ==========================
+
+@app.route("/symbols/search", methods=["GET"])
+def search_symbols():
+    """
+    Ranked autocomplete over the security master (NSE symbol, ISIN, issuer
+    name), so clients do not need to download master-stock.json.
+
+    GET /symbols/search?q=relia&limit=10&offset=0   (empty q = all securities by symbol)
+
+    Response:
+    {
+      "query": "relia",
+      "results": [
+        {<master-stock.json fields>,
+         "base": "RELIANCE", "yahoo": "RELIANCE.NS", "tv": "NSE:RELIANCE",
+         "scripcode": "...", "name": "..."}
+      ],
+      "next_offset": 10 or null    # offset of the next page, null on the last one
     }
+    Public, like the master-stock.json file it is built from.
+    """
+    query = (request.args.get("q") or "").strip()
+    try:
+        limit = min(max(int(request.args.get("limit", 10)), 1), 100)
+        offset = max(int(request.args.get("offset", 0)), 0)
+    except ValueError:
+        return jsonify({"error": "Params 'limit' and 'offset' must be integers"}), 400
+
+    # One extra result tells whether another page exists
+    entries = security_master.search(query, limit=limit + 1, offset=offset)
+    results = [{**entry, **identifiers(entry)} for entry in entries[:limit]]
+    next_offset = offset + limit if len(entries) > limit else None
+    return jsonify({"query": query, "results": results, "next_offset": next_offset}), 200
 
 
 # ====================== BASIC HEALTH ==========================
@@ -142,6 +200,47 @@ def normalize_symbol(raw_symbol: str) -> Dict[str, str]:
 def health_check():
     return jsonify({"status": "ok"}), 200
 
+
+@app.route("/metrics", methods=["GET"])
+@verify_firebase_token
+def get_metrics():
+    """
+    Performance counters for the analysis pipeline.
+    """
+    return jsonify(
+        {
+            "chart_capture": get_capture_stats(),
+            "pattern_cache": get_pattern_cache_stats(),
+            "pattern_normalization": get_normalization_stats(),
+            "pattern_batching": get_vision_batch_stats(),
+            "summary_cache": get_summary_cache_stats(),
+            "summary_batching": get_summary_batch_stats(),
+            "cache_jobs": cache_jobs.stats(),
+        }
+    ), 200
+
+
+@app.route("/admin/summary-cache/invalidate", methods=["POST"])
+@verify_firebase_token
+@require_admin
+def invalidate_summary_cache():
+    """
+    Body (all optional, combined with AND; empty body clears everything):
+    {
+      "attachment_name": "<uuid>.pdf",
+      "model": "llama-3.3-70b-versatile",
+      "prompt_version": "1"
+    }
+    """
+    data = request.get_json(silent=True) or {}
+    removed = invalidate_summaries(
+        attach_name=data.get("attachment_name") or None,
+        model=data.get("model") or None,
+        prompt_version=data.get("prompt_version") or None,
+    )
+    print(f"[Admin] {request.user.get('uid')} invalidated {removed} cached summaries")
+    return jsonify({"removed": removed}), 200
+
 # ======================= AUTH ROUTES ==========================
 
 @app.route("/user/signup", methods=["POST"])
@@ -333,21 +432,19 @@ def add_to_wishlist():
     doc = user_ref.get()
     wishlist = doc.to_dict().get("wishlist", [])
 
-    # 🔥 Run heavy compute in background thread
-    def _worker():
-        try:
-            compute_and_cache_stock_for_user(uid, symbol)
-        except Exception as e:
-            print(f"[cache worker] error for {symbol}: {e}")
-
-    threading.Thread(target=_worker, daemon=True).start()
+    # Link the per-user entry now; the heavy compute goes to the bounded job
+    # queue, deduplicated per symbol so concurrent adds share one refresh.
+    mapping = normalize_symbol(symbol)
+    link_stock_cache_for_user(uid, mapping)
+    job = cache_jobs.submit(mapping["yahoo"], refresh_symbol_analysis, mapping)
 
     # Respond immediately
     return jsonify(
         {
             "userID": uid,
             "wishlist": wishlist,
-            "status": "wishlist updated; cache refresh started in background",
+            "job": job,
+            "status": "wishlist updated; cache refresh queued",
         }
     ), 200
 
@@ -380,8 +477,116 @@ def remove_from_wishlist():
 
     return jsonify({"userID": uid, "wishlist": wishlist}), 200
 
+# ======================== JOB STATUS ROUTES ======================
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+@verify_firebase_token
+def get_job_status(job_id):
+    """
+    Poll a background cache job returned by /me/wishlist/add or
+    /me/refresh-cache.
+
+    Response:
+    {
+      "id": "...",
+      "key": "RELIANCE.NS",
+      "status": "queued" | "running" | "done" | "failed",
+      "submittedAt": 1700000000.0,
+      "startedAt": ...,
+      "finishedAt": ...,
+      "result": [...],   # components recomputed
+      "error": null
+    }
+    """
+    job = cache_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job), 200
+
+
+@app.route("/jobs", methods=["GET"])
+@verify_firebase_token
+def get_job_for_symbol():
+    """
+    Latest background cache job for a symbol: /jobs?symbol=RELIANCE.NS
+    Without a symbol, returns queue counters.
+    """
+    symbol = request.args.get("symbol")
+    if not symbol:
+        return jsonify(cache_jobs.stats()), 200
+
+    job = cache_jobs.latest_for_key(normalize_symbol(symbol)["yahoo"])
+    if job is None:
+        return jsonify({"error": "No job for this symbol"}), 404
+    return jsonify(job), 200
+
+# ================= STREAMING BATCH RESPONSES ===================
+
+STREAM_MIMETYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
+
+
+def _requested_stream_format(data: Dict[str, Any]) -> Optional[str]:
+    """
+    Streaming is opt-in: body field "stream" ("ndjson" / "sse" / true),
+    or an Accept header asking for NDJSON or SSE. Otherwise None (plain JSON).
+    """
+    fmt = data.get("stream")
+    if fmt is True:
+        return "ndjson"
+    if isinstance(fmt, str) and fmt.lower() in STREAM_MIMETYPES:
+        return fmt.lower()
+
+    best = request.accept_mimetypes.best_match(
+        ["application/json", *STREAM_MIMETYPES.values()]
+    )
+    for name, mimetype in STREAM_MIMETYPES.items():
+        if best == mimetype:
+            return name
+    return None
+
+
+def _stream_batch_response(results, fmt: str) -> Response:
+    """
+    Stream (key, result) pairs as they complete, one { "<key>": result }
+    object per NDJSON line / SSE "result" event. Merging all chunks gives
+    the same payload as the non-streaming response. SSE ends with "done".
+    """
+    def generate():
+        for key, result in results:
+            chunk = json.dumps({key: result}, default=str)
+            if fmt == "sse":
+                yield f"event: result\ndata: {chunk}\n\n"
+            else:
+                yield chunk + "\n"
+        if fmt == "sse":
+            yield "event: done\ndata: {}\n\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype=STREAM_MIMETYPES[fmt],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # ===================== BSE SUMMARIES ROUTE =====================
 
+def _summarize_stock(
+    stock: str,
+    days: int,
+    max_news: int,
+    batch: Optional[bool] = None,
+) -> Dict[str, Any]:
+    # BSE / Groq slots are taken inside, per upstream call
+    return summarize_announcements_for_stock(
+        stock_identifier=stock,
+        days=days,
+        max_news=max_news,
+        batch=batch,
+    )
+
+
 @app.route("/summaries", methods=["POST"])
 @verify_firebase_token
 def get_summaries():
@@ -391,8 +596,13 @@ def get_summaries():
     {
       "stocks": ["RELIANCE", "TCS", "500112"],
       "days": 60,               # optional (default 60)
-      "max_news_per_stock": 3   # optional (default 3)
+      "max_news_per_stock": 3,  # optional (default 3)
+      "batch_summaries": false, # optional: several filings per LLM request
+      "stream": "ndjson"        # optional: "ndjson" | "sse" (default: one JSON object)
     }
+
+    In streaming mode each stock is sent as { "<stock>": { ...result... } }
+    as soon as it is ready (see _stream_batch_response).
     """
     data = request.get_json(silent=True)
 
@@ -405,26 +615,235 @@ def get_summaries():
 
     days = data.get("days", 60)
     max_news_per_stock = data.get("max_news_per_stock", 3)
+    batch_summaries = data.get("batch_summaries")
+    if batch_summaries is not None and not isinstance(batch_summaries, bool):
+        return jsonify({"error": "Field 'batch_summaries' must be a boolean"}), 400
 
-    response_payload = {}
+    stream_format = _requested_stream_format(data)
 
-    for stock in stocks:
-        if not isinstance(stock, str):
-            continue
+    stocks = list(dict.fromkeys(s for s in stocks if isinstance(s, str)))
 
-        result = summarize_announcements_for_stock(
-            stock_identifier=stock,
-            days=days,
-            max_news=max_news_per_stock,
-        )
+    run = iter_concurrent if stream_format else map_concurrent
+    batch = run(
+        lambda stock: _summarize_stock(stock, days, max_news_per_stock, batch_summaries),
+        stocks,
+    )
+    results = (
+        (stock, result if error is None else {
+            "stock": stock,
+            "scripcode": None,
+            "news": [],
+            "error": f"Error summarizing stock: {error}",
+        })
+        for stock, result, error in batch
+    )
+
+    if stream_format:
+        return _stream_batch_response(results, stream_format)
 
-        # Final JSON will be: { "<stock>": { ...result... }, ... }
-        response_payload[stock] = result
+    # Final JSON will be: { "<stock>": { ...result... }, ... }
+    response_payload = dict(results)
 
     return jsonify(response_payload), 200
 
 # ================== CHART PATTERN ROUTE ========================
 
+CHARTS_DIR = "./charts"
+
+# "tradingview" (Selenium screenshot) or "local" (rendered from OHLCV data)
+CHART_RENDERERS = ("tradingview", "local")
+CHART_RENDERER = os.getenv("CHART_RENDERER", "tradingview")
+# Default for /chart-patterns "batch_vision": several charts per vision call
+CHART_BATCH_VISION = os.getenv("CHART_BATCH_VISION", "false").lower() in ("1", "true", "yes")
+
+# How /chart-patterns returns the chart image:
+#   url       - link to /charts/<symbol>/<interval> (chart_image_url), cacheable
+#   base64    - full image inline (chart_image_base64)
+#   thumbnail - small preview inline (chart_image_base64 + chart_image_mime)
+#   none      - no image
+CHART_IMAGE_MODES = ("url", "base64", "thumbnail", "none")
+CHART_IMAGE_MODE = os.getenv("CHART_IMAGE_MODE", "url")
+
+
+def _chart_output_path(tv_symbol: str, interval: str, renderer: str = "tradingview") -> str:
+    safe_symbol = tv_symbol.replace(":", "_").replace("/", "_")
+    suffix = "_local" if renderer == "local" else ""
+    return os.path.join(CHARTS_DIR, f"{safe_symbol}_{interval}{suffix}.png")
+
+
+def _render_local_chart(tv_symbol: str, interval: str) -> str:
+    with upstream_limit("yahoo"):
+        return render_candlestick_chart(
+            yahoo_symbol=normalize_symbol(tv_symbol)["yahoo"],
+            interval=interval,
+            output_path=_chart_output_path(tv_symbol, interval, "local"),
+        )
+
+
+def _capture_charts(
+    symbols: List[str],
+    interval: str,
+    renderer: str = "tradingview",
+    max_sessions: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Chart images for many symbols, reusing the chart cache: a symbol whose
+    latest candle was already captured (same trading day for "D") is served
+    from the content-addressed store without a screenshot or render.
+
+    Returns symbol -> image path, or the Exception for that symbol.
+    """
+    captures: Dict[str, Any] = {}
+    missing = []
+    for symbol in symbols:
+        cached_path = lookup_chart(symbol, interval, renderer)
+        if cached_path:
+            captures[symbol] = cached_path
+        else:
+            missing.append(symbol)
+
+    if missing:
+        for symbol, path in _produce_charts(missing, interval, renderer, max_sessions).items():
+            if isinstance(path, str):
+                path = store_chart(symbol, interval, path, renderer)
+            captures[symbol] = path
+    return captures
+
+
+def _session_chunks(
+    symbols: List[str],
+    renderer: str = "tradingview",
+    max_sessions: Optional[int] = None,
+) -> List[List[str]]:
+    """
+    Split symbols into the units captured together: one chunk per allowed
+    browser session for TradingView, one symbol per chunk for local renders.
+    """
+    if renderer == "local":
+        return [[symbol] for symbol in symbols]
+    sessions = min(len(symbols), UPSTREAM_LIMITS["tradingview"], driver_pool.size)
+    if max_sessions is not None:
+        sessions = min(sessions, max_sessions)
+    sessions = max(1, sessions)
+    return [symbols[i::sessions] for i in range(sessions)]
+
+
+def _produce_charts(
+    symbols: List[str],
+    interval: str,
+    renderer: str = "tradingview",
+    max_sessions: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Produce chart images for many symbols at once.
+
+    TradingView: symbols are split across the allowed browser sessions
+    (at most `max_sessions`) and each session captures its share in one
+    browser (chart_maker.get_tradingview_chart_screenshots).
+    Local: candles are drawn from OHLCV data, no browser involved.
+
+    A single chunk runs in the calling thread, so this is safe to call from
+    batch_executor workers.
+
+    Returns symbol -> image path, or the Exception for that symbol.
+    """
+    def _capture_chunk(chunk: List[str]) -> Dict[str, Any]:
+        if renderer == "local":
+            return {symbol: _render_local_chart(symbol, interval) for symbol in chunk}
+        with upstream_limit("tradingview"):
+            return get_tradingview_chart_screenshots(
+                {symbol: _chart_output_path(symbol, interval) for symbol in chunk},
+                interval=interval,
+            )
+
+    chunks = _session_chunks(symbols, renderer, max_sessions)
+    if len(chunks) == 1:
+        try:
+            return _capture_chunk(chunks[0])
+        except Exception as e:
+            return {symbol: e for symbol in chunks[0]}
+
+    captures: Dict[str, Any] = {}
+    for chunk, chunk_result, error in map_concurrent(_capture_chunk, chunks):
+        if error is not None:
+            chunk_result = {symbol: error for symbol in chunk}
+        captures.update(chunk_result)
+    return captures
+
+
+def _chart_url(symbol: str, interval: str, renderer: str) -> str:
+    return f"/charts/{quote(symbol, safe=':')}/{quote(interval)}?renderer={renderer}"
+
+
+def _chart_image_fields(image_path: str, image_mode: str, url: str) -> Dict[str, Any]:
+    if image_mode == "base64":
+        return {
+            "chart_image_base64": encode_image(image_path),
+            "chart_image_mime": image_mime(image_path),
+        }
+    if image_mode == "thumbnail":
+        thumbnail = prepare_image(image_path, "thumbnail")
+        return {
+            "chart_image_base64": encode_image(thumbnail),
+            "chart_image_mime": image_mime(thumbnail),
+        }
+    if image_mode == "url":
+        return {"chart_image_url": url}
+    return {}
+
+
+def _analyze_chart_symbol(
+    symbol: str,
+    interval: str,
+    image_mode: str,
+    screenshot: Any = None,
+    pattern: Any = None,
+    renderer: str = CHART_RENDERER,
+) -> Dict[str, Any]:
+    """
+    `screenshot` is a path (or Exception) from _capture_charts; when None the
+    chart is captured here on its own. `pattern` is a result (or Exception)
+    from batched detection; when None the vision model is called here.
+    """
+    result = {
+        "symbol": symbol,
+        "interval": interval,
+        "chart_image_base64": None,
+        "chart_image_mime": None,
+        "chart_image_url": None,
+        "pattern": None,
+        "error": None,
+    }
+
+    try:
+        # 1) Get chart screenshot
+        if screenshot is None:
+            screenshot = _capture_charts([symbol], interval, renderer)[symbol]
+        if isinstance(screenshot, Exception):
+            raise screenshot
+        screenshot_path = screenshot
+
+        # 2) Optional: image (inline, thumbnail or URL) for frontend display
+        try:
+            result.update(_chart_image_fields(
+                screenshot_path, image_mode, _chart_url(symbol, interval, renderer)
+            ))
+        except Exception as e:
+            result["error"] = f"Error encoding image: {e}"
+
+        # 3) Detect pattern using Groq vision
+        if pattern is None:
+            pattern = detect_chart_pattern(screenshot_path)
+        if isinstance(pattern, Exception):
+            raise pattern
+        result["pattern"] = pattern
+
+    except Exception as e:
+        result["error"] = f"Error during chart processing: {e}"
+
+    return result
+
+
 @app.route("/chart-patterns", methods=["POST"])
 @verify_firebase_token
 def chart_patterns():
@@ -436,7 +855,11 @@ def chart_patterns():
     {
       "symbols": ["NSE:RELIANCE", "NSE:TCS"],
       "interval": "D",                 # optional (default "D")
-      "include_image_base64": true     # optional (default true)
+      "image": "url",                  # optional: "url" (default) | "base64" | "thumbnail" | "none"
+      "include_image_base64": true,    # legacy: same as "image": "base64" (false = "none")
+      "renderer": "tradingview",       # optional: "tradingview" | "local" (OHLCV render)
+      "batch_vision": false,           # optional: several charts per vision call
+      "stream": "sse"                  # optional: "ndjson" | "sse" (default: one JSON object)
     }
 
     Response:
@@ -446,6 +869,8 @@ def chart_patterns():
         "symbol": "NSE:RELIANCE",
         "interval": "D",
         "chart_image_base64": "<base64-string> or null",
+        "chart_image_mime": "image/png" or null,
+        "chart_image_url": "/charts/NSE:RELIANCE/D?renderer=tradingview" or null,
         "pattern": {
           "pattern_found": true,
           "pattern_name": "Double Bottom",
@@ -469,60 +894,126 @@ def chart_patterns():
         return jsonify({"error": "Field 'symbols' must be a non-empty list"}), 400
 
     interval = data.get("interval", "D")
-    include_image_base64 = data.get("include_image_base64", True)
+    if "image" in data:
+        image_mode = data["image"]
+    elif "include_image_base64" in data:
+        image_mode = "base64" if data["include_image_base64"] else "none"
+    else:
+        image_mode = CHART_IMAGE_MODE
+    if image_mode not in CHART_IMAGE_MODES:
+        return jsonify({"error": f"Field 'image' must be one of {list(CHART_IMAGE_MODES)}"}), 400
 
-    # Ensure charts directory exists
-    charts_dir = "./charts"
-    os.makedirs(charts_dir, exist_ok=True)
+    renderer = data.get("renderer", CHART_RENDERER)
+    if renderer not in CHART_RENDERERS:
+        return jsonify({"error": f"Field 'renderer' must be one of {list(CHART_RENDERERS)}"}), 400
 
-    response_payload = {}
+    # Ensure charts directory exists
+    os.makedirs(CHARTS_DIR, exist_ok=True)
 
-    for symbol in symbols:
-        if not isinstance(symbol, str):
-            continue
+    stream_format = _requested_stream_format(data)
 
-        result = {
-            "symbol": symbol,
-            "interval": interval,
-            "chart_image_base64": None,
-            "pattern": None,
-            "error": None,
-        }
+    symbols = list(dict.fromkeys(s for s in symbols if isinstance(s, str)))
+    batch_vision = data.get("batch_vision", CHART_BATCH_VISION)
 
-        try:
-            safe_symbol = symbol.replace(":", "_").replace("/", "_")
-            output_path = os.path.join(
-                charts_dir,
-                f"{safe_symbol}_{interval}.png"
-            )
-
-            # 1) Get chart screenshot
-            screenshot_path = get_tradingview_chart_screenshot(
-                tv_symbol=symbol,
-                interval=interval,
-                output_path=output_path,
+    def _analyze_captured(chunk: List[str], captures: Dict[str, Any], run):
+        # Optional: answer several charts per vision request
+        patterns: Dict[str, Any] = {}
+        if batch_vision:
+            patterns = detect_chart_patterns(
+                {s: path for s, path in captures.items() if isinstance(path, str)}
             )
 
-            # 2) Optional: include base64 image for frontend display
-            if include_image_base64:
-                try:
-                    img_b64 = encode_image(screenshot_path)
-                    result["chart_image_base64"] = img_b64
-                except Exception as e:
-                    result["error"] = f"Error encoding image: {e}"
+        batch = run(
+            lambda symbol: _analyze_chart_symbol(
+                symbol,
+                interval,
+                image_mode,
+                screenshot=captures.get(symbol),
+                pattern=patterns.get(symbol),
+                renderer=renderer,
+            ),
+            chunk,
+        )
+        for symbol, result, error in batch:
+            yield symbol, result if error is None else {
+                "symbol": symbol,
+                "interval": interval,
+                "chart_image_base64": None,
+                "chart_image_mime": None,
+                "chart_image_url": None,
+                "pattern": None,
+                "error": f"Error during chart processing: {error}",
+            }
 
-            # 3) Detect pattern using Groq vision
-            pattern_info = detect_chart_pattern(screenshot_path)
-            result["pattern"] = pattern_info
+    if stream_format:
+        # Each browser session's chunk is analyzed and sent as soon as its
+        # screenshots are done, while the other sessions keep capturing
+        def _streamed_results():
+            for chunk, captures, error in iter_concurrent(
+                lambda chunk: _capture_charts(chunk, interval, renderer, max_sessions=1),
+                _session_chunks(symbols, renderer),
+            ):
+                if error is not None:
+                    captures = {symbol: error for symbol in chunk}
+                yield from _analyze_captured(chunk, captures, iter_concurrent)
 
-        except Exception as e:
-            result["error"] = f"Error during chart processing: {e}"
+        return _stream_batch_response(_streamed_results(), stream_format)
 
-        response_payload[symbol] = result
+    # 1) All screenshots in batched browser sessions, 2) vision per symbol
+    captures = _capture_charts(symbols, interval, renderer)
+    response_payload = dict(_analyze_captured(symbols, captures, map_concurrent))
 
     return jsonify(response_payload), 200
 
 
+@app.route("/charts/<symbol>/<interval>", methods=["GET"])
+def chart_for_symbol(symbol: str, interval: str):
+    """
+    Latest cached chart image for a symbol, e.g. GET /charts/NSE:TCS/D
+
+    Query params:
+      renderer = "tradingview" | "local"   (default CHART_RENDERER)
+      size     = "full" | "thumbnail"      (default "full")
+
+    The ETag is the image content hash and Last-Modified the capture time,
+    so a repeat load whose chart has not changed gets a 304 with no body.
+    Returns 404 until the chart has been captured (/chart-patterns or the
+    cache refresh). Not behind auth so the URL works in an <img> tag.
+    """
+    renderer = request.args.get("renderer", CHART_RENDERER)
+    if renderer not in CHART_RENDERERS:
+        return jsonify({"error": f"Param 'renderer' must be one of {list(CHART_RENDERERS)}"}), 400
+
+    size = request.args.get("size", "full")
+    if size not in ("full", "thumbnail"):
+        return jsonify({"error": "Param 'size' must be 'full' or 'thumbnail'"}), 400
+
+    artifact = chart_artifact(symbol, interval, renderer)
+    if artifact is None:
+        return jsonify({"error": f"No chart cached for {symbol} ({interval})"}), 404
+
+    path, etag = artifact["path"], artifact["sha256"]
+    if size == "thumbnail":
+        path = prepare_image(path, "thumbnail")
+        etag = f"{etag}-{profile_signature('thumbnail')}"
+
+    response = send_file(
+        path,
+        mimetype=image_mime(path),
+        etag=etag,
+        last_modified=artifact["created_at"],
+        conditional=True,
+    )
+    # Same URL, new image on every candle: always revalidate
+    response.cache_control.no_cache = True
+    return response
+
+
+def _analyze_ratios(ticker: str) -> Dict[str, Any]:
+    with upstream_limit("yahoo"):
+        return analyze_stock_ratios(ticker)
+
+
 @app.route("/ratios", methods=["POST"])
 @verify_firebase_token
 def get_ratios():
@@ -561,18 +1052,47 @@ def get_ratios():
     if not isinstance(symbols, list) or not symbols:
         return jsonify({"error": "Field 'symbols' must be a non-empty list"}), 400
 
-    response_payload = {}
+    tickers = list(dict.fromkeys(s.strip().upper() for s in symbols if isinstance(s, str)))
 
-    for sym in symbols:
-        if not isinstance(sym, str):
-            continue
+    response_payload = {}
 
-        sym_clean = sym.strip().upper()
-        result = analyze_stock_ratios(sym_clean)
+    for sym_clean, result, error in map_concurrent(_analyze_ratios, tickers):
+        if error is not None:
+            result = {
+                "ticker": sym_clean,
+                "source": "Yahoo Finance",
+                "ratios": None,
+                "error": str(error),
+            }
         response_payload[sym_clean] = result
 
     return jsonify(response_payload), 200
 
+def _predict_ticker(ticker: str) -> Dict[str, Any]:
+    # 1) Deterministic math: compute ratios in Python
+    with upstream_limit("yahoo"):
+        ratios = get_ratios_for_ticker(ticker)
+    if ratios is None:
+        return {
+            "error": "Could not fetch financial data for this ticker."
+        }
+
+    # 2) Build StockSignalInput for the agent
+    ctx = StockSignalInput(
+        ticker=ticker,
+        ratios=ratios,
+    )
+
+    try:
+        # 3) Run the Agno agent (with DuckDuckGo tool)
+        signal = run_stock_signal(ctx)
+        return signal.model_dump()
+    except Exception as e:
+        return {
+            "error": f"Agent error: {str(e)}"
+        }
+
+
 @app.route("/prediction", methods=["POST"])
 @verify_firebase_token
 def prediction():
@@ -607,36 +1127,14 @@ def prediction():
     if not isinstance(symbols, list) or not symbols:
         return jsonify({"error": "Field 'symbols' must be a non-empty list"}), 400
 
-    result = {}
-
-    for sym in symbols:
-        if not isinstance(sym, str):
-            continue
+    tickers = list(dict.fromkeys(s.strip().upper() for s in symbols if isinstance(s, str)))
 
-        ticker = sym.strip().upper()
-
-        # 1) Deterministic math: compute ratios in Python
-        ratios = get_ratios_for_ticker(ticker)
-        if ratios is None:
-            result[ticker] = {
-                "error": "Could not fetch financial data for this ticker."
-            }
-            continue
+    result = {}
 
-        # 2) Build StockSignalInput for the agent
-        ctx = StockSignalInput(
-            ticker=ticker,
-            ratios=ratios,
-        )
-
-        try:
-            # 3) Run the Agno agent (with DuckDuckGo tool)
-            signal = run_stock_signal(ctx)
-            result[ticker] = signal.model_dump()
-        except Exception as e:
-            result[ticker] = {
-                "error": f"Agent error: {str(e)}"
-            }
+    for ticker, prediction_result, error in map_concurrent(_predict_ticker, tickers):
+        if error is not None:
+            prediction_result = {"error": f"Prediction error: {error}"}
+        result[ticker] = prediction_result
 
     return jsonify(result), 200
 
@@ -673,13 +1171,27 @@ def get_my_cached_stocks():
     wishlist = doc.to_dict().get("wishlist", [])
 
     cache_col = user_ref.collection("stock_cache")
-    cached_docs = cache_col.stream()
+    cached_docs = [d.to_dict() or {} for d in cache_col.stream()]
+
+    # Per-user docs only reference the shared analysis; resolve them in one read
+    analysis_refs = [
+        db.document(data["analysisRef"])
+        for data in cached_docs
+        if data.get("analysisRef")
+    ]
+    analyses = {}
+    if analysis_refs:
+        for snap in db.get_all(analysis_refs):
+            if snap.exists:
+                analyses[snap.reference.path] = snap.to_dict() or {}
 
     stocks = {}
-    for d in cached_docs:
-        data = d.to_dict() or {}
-        symbol = data.get("symbol") or d.id
-        stocks[symbol] = data
+    for data in cached_docs:
+        analysis = analyses.get(data.get("analysisRef"), {})
+        entry = {**data, **analysis}
+        symbol = entry.get("symbol")
+        if symbol:
+            stocks[symbol] = entry
 
     return jsonify({"userID": uid, "wishlist": wishlist, "stocks": stocks}), 200
 
@@ -687,10 +1199,21 @@ def get_my_cached_stocks():
 @verify_firebase_token
 def refresh_my_cache():
     """
-    Recompute and overwrite cached data for all stocks in user's wishlist.
+    Bring cached data up to date for all stocks in user's wishlist.
     Useful when user clicks 'Refresh' on dashboard.
+
+    Optional JSON body:
+    {
+      "force": false   # true recomputes every component, ignoring TTLs
+    }
+
+    Responds right away with one cache job per symbol ({"jobs": {symbol:
+    job}}); poll them with /jobs/<job_id>.
     """
     uid = request.user["uid"]
+    body = request.get_json(silent=True) or {}
+    force = bool(body.get("force", False))
+
     user_ref = db.collection("users").document(uid)
     doc = user_ref.get()
 
@@ -701,113 +1224,318 @@ def refresh_my_cache():
     wishlist = data.get("wishlist", [])
 
     if not wishlist:
-        return jsonify({"userID": uid, "refreshed": [], "message": "Wishlist is empty"}), 200
+        return jsonify({"userID": uid, "jobs": {}, "message": "Wishlist is empty"}), 200
+
+    # Same path as /me/wishlist/add: the compute runs on the bounded job
+    # queue, deduplicated per symbol, so concurrent refreshes share one job.
+    mappings = {symbol: normalize_symbol(symbol) for symbol in wishlist}
+    in_flight = {
+        mapping["yahoo"]
+        for mapping in mappings.values()
+        if (cache_jobs.latest_for_key(mapping["yahoo"]) or {}).get("status")
+        in (JOB_QUEUED, JOB_RUNNING)
+    }
 
-    refreshed = []
-    errors = {}
+    # Capture every chart that needs refreshing up front, in shared browser
+    # sessions, instead of one page load per job. Symbols that already have
+    # a job in flight are left to that job.
+    captures = _capture_charts(
+        _stale_chart_symbols(
+            (m for m in mappings.values() if m["yahoo"] not in in_flight), force
+        ),
+        "D",
+        CHART_RENDERER,
+    )
 
-    for symbol in wishlist:
+    jobs = {}
+    errors = {}
+    for symbol, mapping in mappings.items():
         try:
-            compute_and_cache_stock_for_user(uid, symbol)
-            refreshed.append(symbol)
+            link_stock_cache_for_user(uid, mapping)
         except Exception as e:
             errors[symbol] = str(e)
+            continue
+        jobs[symbol] = cache_jobs.submit(
+            mapping["yahoo"],
+            refresh_symbol_analysis,
+            mapping,
+            force=force,
+            chart_screenshot=captures.get(mapping["tv"]),
+        )
 
     return jsonify(
         {
             "userID": uid,
-            "refreshed": refreshed,
+            "jobs": jobs,
             "errors": errors,
+            "status": "cache refresh queued",
         }
     ), 200
 
+# ================ SHARED SYMBOL ANALYSIS STORE ================
+
+# Analysis is computed once per symbol into stock_analysis/{yahoo_symbol}.
+# users/{uid}/stock_cache/{yahoo_symbol} only references that document.
+ANALYSIS_COLLECTION = "stock_analysis"
+
+# How long (seconds) each component stays fresh before it is recomputed
+ANALYSIS_TTLS = {
+    "bse_summaries": int(os.getenv("ANALYSIS_TTL_BSE_SUMMARIES", 6 * 3600)),
+    "chart_pattern": int(os.getenv("ANALYSIS_TTL_CHART_PATTERN", 6 * 3600)),
+    "ratios": int(os.getenv("ANALYSIS_TTL_RATIOS", 24 * 3600)),
+    "signal": int(os.getenv("ANALYSIS_TTL_SIGNAL", 6 * 3600)),
+}
+
+ANALYSIS_ERROR_FIELDS = {
+    "bse_summaries": "bse_error",
+    "chart_pattern": "chart_error",
+    "ratios": "ratios_error",
+    "signal": "signal_error",
+}
 
+# Wall-clock budget (seconds) for each stage of a symbol refresh
+STAGE_TIMEOUTS = {
+    "bse_summaries": float(os.getenv("STAGE_TIMEOUT_BSE_SUMMARIES", 180)),
+    "chart_pattern": float(os.getenv("STAGE_TIMEOUT_CHART_PATTERN", 120)),
+    "ratios": float(os.getenv("STAGE_TIMEOUT_RATIOS", 60)),
+    "signal": float(os.getenv("STAGE_TIMEOUT_SIGNAL", 90)),
+}
 
-def compute_and_cache_stock_for_user(uid: str, symbol: str):
+
+def _analysis_is_fresh(analysis: Dict[str, Any], component: str, now: float) -> bool:
+    fetched_at = (analysis.get("fetchedAt") or {}).get(component)
+    if component not in analysis or not fetched_at:
+        return False
+    return now - float(fetched_at) < ANALYSIS_TTLS[component]
+
+
+def _compute_bse_summaries(mapping: Dict[str, str]) -> Dict[str, Any]:
+    return _summarize_stock(mapping["bse_identifier"], days=60, max_news=3)
+
+
+def _stale_chart_symbols(mappings, force: bool = False) -> List[str]:
     """
-    For a given user + stock symbol:
-    - compute BSE summaries (using bse_identifier)
-    - compute chart pattern (using tv symbol)
-    - compute financial ratios (using yahoo symbol)
-    - run agentic prediction
-    - save everything into users/{uid}/stock_cache/{yahoo_symbol}
+    TradingView symbols whose shared chart_pattern needs recomputing.
     """
-    mapping = normalize_symbol(symbol)
-    raw_symbol = mapping["raw"]
-    base_symbol = mapping["base"]
-    yahoo_symbol = mapping["yahoo"]
+    mappings = list(mappings)
+    refs = [db.collection(ANALYSIS_COLLECTION).document(m["yahoo"]) for m in mappings]
+    analyses = {
+        snap.id: snap.to_dict() or {}
+        for snap in (db.get_all(refs) if refs else [])
+        if snap.exists
+    }
+
+    now = time.time()
+    stale = [
+        m["tv"]
+        for m in mappings
+        if force or not _analysis_is_fresh(analyses.get(m["yahoo"], {}), "chart_pattern", now)
+    ]
+    return list(dict.fromkeys(stale))
+
+
+def _compute_chart_pattern(mapping: Dict[str, str], screenshot: Any = None) -> Dict[str, Any]:
+    os.makedirs(CHARTS_DIR, exist_ok=True)
+
     tv_symbol = mapping["tv"]
-    bse_identifier = mapping["bse_identifier"]
 
-    user_ref = db.collection("users").document(uid)
-    cache_ref = user_ref.collection("stock_cache").document(yahoo_symbol)
-
-    cache_data = {
-        "symbol": yahoo_symbol,
-        "raw_symbol": raw_symbol,
-        "base_symbol": base_symbol,
-        "tv_symbol": tv_symbol,
-        "bse_identifier": bse_identifier,
-        "updatedAt": SERVER_TIMESTAMP,
-    }
+    # Reuse a screenshot from a batched capture when the caller has one
+    if screenshot is None:
+        screenshot = _capture_charts([tv_symbol], "D", CHART_RENDERER)[tv_symbol]
+    if isinstance(screenshot, Exception):
+        raise screenshot
 
-    # --- 1) BSE Summaries (news) ---
-    try:
-        bse_result = summarize_announcements_for_stock(
-            stock_identifier=bse_identifier,
-            days=60,
-            max_news=3,
-        )
-        cache_data["bse_summaries"] = bse_result
-    except Exception as e:
-        cache_data["bse_error"] = f"{e}"
+    # detect_chart_pattern returns a dict in our latest version
+    return detect_chart_pattern(screenshot)
 
-    # --- 2) Chart pattern (TradingView + Groq vision) ---
-    try:
-        charts_dir = "./charts"
-        os.makedirs(charts_dir, exist_ok=True)
 
-        safe_symbol = tv_symbol.replace(":", "_").replace("/", "_")
-        output_path = os.path.join(charts_dir, f"{safe_symbol}_D.png")
+def _compute_ratios(mapping: Dict[str, str]) -> Dict[str, float]:
+    with upstream_limit("yahoo"):
+        ratios = get_ratios_for_ticker(mapping["yahoo"])
+    if ratios is None:
+        raise RuntimeError("No ratio data available")
+    return ratios
+
+
+def _compute_signal(mapping: Dict[str, str], ratios: Dict[str, float]) -> Dict[str, Any]:
+    ctx = StockSignalInput(
+        ticker=mapping["yahoo"],
+        ratios=ratios,
+    )
+    signal = run_stock_signal(ctx)
+    return signal.model_dump()
+
+
+def refresh_symbol_analysis(
+    mapping: Dict[str, str],
+    force: bool = False,
+    chart_screenshot: Optional[str] = None,
+) -> List[str]:
+    """
+    Bring stock_analysis/{yahoo_symbol} up to date for one symbol.
+
+    Only components that are missing, failed last time or older than their TTL
+    are recomputed, so an already-fresh symbol costs zero upstream calls.
+    The signal is recomputed whenever ratios are, since it is derived from them.
 
-        screenshot_path = get_tradingview_chart_screenshot(
-            tv_symbol=tv_symbol,
-            interval="D",
-            output_path=output_path,
+    BSE summaries, chart pattern and ratios run in parallel, each bounded by
+    its STAGE_TIMEOUTS entry; the signal stage starts once ratios are in.
+    Wall time is therefore about the slowest stage, not the sum. A stage
+    that times out is recorded as failed at its deadline, but the call only
+    returns once it has stopped.
+
+    `chart_screenshot` lets batch callers pass in an already captured chart.
+
+    Returns the list of components that were recomputed.
+    """
+    analysis_ref = db.collection(ANALYSIS_COLLECTION).document(mapping["yahoo"])
+    snap = analysis_ref.get()
+    analysis = (snap.to_dict() or {}) if snap.exists else {}
+
+    now = time.time()
+    stale = [
+        component
+        for component in ANALYSIS_TTLS
+        if force or not _analysis_is_fresh(analysis, component, now)
+    ]
+    if "ratios" in stale and "signal" not in stale:
+        stale.append("signal")
+
+    if not stale:
+        return []
+
+    analysis_ref.set(
+        {
+            "symbol": mapping["yahoo"],
+            "raw_symbol": mapping["raw"],
+            "base_symbol": mapping["base"],
+            "tv_symbol": mapping["tv"],
+            "bse_identifier": mapping["bse_identifier"],
+            "isin": mapping.get("isin"),
+            "company_name": mapping.get("name"),
+            "updatedAt": SERVER_TIMESTAMP,
+        },
+        merge=True,
+    )
+
+    # Each stage saves its own result as soon as it finishes, so the dashboard
+    # sees partial data even while a slower stage (or a timed-out one) lags.
+    def _save(component: str, value: Any):
+        analysis_ref.set(
+            {
+                component: value,
+                ANALYSIS_ERROR_FIELDS[component]: DELETE_FIELD,
+                "fetchedAt": {component: time.time()},
+                "updatedAt": SERVER_TIMESTAMP,
+            },
+            merge=True,
         )
 
-        raw_pattern = detect_chart_pattern(screenshot_path)
+    def _save_error(component: str, error: str):
+        # Leave fetchedAt untouched so the next request retries it
+        analysis_ref.set(
+            {
+                ANALYSIS_ERROR_FIELDS[component]: error,
+                "updatedAt": SERVER_TIMESTAMP,
+            },
+            merge=True,
+        )
 
-        # detect_chart_pattern returns a dict in our latest version
-        cache_data["chart_pattern"] = raw_pattern
-    except Exception as e:
-        cache_data["chart_error"] = f"{e}"
+    def _stage(component: str, compute):
+        value = compute()
+        _save(component, value)
+        return value
 
-    # --- 3) Financial ratios (Yahoo) ---
+    def _await(component: str, future, started: float):
+        remaining = started + STAGE_TIMEOUTS[component] - time.monotonic()
+        try:
+            return future.result(timeout=max(0.0, remaining))
+        except FuturesTimeoutError:
+            _save_error(component, f"Timed out after {STAGE_TIMEOUTS[component]:.0f}s")
+        except Exception as e:
+            _save_error(component, f"{e}")
+        return None
+
+    stage_computes = {
+        # 1) BSE news
+        "bse_summaries": lambda: _compute_bse_summaries(mapping),
+        # 2) TradingView + vision
+        "chart_pattern": lambda: _compute_chart_pattern(mapping, chart_screenshot),
+        # 3) Yahoo ratios
+        "ratios": lambda: _compute_ratios(mapping),
+    }
+
+    executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="stage")
     try:
-        ratios = get_ratios_for_ticker(yahoo_symbol)
-        if ratios is not None:
-            cache_data["ratios"] = ratios
+        # --- 1-3) Independent stages run concurrently ---
+        started = time.monotonic()
+        futures = {
+            component: executor.submit(_stage, component, compute)
+            for component, compute in stage_computes.items()
+            if component in stale
+        }
+
+        # --- 4) Agentic prediction starts as soon as ratios arrive ---
+        if "ratios" in futures:
+            ratios = _await("ratios", futures.pop("ratios"), started)
         else:
-            cache_data["ratios_error"] = "No ratio data available"
-    except Exception as e:
-        cache_data["ratios_error"] = f"{e}"
-        ratios = None
+            ratios = analysis.get("ratios")
 
-    # --- 4) Agentic prediction (only if ratios available) ---
-    try:
-        if "ratios" in cache_data:
-            ctx = StockSignalInput(
-                ticker=yahoo_symbol,
-                ratios=cache_data["ratios"],
+        if "signal" in stale and isinstance(ratios, dict):
+            signal_started = time.monotonic()
+            signal_future = executor.submit(
+                _stage, "signal", lambda: _compute_signal(mapping, ratios)
             )
-            signal = run_stock_signal(ctx)
-            cache_data["signal"] = signal.model_dump()
-    except Exception as e:
-        cache_data["signal_error"] = f"{e}"
+            _await("signal", signal_future, signal_started)
+
+        for component, future in futures.items():
+            _await(component, future, started)
+    finally:
+        # A timed-out stage has its error saved, but it keeps running and its
+        # late result is still saved. Wait for it here so the cache job (and
+        # its per-symbol key) stays held until the work really stops;
+        # otherwise a re-submit would start a second copy next to it.
+        executor.shutdown(wait=True, cancel_futures=True)
 
-    # --- 5) Save to Firestore ---
-    cache_ref.set(cache_data, merge=True)
+    return stale
+
+
+def compute_and_cache_stock_for_user(uid: str, symbol: str, force: bool = False):
+    """
+    For a given user + stock symbol:
+    - refresh the shared stock_analysis/{yahoo_symbol} doc (stale components only)
+    - point users/{uid}/stock_cache/{yahoo_symbol} at it
+    """
+    mapping = normalize_symbol(symbol)
+    link_stock_cache_for_user(uid, mapping)
+    refresh_symbol_analysis(mapping, force=force)
+
+
+def link_stock_cache_for_user(uid: str, mapping: Dict[str, str]):
+    """
+    Write the per-user cache entry. It carries no analysis data itself,
+    only a reference to the shared symbol-level document.
+    """
+    yahoo_symbol = mapping["yahoo"]
+    cache_ref = (
+        db.collection("users")
+        .document(uid)
+        .collection("stock_cache")
+        .document(yahoo_symbol)
+    )
+    cache_ref.set(
+        {
+            "symbol": yahoo_symbol,
+            "raw_symbol": mapping["raw"],
+            "base_symbol": mapping["base"],
+            "tv_symbol": mapping["tv"],
+            "bse_identifier": mapping["bse_identifier"],
+            "isin": mapping.get("isin"),
+            "company_name": mapping.get("name"),
+            "analysisRef": f"{ANALYSIS_COLLECTION}/{yahoo_symbol}",
+            "updatedAt": SERVER_TIMESTAMP,
+        }
+    )
 
 
 # ======================== MAIN ================================
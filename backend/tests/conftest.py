@@ -0,0 +1,15 @@
+# tests/conftest.py
+
+import os
+import sys
+import tempfile
+
+# Run from backend/: `python -m pytest -q`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Modules read these at import time; tests never call the real services
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+# Some modules create ./downloads, ./charts etc. on import; keep test runs
+# out of the working tree
+os.chdir(tempfile.mkdtemp(prefix="backend-tests-"))
@@ -0,0 +1,303 @@
+# tests/test_bse_news.py
+
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("bse")
+pytest.importorskip("PyPDF2")
+pytest.importorskip("agno")
+
+from functions import announcement_store, batch_executor, bse_news  # noqa: E402
+from functions.security_master import SecurityMaster  # noqa: E402
+
+
+class FakeBSE:
+    """
+    Announcements listing with BSE's paging contract: newest first,
+    `page_size` rows per page, Table1 carries the total row count.
+    """
+
+    def __init__(self, rows, page_size=2):
+        self.rows = rows
+        self.page_size = page_size
+        self.requests = []
+
+    def announcements(self, page_no, from_date, to_date, scripcode):
+        self.requests.append((page_no, from_date, to_date))
+        matching = sorted(
+            (
+                r for r in self.rows
+                if from_date <= announcement_store.parse_news_dt(r) <= to_date
+            ),
+            key=lambda r: r["NEWS_DT"],
+            reverse=True,
+        )
+        start = (page_no - 1) * self.page_size
+        return {
+            "Table": matching[start:start + self.page_size],
+            "Table1": [{"ROWCNT": len(matching)}],
+        }
+
+
+def _row(news_id, dt):
+    return {
+        "NEWSID": news_id,
+        "NEWS_DT": dt.isoformat(),
+        "ATTACHMENTNAME": f"{news_id}.pdf",
+        "HEADLINE": f"Filing {news_id}",
+    }
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(announcement_store, "ANNOUNCEMENT_DB", str(tmp_path / "ann.sqlite"))
+
+
+def test_delta_that_runs_out_of_pages_leaves_no_gap(store, monkeypatch):
+    now = datetime.now().replace(microsecond=0)
+    old = [_row(f"old{i}", now - timedelta(days=20, hours=i)) for i in range(4)]
+    fake = FakeBSE(old)
+    monkeypatch.setattr(bse_news, "get_bse_client", lambda: fake)
+
+    ids = lambda rows: {r["NEWSID"] for r in rows}
+    assert ids(bse_news.fetch_announcements_for_code("500325", max_pages=10)) == ids(old)
+
+    # Ten new filings, but a delta may read only 2 pages (4 rows)
+    new = [_row(f"new{i}", now - timedelta(days=5, hours=i)) for i in range(10)]
+    fake.rows = old + new
+
+    for _ in range(5):
+        rows = bse_news.fetch_announcements_for_code("500325", max_pages=2)
+    assert ids(rows) == ids(old + new)
+
+
+def test_empty_first_sync_still_picks_up_new_filings(store, monkeypatch):
+    now = datetime.now().replace(microsecond=0)
+    fake = FakeBSE([])
+    monkeypatch.setattr(bse_news, "get_bse_client", lambda: fake)
+
+    assert bse_news.fetch_announcements_for_code("500325") == []
+
+    fake.rows = [_row("new0", now - timedelta(minutes=5))]
+    fake.requests.clear()
+
+    rows = bse_news.fetch_announcements_for_code("500325")
+    assert [r["NEWSID"] for r in rows] == ["new0"]
+    assert fake.requests
+
+
+class FakeScripCodeBSE:
+    def __init__(self, codes):
+        self.codes = codes
+        self.calls = []
+
+    def getScripCode(self, identifier):
+        self.calls.append(identifier)
+        if identifier not in self.codes:
+            raise ValueError(f"{identifier} not found")
+        return self.codes[identifier]
+
+
+@pytest.fixture
+def scripcodes(tmp_path, monkeypatch):
+    master = tmp_path / "master-stock.json"
+    master.write_text(json.dumps([
+        {
+            "id": "RELIANCE#",
+            "nse_symbol": "NSE:RELIANCE#",
+            "bse_scripcode": "500325",
+            "isin": "INE002A01018",
+            "issuer_name": "Reliance Industries Ltd.",
+        },
+    ]))
+    monkeypatch.setattr(bse_news, "security_master", SecurityMaster(str(master)))
+
+    fake = FakeScripCodeBSE({"INFY": "500209"})
+    monkeypatch.setattr(bse_news, "get_bse_client", lambda: fake)
+    monkeypatch.setattr(bse_news, "_scripcode_cache", {})
+    return fake
+
+
+def test_resolve_scripcode_reliance_from_master(scripcodes):
+    for identifier in ("RELIANCE", "reliance", "INE002A01018", "Reliance Industries Limited"):
+        assert bse_news.resolve_scripcode(identifier) == "500325", identifier
+    assert scripcodes.calls == []
+
+
+def test_resolve_scripcode_asks_bse_only_for_master_misses(scripcodes):
+    assert bse_news.resolve_scripcode("INFY") == "500209"
+    assert bse_news.resolve_scripcode("infy") == "500209"
+    # Second lookup is served from the cache
+    assert scripcodes.calls == ["INFY"]
+
+
+def test_resolve_scripcode_passes_numeric_codes_through(scripcodes):
+    assert bse_news.resolve_scripcode(" 500325 ") == "500325"
+    assert scripcodes.calls == []
+
+
+def test_concurrent_summaries_keep_feed_order_and_selection(monkeypatch):
+    now = datetime.now()
+    rows = [_row(f"n{i}", now - timedelta(hours=i)) for i in range(8)]
+    rows[1]["ATTACHMENTNAME"] = ""  # no PDF: never a candidate
+
+    monkeypatch.setattr(bse_news, "resolve_scripcode", lambda identifier: "500325")
+    monkeypatch.setattr(bse_news, "fetch_announcements_for_code", lambda *a, **k: rows)
+    monkeypatch.setattr(bse_news, "FILING_WORKERS_PER_STOCK", 2)
+
+    def pdf_text(attach_name):
+        if attach_name == "n3.pdf":
+            raise RuntimeError("404")
+        # Empty text: skipped and replaced by the next candidate
+        return ("" if attach_name == "n2.pdf" else "text"), f"https://x/{attach_name}"
+
+    monkeypatch.setattr(bse_news, "get_pdf_text_from_attachment", pdf_text)
+    monkeypatch.setattr(
+        bse_news,
+        "summarize_with_groq",
+        lambda text, heading, date, url, attach_name=None: f"Title: {attach_name}",
+    )
+
+    result = bse_news.summarize_announcements_for_stock("RELIANCE", max_news=4, batch=False)
+
+    assert [n["attachment_name"] for n in result["news"]] == ["n0.pdf", "n3.pdf", "n4.pdf", "n5.pdf"]
+    assert [n["index"] for n in result["news"]] == [1, 4, 5, 6]
+    assert result["news"][1]["error"] == "Error summarizing: 404"
+    assert result["news"][0] == {
+        "index": 1,
+        "heading": result["news"][0]["heading"],
+        "date": result["news"][0]["date"],
+        "pdf_url": "https://x/n0.pdf",
+        "summary": "Title: n0.pdf",
+        "attachment_name": "n0.pdf",
+    }
+
+
+def _block(number, title="Board meeting", bullets=("- Approved results",)):
+    return f"=== FILING {number} ===\nTitle: {title}\n\nSummary:\n" + "\n".join(bullets) + "\n"
+
+
+def test_parse_batch_summaries_maps_each_block():
+    text = "Here you go:\n" + _block(2, "Dividend") + _block(1)
+
+    parsed = bse_news._parse_batch_summaries(text, 2)
+
+    assert parsed == {
+        1: "Title: Board meeting\n\nSummary:\n- Approved results",
+        2: "Title: Dividend\n\nSummary:\n- Approved results",
+    }
+
+
+def test_parse_batch_summaries_leaves_out_missing_and_out_of_range_blocks():
+    parsed = bse_news._parse_batch_summaries(_block(1) + _block(4), 3)
+    assert set(parsed) == {1}
+
+
+def test_parse_batch_summaries_drops_duplicated_numbers():
+    text = _block(1, "First") + _block(1, "Second") + _block(2)
+    assert set(bse_news._parse_batch_summaries(text, 2)) == {2}
+
+
+def test_parse_batch_summaries_rejects_incomplete_blocks():
+    no_title = "=== FILING 1 ===\nSummary:\n- Something\n"
+    no_summary = "=== FILING 2 ===\nTitle: Something\n- Something\n"
+    no_bullets = _block(3, bullets=("Nothing to report",))
+
+    assert bse_news._parse_batch_summaries(no_title + no_summary + no_bullets, 3) == {}
+
+
+def test_parse_batch_summaries_handles_empty_reply():
+    assert bse_news._parse_batch_summaries("", 2) == {}
+    assert bse_news._parse_batch_summaries(None, 2) == {}
+
+
+def test_batch_summaries_are_cached_apart_from_single_mode(monkeypatch):
+    cache = {}
+    monkeypatch.setattr(bse_news, "get_summary", cache.get)
+    monkeypatch.setattr(bse_news, "put_summary", cache.__setitem__)
+    monkeypatch.setattr(
+        bse_news,
+        "_summarize_batch_uncached",
+        lambda group: {i: f"Title: Batch {i}\n\nSummary:\n- x" for i in range(len(group))},
+    )
+    filings = [
+        {
+            "pdf_text": f"filing text {n}",
+            "heading": f"Heading {n}",
+            "news_date": "01-Jan-2025",
+            "pdf_url": f"https://example.com/{n}.pdf",
+            "attach_name": f"{n}.pdf",
+        }
+        for n in range(2)
+    ]
+
+    results = bse_news.summarize_filings(filings)
+
+    assert all("Batch" in r for r in results)
+    assert all(key[3] == bse_news.BATCH_SUMMARY_PROMPT_VERSION for key in cache)
+    for filing in filings:
+        prompt = bse_news._summary_prompt(filing["pdf_text"], filing["heading"], filing["news_date"])
+        assert bse_news._summary_cache_key(prompt, filing["attach_name"]) not in cache
+
+
+def test_batch_mode_reuses_single_mode_answers(monkeypatch):
+    filing = {
+        "pdf_text": "filing text",
+        "heading": "Heading",
+        "news_date": "01-Jan-2025",
+        "pdf_url": "https://example.com/a.pdf",
+        "attach_name": "a.pdf",
+    }
+    prompt = bse_news._summary_prompt(filing["pdf_text"], filing["heading"], filing["news_date"])
+    cache = {bse_news._summary_cache_key(prompt, "a.pdf"): "Title: Single\n\nSummary:\n- x"}
+    monkeypatch.setattr(bse_news, "get_summary", cache.get)
+    monkeypatch.setattr(bse_news, "put_summary", cache.__setitem__)
+
+    [result] = bse_news.summarize_filings([filing])
+
+    assert result.startswith("Title: Single")
+
+
+class FakePdfResponse:
+    status_code = 200
+    headers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def iter_content(self, chunk_size):
+        yield b"%PDF-1.4 fake"
+
+
+def test_pdf_is_parsed_after_the_bse_slot_is_released(monkeypatch):
+    held_while = {}
+
+    def bse_held():
+        return "bse" in (getattr(batch_executor._held, "names", None) or set())
+
+    def put_pdf(attach_name, url, pdf_file):
+        held_while["store"] = bse_held()
+
+    def extract(pdf_file, max_chars):
+        held_while["parse"] = bse_held()
+        return "text", True
+
+    monkeypatch.setattr(bse_news.requests, "get", lambda *a, **k: FakePdfResponse())
+    monkeypatch.setattr(bse_news.filing_store, "get_url", lambda attach_name: None)
+    monkeypatch.setattr(bse_news.filing_store, "put_pdf", put_pdf)
+    monkeypatch.setattr(bse_news, "_extract_pdf_text", extract)
+    monkeypatch.setattr(
+        bse_news.tempfile, "SpooledTemporaryFile", lambda max_size, dir: io.BytesIO()
+    )
+
+    text, complete, url = bse_news._download_pdf_text("a.pdf", 1000)
+
+    assert (text, complete) == ("text", True)
+    assert url.endswith("AttachLive/a.pdf")
+    assert held_while == {"store": False, "parse": False}
@@ -0,0 +1,192 @@
+# tests/test_chart_prediction.py
+
+import json
+
+import pytest
+
+pytest.importorskip("agno")
+
+from functions import chart_prediction as cp  # noqa: E402
+from functions.pattern_cache import PatternCache  # noqa: E402
+
+
+# --------------------------------------------------------------------
+# Local parsing of vision output
+# --------------------------------------------------------------------
+
+def test_extract_json_object_ignores_surrounding_text_and_string_braces():
+    text = 'Sure! {"pattern_name": "Cup {and} Handle", "n": {"x": 1}} trailing'
+    assert cp._extract_json_object(text) == '{"pattern_name": "Cup {and} Handle", "n": {"x": 1}}'
+
+
+def test_extract_json_object_closes_truncated_output():
+    assert cp._extract_json_object('{"a": {"b": 1') == '{"a": {"b": 1}}'
+    assert cp._extract_json_object("no json here") is None
+
+
+def test_repair_json_fixes_near_json():
+    block = "{'pattern_found': True, 'pattern_name': None, 'confidence': 'high',}"
+    assert cp._repair_json(block) == (
+        '{"pattern_found": true, "pattern_name": null, "confidence": "high"}'
+    )
+    assert cp._repair_json("{“a”: [1, 2,]}") == '{"a": [1, 2]}'
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("High", "high"),
+        ("medium", "moderate"),
+        ("Very-Low", "low"),
+        ("strong confidence", "high"),
+        ("85%", "high"),
+        (0.5, "moderate"),
+        (20, "low"),
+        (True, None),
+        (150, None),
+        ("unsure", None),
+        (None, None),
+    ],
+)
+def test_normalize_confidence(value, expected):
+    assert cp._normalize_confidence(value) == expected
+
+
+def test_parse_pattern_output_accepts_prose_and_sloppy_json():
+    text = (
+        "Here is the result:\n"
+        "{'pattern_found': 'yes', 'pattern_name': ' Double Bottom ', "
+        "'confidence': 0.82, 'explanation': 'Two equal lows.',}"
+    )
+    assert cp.parse_pattern_output(text) == {
+        "pattern_found": True,
+        "pattern_name": "Double Bottom",
+        "confidence": "high",
+        "explanation": "Two equal lows.",
+    }
+
+
+def test_parse_pattern_output_defaults_name_when_nothing_found():
+    text = '{"pattern_found": false, "pattern_name": null, "confidence": "low", "explanation": "Sideways."}'
+    assert cp.parse_pattern_output(text)["pattern_name"] == "None"
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "no json",
+        '{"pattern_found": "maybe", "pattern_name": "Flag", "confidence": "high", "explanation": "x"}',
+        '{"pattern_found": true, "pattern_name": "", "confidence": "high", "explanation": "x"}',
+        '{"pattern_found": true, "pattern_name": "Flag", "confidence": "unsure", "explanation": "x"}',
+        '{"pattern_found": true, "pattern_name": "Flag", "confidence": "high"}',
+    ],
+)
+def test_parse_pattern_output_leaves_bad_output_to_the_agent(text):
+    assert cp.parse_pattern_output(text) is None
+
+
+# --------------------------------------------------------------------
+# Batched vision mode
+# --------------------------------------------------------------------
+
+def _entry(chart, symbol=None, name="Flag"):
+    entry = {
+        "chart": chart,
+        "pattern_found": True,
+        "pattern_name": name,
+        "confidence": "high",
+        "explanation": "Tight consolidation after a sharp move.",
+    }
+    if symbol is not None:
+        entry["symbol"] = symbol
+    return entry
+
+
+def test_parse_batch_output_matches_by_number_and_symbol():
+    labels = ["NSE:TCS", "NSE:INFY", "NSE:SBIN"]
+    text = json.dumps({"results": [
+        _entry(1, "nse:tcs"),
+        _entry(2, "NSE:WRONG"),  # symbol does not match chart 2
+        _entry(3),               # symbol is optional
+        _entry(4, "NSE:EXTRA"),  # out of range
+    ]})
+
+    parsed = cp._parse_batch_output(text, labels)
+
+    assert set(parsed) == {"NSE:TCS", "NSE:SBIN"}
+    assert parsed["NSE:TCS"]["pattern_name"] == "Flag"
+
+
+def test_parse_batch_output_drops_duplicates_and_invalid_entries():
+    labels = ["A", "B", "C"]
+    text = json.dumps({"results": [
+        _entry(1, name="Flag"),
+        _entry(1, name="Pennant"),
+        {**_entry(2), "confidence": "unsure"},
+        "not an entry",
+        _entry(3),
+    ]})
+    assert set(cp._parse_batch_output(text, labels)) == {"C"}
+    assert cp._parse_batch_output("no json", labels) == {}
+    assert cp._parse_batch_output('{"results": "nope"}', labels) == {}
+
+
+@pytest.fixture
+def charts(tmp_path, monkeypatch):
+    monkeypatch.setattr(cp, "pattern_cache", PatternCache(str(tmp_path / "patterns.sqlite")))
+    paths = {}
+    for label in ("NSE:A", "NSE:B", "NSE:C"):
+        path = tmp_path / f"{label.replace(':', '_')}.png"
+        path.write_bytes(label.encode())
+        paths[label] = str(path)
+    return paths
+
+
+def _pattern(name):
+    return {"pattern_found": True, "pattern_name": name, "confidence": "high", "explanation": "x"}
+
+
+def test_detect_chart_patterns_falls_back_to_single_mode(charts, monkeypatch):
+    batches, singles = [], []
+
+    def batch(group):
+        batches.append([label for label, _ in group])
+        # The model skipped NSE:B
+        return {label: _pattern(f"batch {label}") for label, _ in group if label != "NSE:B"}
+
+    def single(path):
+        singles.append(path)
+        return _pattern("single")
+
+    monkeypatch.setattr(cp, "VISION_BATCH_SIZE", 3)
+    monkeypatch.setattr(cp, "_detect_batch_uncached", batch)
+    monkeypatch.setattr(cp, "detect_chart_pattern", single)
+
+    results = cp.detect_chart_patterns(charts)
+
+    assert batches == [["NSE:A", "NSE:B", "NSE:C"]]
+    assert singles == [charts["NSE:B"]]
+    assert results["NSE:A"]["pattern_name"] == "batch NSE:A"
+    assert results["NSE:B"]["pattern_name"] == "single"
+
+    # Batched answers are cached; single-mode answers are cached by
+    # detect_chart_pattern itself
+    assert cp.pattern_cache.get(cp._cache_key(charts["NSE:C"]))["pattern_name"] == "batch NSE:C"
+    assert cp.pattern_cache.get(cp._cache_key(charts["NSE:B"])) is None
+
+
+def test_detect_chart_patterns_retries_a_failed_batch_one_by_one(charts, monkeypatch):
+    def batch(group):
+        raise RuntimeError("vision request failed")
+
+    monkeypatch.setattr(cp, "VISION_BATCH_SIZE", 2)
+    monkeypatch.setattr(cp, "_detect_batch_uncached", batch)
+    monkeypatch.setattr(cp, "detect_chart_pattern", lambda path: _pattern(path))
+
+    results = cp.detect_chart_patterns({**charts, "NSE:MISSING": "/does/not/exist.png"})
+
+    # Two charts in a failed batch, one lone chart: all three go single
+    assert {label: r["pattern_name"] for label, r in results.items() if isinstance(r, dict)} == {
+        label: path for label, path in charts.items()
+    }
+    assert isinstance(results["NSE:MISSING"], OSError)
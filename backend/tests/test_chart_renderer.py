@@ -0,0 +1,127 @@
+# tests/test_chart_renderer.py
+
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+from functions import chart_renderer
+from functions.chart_renderer import (
+    BACKGROUND,
+    DOWN,
+    UP,
+    draw_candlesticks,
+    encode_png,
+    render_candlestick_chart,
+)
+
+
+def _ohlcv():
+    # Alternating up / down candles on a rising trend
+    n = 20
+    base = np.arange(n, dtype=float) + 100
+    up = np.arange(n) % 2 == 0
+    return {
+        "time": np.arange(n),
+        "open": np.where(up, base, base + 2),
+        "high": base + 3,
+        "low": base - 1,
+        "close": np.where(up, base + 2, base),
+        "volume": np.full(n, 1000.0),
+    }
+
+
+def _decode_png(data: bytes) -> np.ndarray:
+    """
+    Decode the encoder's own output (8-bit RGB, filter 0 on every row).
+    """
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+    pos, chunks = 8, {}
+    while pos < len(data):
+        (length,) = struct.unpack(">I", data[pos:pos + 4])
+        tag, body = data[pos + 4:pos + 8], data[pos + 8:pos + 8 + length]
+        (crc,) = struct.unpack(">I", data[pos + 8 + length:pos + 12 + length])
+        assert crc == zlib.crc32(tag + body) & 0xFFFFFFFF
+        chunks[tag] = chunks.get(tag, b"") + body
+        pos += 12 + length
+
+    width, height, depth, color_type = struct.unpack(">IIBB", chunks[b"IHDR"][:10])
+    assert (depth, color_type) == (8, 2)
+    assert b"IEND" in chunks
+
+    raw = np.frombuffer(zlib.decompress(chunks[b"IDAT"]), dtype=np.uint8)
+    rows = raw.reshape(height, 1 + width * 3)
+    assert not rows[:, 0].any()
+    return rows[:, 1:].reshape(height, width, 3)
+
+
+def test_draw_candlesticks_colours_up_and_down_candles():
+    img = draw_candlesticks(_ohlcv(), width=400, height=300)
+
+    assert img.shape == (300, 400, 3)
+    assert img.dtype == np.uint8
+    assert (img == BACKGROUND).all(axis=2).any()
+    assert (img == UP).all(axis=2).any()
+    assert (img == DOWN).all(axis=2).any()
+
+
+def test_draw_candlesticks_is_deterministic():
+    first = draw_candlesticks(_ohlcv(), width=400, height=300)
+    second = draw_candlesticks(_ohlcv(), width=400, height=300)
+    assert np.array_equal(first, second)
+
+
+def test_encode_png_round_trips_pixels():
+    img = draw_candlesticks(_ohlcv(), width=200, height=120)
+    assert np.array_equal(_decode_png(encode_png(img)), img)
+
+
+def test_encode_png_is_readable_by_pillow():
+    Image = pytest.importorskip("PIL.Image")
+    import io
+
+    img = draw_candlesticks(_ohlcv(), width=200, height=120)
+    with Image.open(io.BytesIO(encode_png(img))) as decoded:
+        assert decoded.size == (200, 120)
+        assert decoded.mode == "RGB"
+        assert np.array_equal(np.asarray(decoded), img)
+
+
+def test_render_candlestick_chart_writes_png_without_network(tmp_path, monkeypatch):
+    ohlcv = _ohlcv()
+    monkeypatch.setattr(chart_renderer, "load_ohlcv", lambda *args, **kwargs: ohlcv)
+
+    out = render_candlestick_chart("TEST.NS", "D", str(tmp_path / "charts" / "test.png"))
+
+    with open(out, "rb") as f:
+        pixels = _decode_png(f.read())
+    assert pixels.shape == (chart_renderer.CHART_HEIGHT, chart_renderer.CHART_WIDTH, 3)
+    assert np.array_equal(pixels, draw_candlesticks(ohlcv))
+
+
+def test_load_ohlcv_reads_local_parquet(tmp_path, monkeypatch):
+    pd = pytest.importorskip("pandas")
+    pytest.importorskip("pyarrow")
+
+    ohlcv = _ohlcv()
+    pd.DataFrame(
+        {
+            "Open": ohlcv["open"],
+            "High": ohlcv["high"],
+            "Low": ohlcv["low"],
+            "Close": ohlcv["close"],
+            "Volume": ohlcv["volume"],
+        }
+    ).to_parquet(tmp_path / "TEST.NS_D.parquet")
+    monkeypatch.setattr(chart_renderer, "CHART_OHLCV_DIR", str(tmp_path))
+
+    loaded = chart_renderer.load_ohlcv("TEST.NS", "D", bars=5)
+
+    assert np.array_equal(loaded["close"], ohlcv["close"][-5:])
+    assert np.array_equal(loaded["volume"], ohlcv["volume"][-5:])
+
+
+def test_load_ohlcv_rejects_unknown_interval():
+    with pytest.raises(ValueError):
+        chart_renderer.load_ohlcv("TEST.NS", "7")
@@ -0,0 +1,65 @@
+# tests/test_filing_store.py
+
+import io
+import os
+import threading
+
+import pytest
+
+from functions import filing_store
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(filing_store, "FILING_STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(filing_store, "FILING_STORE_DB", str(tmp_path / "index.sqlite"))
+    monkeypatch.setattr(filing_store, "FILING_STORE_MAX_BYTES", 1000)
+    return tmp_path
+
+
+def test_text_and_pdf_round_trip(store):
+    path = filing_store.put_pdf("a.pdf", "https://x/AttachLive/a.pdf", io.BytesIO(b"%PDF-1"))
+    filing_store.put_text("a.pdf", "https://x/AttachLive/a.pdf", "hello", 100, complete=True)
+
+    assert open(path, "rb").read() == b"%PDF-1"
+    assert filing_store.get_text("a.pdf", 50) == {"text": "hello", "url": "https://x/AttachLive/a.pdf"}
+    assert filing_store.get_url("a.pdf") == "https://x/AttachLive/a.pdf"
+
+
+def test_incomplete_text_needs_enough_budget(store):
+    filing_store.put_text("a.pdf", "u", "x" * 10, 10, complete=False)
+    assert filing_store.get_text("a.pdf", 10)["text"] == "x" * 10
+    assert filing_store.get_text("a.pdf", 20) is None
+
+
+def test_text_writes_count_towards_the_size_limit(store):
+    pdf = filing_store.put_pdf("old.pdf", "u", io.BytesIO(b"p" * 400))
+    filing_store.put_text("old.pdf", "u", "t" * 200, 1000, complete=True)
+    # Only text is written from here on; the total must still stay bounded
+    filing_store.put_text("new.pdf", "u", "é" * 300, 1000, complete=True)  # 600 bytes
+
+    assert filing_store.get_text("old.pdf", 10) is None
+    assert not os.path.exists(pdf)
+    assert filing_store.get_text("new.pdf", 10) is not None
+
+
+def test_concurrent_access(store, monkeypatch):
+    monkeypatch.setattr(filing_store, "FILING_STORE_MAX_BYTES", 10 ** 6)
+    errors = []
+
+    def worker(n):
+        try:
+            for i in range(20):
+                name = f"{n}-{i}.pdf"
+                filing_store.put_text(name, "u", f"{n}/{i}", 100, complete=True)
+                assert filing_store.get_text(name, 100)["text"] == f"{n}/{i}"
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
@@ -0,0 +1,63 @@
+# tests/test_image_prep.py
+
+import threading
+
+import numpy as np
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+from functions import image_prep  # noqa: E402
+from functions.chart_renderer import draw_candlesticks, encode_png  # noqa: E402
+
+
+@pytest.fixture
+def chart(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_prep, "CHART_DERIVED_DIR", str(tmp_path / "derived"))
+    n = 30
+    base = np.arange(n, dtype=float) + 100
+    img = draw_candlesticks(
+        {
+            "open": base,
+            "high": base + 3,
+            "low": base - 1,
+            "close": base + 2,
+            "volume": np.full(n, 1000.0),
+        },
+        width=1600,
+        height=900,
+    )
+    path = tmp_path / "chart.png"
+    path.write_bytes(encode_png(img))
+    return str(path)
+
+
+def test_vision_profile_is_cropped_and_resized(chart):
+    out = image_prep.prepare_image(chart, "vision")
+
+    with Image.open(out) as img:
+        assert img.width == image_prep.VISION_IMAGE["max_width"]
+        assert img.format == "PNG"
+    # Second call reuses the derived file
+    assert image_prep.prepare_image(chart, "vision") == out
+
+
+def test_concurrent_callers_get_the_same_complete_file(chart):
+    results, errors = [], []
+
+    def worker():
+        try:
+            results.append(image_prep.prepare_image(chart, "thumbnail"))
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert len(set(results)) == 1
+    with Image.open(results[0]) as img:
+        assert img.width == image_prep.THUMBNAIL_IMAGE["max_width"]
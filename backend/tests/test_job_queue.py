@@ -0,0 +1,93 @@
+# tests/test_job_queue.py
+
+import threading
+import time
+
+from functions.job_queue import JOB_DONE, JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JobQueue
+
+
+def _wait_for(jobs, job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = jobs.get(job_id)
+        if job["status"] in (JOB_DONE, JOB_FAILED):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_same_key_is_deduplicated_while_in_flight():
+    jobs = JobQueue(workers=1, name="test")
+    release = threading.Event()
+    calls = []
+
+    def work(n):
+        calls.append(n)
+        release.wait(5)
+        return n
+
+    first = jobs.submit("RELIANCE.NS", work, 1)
+    second = jobs.submit("RELIANCE.NS", work, 2)
+    assert second["id"] == first["id"]
+    assert second["status"] in (JOB_QUEUED, JOB_RUNNING)
+
+    release.set()
+    assert _wait_for(jobs, first["id"])["result"] == 1
+    assert calls == [1]
+
+    # Once finished, the key is free again
+    third = jobs.submit("RELIANCE.NS", work, 3)
+    assert third["id"] != first["id"]
+    assert _wait_for(jobs, third["id"])["result"] == 3
+
+
+def test_failed_job_reports_error_and_frees_key():
+    jobs = JobQueue(workers=1, name="test")
+
+    def boom():
+        raise RuntimeError("upstream down")
+
+    job = _wait_for(jobs, jobs.submit("TCS.NS", boom)["id"])
+    assert job["status"] == JOB_FAILED
+    assert job["error"] == "upstream down"
+    assert jobs.latest_for_key("TCS.NS")["id"] == job["id"]
+    assert jobs.submit("TCS.NS", lambda: None)["id"] != job["id"]
+
+
+def test_workers_bound_concurrency():
+    jobs = JobQueue(workers=2, name="test")
+    lock = threading.Lock()
+    running, peak = [0], [0]
+
+    def work():
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+
+    submitted = [jobs.submit(f"S{i}", work) for i in range(6)]
+    for job in submitted:
+        _wait_for(jobs, job["id"])
+
+    assert peak[0] == 2
+    assert jobs.stats()[JOB_DONE] == 6
+    assert jobs.stats()["workers"] == 2
+
+
+def test_history_trim_keeps_in_flight_jobs():
+    jobs = JobQueue(workers=1, history=2, name="test")
+    finished = [_wait_for(jobs, jobs.submit(f"D{i}", lambda: None)["id"]) for i in range(3)]
+
+    release = threading.Event()
+    blocked = jobs.submit("BLOCKED", release.wait, 5)
+    waiting = jobs.submit("WAITING", lambda: None)
+
+    # Finished jobs went first; the running and queued ones are still known
+    assert jobs.get(finished[0]["id"]) is None
+    assert jobs.get(blocked["id"]) is not None
+    assert jobs.get(waiting["id"]) is not None
+
+    release.set()
+    _wait_for(jobs, waiting["id"])
@@ -0,0 +1,77 @@
+# tests/test_pattern_cache.py
+
+import pytest
+
+from functions.pattern_cache import PatternCache
+
+
+@pytest.fixture
+def make_cache(tmp_path):
+    def make(**kwargs):
+        return PatternCache(str(tmp_path / "patterns.sqlite"), **kwargs)
+    return make
+
+
+def _result(name):
+    return {"pattern_found": True, "pattern_name": name, "confidence": "high", "explanation": "x"}
+
+
+def test_get_put_and_stats(make_cache):
+    cache = make_cache()
+    key = ("sha-a", "vision-model", "2/abc")
+
+    assert cache.get(key) is None
+    cache.put(key, _result("Double Top"))
+    assert cache.get(key) == _result("Double Top")
+
+    stats = cache.stats()
+    assert (stats["misses"], stats["stores"], stats["memory_hits"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_key_includes_model_and_prompt_version(make_cache):
+    cache = make_cache()
+    cache.put(("sha-a", "model-1", "1"), _result("Double Top"))
+
+    assert cache.get(("sha-a", "model-2", "1")) is None
+    assert cache.get(("sha-a", "model-1", "2")) is None
+    assert cache.get(("sha-b", "model-1", "1")) is None
+
+
+def test_results_are_copies(make_cache):
+    cache = make_cache()
+    key = ("sha-a", "m", "1")
+    cache.put(key, _result("Flag"))
+
+    cache.get(key)["pattern_name"] = "changed"
+    assert cache.get(key)["pattern_name"] == "Flag"
+
+
+def test_memory_lru_falls_back_to_disk(make_cache):
+    cache = make_cache(memory_entries=2)
+    keys = [(f"sha-{i}", "m", "1") for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.put(key, _result(f"P{i}"))
+
+    # Oldest entry left memory but is still on disk
+    assert cache.get(keys[0]) == _result("P0")
+    stats = cache.stats()
+    assert stats["disk_hits"] == 1
+    assert stats["memory_entries"] == 2
+
+    # A new process (empty memory) reads the same database
+    assert make_cache().get(keys[2]) == _result("P2")
+
+
+def test_disk_evicts_least_recently_used(make_cache):
+    cache = make_cache(max_entries=2, memory_entries=0)
+    a, b, c = (("a", "m", "1"), ("b", "m", "1"), ("c", "m", "1"))
+    cache.put(a, _result("A"))
+    cache.put(b, _result("B"))
+    cache.get(a)  # a is now more recently used than b
+    cache.put(c, _result("C"))
+
+    assert cache.get(b) is None
+    assert cache.get(a) == _result("A")
+    assert cache.get(c) == _result("C")
+    assert cache.stats()["evictions"] == 1
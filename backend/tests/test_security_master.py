@@ -0,0 +1,96 @@
+# tests/test_security_master.py
+
+import json
+
+import pytest
+
+from functions import security_master as sm
+from functions.security_master import SecurityMaster, identifiers
+
+
+def _entry(symbol, scripcode, isin, name):
+    return {
+        "id": f"{symbol}#",
+        "bse_scripcode": scripcode,
+        "issuer_name": name,
+        "security_name": name,
+        "nse_symbol": f"NSE:{symbol}#",
+        "isin": isin,
+    }
+
+
+@pytest.fixture
+def master(tmp_path, monkeypatch):
+    path = tmp_path / "master-stock.json"
+    path.write_text(json.dumps([
+        _entry("RELIANCE", "500325", "INE002A01018", "Reliance Industries Ltd."),
+        _entry("TCS", "532540", "INE467B01029", "Tata Consultancy Services Ltd."),
+        _entry("BADCODE", "100999", "INE000X01010", "Bad Code Ltd."),
+    ]))
+    index = SecurityMaster(str(path))
+    index.load()
+    monkeypatch.setattr(sm, "security_master", index)
+    return index
+
+
+def test_lookup_by_scripcode_isin_symbol_and_name(master):
+    for identifier in ("500325", "INE002A01018", "NSE:RELIANCE", "reliance.ns", "RELIANCE#",
+                       "Reliance Industries Limited"):
+        assert master.lookup(identifier)["isin"] == "INE002A01018", identifier
+
+
+def test_invalid_scripcodes_are_not_used(master):
+    assert master.lookup("100999") is None
+    assert identifiers(master.lookup("BADCODE"))["scripcode"] is None
+
+
+def test_normalize_symbol_numeric_scripcode(master):
+    mapping = sm.normalize_symbol("500325")
+    assert mapping["yahoo"] == "RELIANCE.NS"
+    assert mapping["tv"] == "NSE:RELIANCE"
+    assert mapping["bse_identifier"] == "500325"
+    assert mapping["isin"] == "INE002A01018"
+
+
+def test_normalize_symbol_name_uses_master_scripcode(master):
+    assert sm.normalize_symbol("NSE:TCS")["bse_identifier"] == "532540"
+    # Bad master code: fall back to the symbol, resolved through BSE later
+    assert sm.normalize_symbol("BADCODE")["bse_identifier"] == "BADCODE"
+
+
+def test_normalize_symbol_unknown_numeric_code_uses_bse_yahoo_suffix(master):
+    mapping = sm.normalize_symbol("543999")
+    assert mapping["yahoo"] == "543999.BO"
+    assert mapping["bse_identifier"] == "543999"
+
+
+def test_normalize_symbol_heuristics_for_unknown_symbols(master):
+    assert sm.normalize_symbol("FOO.NS")["tv"] == "NSE:FOO"
+    assert sm.normalize_symbol("nse:foo")["yahoo"] == "FOO.NS"
+    assert sm.normalize_symbol("FOO")["bse_identifier"] == "FOO"
+
+
+def test_shipped_master_scripcodes_are_bse_codes():
+    # The frontend ships the same file; RELIANCE is 500325 on BSE
+    index = SecurityMaster()
+    try:
+        index.load()
+    except OSError:
+        pytest.skip("master-stock.json not present")
+    assert identifiers(index.lookup("NSE:RELIANCE"))["scripcode"] == "500325"
+    assert index.lookup("500325")["isin"] == "INE002A01018"
+    assert all(identifiers(e)["scripcode"] for e in index._entries)
+
+
+def test_search_pages_through_every_security(master):
+    first = master.search("", limit=2)
+    rest = master.search("", limit=2, offset=2)
+    symbols = [identifiers(e)["base"] for e in first + rest]
+    assert symbols == ["BADCODE", "RELIANCE", "TCS"]
+    assert master.search("", limit=2, offset=3) == []
+
+
+def test_search_offset_continues_the_ranking(master):
+    ranked = master.search("ANC", limit=10)
+    assert len(ranked) >= 2
+    assert master.search("ANC", limit=1, offset=1) == ranked[1:2]
@@ -0,0 +1,61 @@
+# tests/test_summary_cache.py
+
+import threading
+
+import pytest
+
+from functions import summary_cache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(summary_cache, "SUMMARY_CACHE_DB", str(tmp_path / "summaries.sqlite"))
+    monkeypatch.setattr(
+        summary_cache, "_stats", {"hits": 0, "misses": 0, "stores": 0, "invalidated": 0}
+    )
+    return summary_cache
+
+
+def test_get_put_and_stats(cache):
+    key = ("a.pdf", "sha", "model", "1")
+    assert cache.get_summary(key) is None
+    cache.put_summary(key, "Title: A")
+    assert cache.get_summary(key) == "Title: A"
+    # Any key part changing is a miss
+    assert cache.get_summary(("a.pdf", "sha", "model", "2")) is None
+
+    stats = cache.get_summary_cache_stats()
+    assert (stats["hits"], stats["misses"], stats["stores"], stats["entries"]) == (1, 2, 1, 1)
+
+
+def test_invalidate_filters(cache):
+    cache.put_summary(("a.pdf", "s1", "m1", "1"), "a")
+    cache.put_summary(("b.pdf", "s2", "m1", "1"), "b")
+    cache.put_summary(("b.pdf", "s2", "m2", "2"), "c")
+
+    assert cache.invalidate(attach_name="b.pdf", model="m1") == 1
+    assert cache.invalidate(prompt_version="2") == 1
+    assert cache.invalidate() == 1
+    assert cache.get_summary_cache_stats()["entries"] == 0
+
+
+def test_concurrent_access(cache):
+    errors = []
+
+    def worker(n):
+        try:
+            for i in range(20):
+                key = (f"{n}.pdf", str(i), "m", "1")
+                cache.put_summary(key, f"{n}/{i}")
+                assert cache.get_summary(key) == f"{n}/{i}"
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert cache.get_summary_cache_stats()["entries"] == 160
@@ -1,6 +1,6 @@
 "use client";
 
-import { useEffect, useState } from "react";
+import { useCallback, useEffect, useRef, useState } from "react";
 import { motion } from "framer-motion";
 import { Search, Heart } from "lucide-react";
 import Header from "../components/Header";
@@ -9,6 +9,9 @@ import Header from "../components/Header";
 const API_BASE =
   process.env.NEXT_PUBLIC_API_BASE_URL || "http://localhost:5000";
 
+// Stocks fetched per page from /symbols/search
+const PAGE_SIZE = 60;
+
 interface Stock {
   id: string;
   bse_scripcode: string;
@@ -24,6 +27,10 @@ interface Stock {
 export default function MarketOverview() {
   const [stocks, setStocks] = useState<Stock[]>([]);
   const [query, setQuery] = useState("");
+  const [nextOffset, setNextOffset] = useState<number | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  // Search a "load more" response belongs to; stale pages are dropped
+  const queryRef = useRef(query);
   const [wishlist, setWishlist] = useState<string[]>([]);
   const [loadingWishlist, setLoadingWishlist] = useState(false);
 
@@ -43,13 +50,61 @@ export default function MarketOverview() {
     return sym;
   };
 
-  // Load master JSON of all stocks
+  // One page of search results; empty query lists every stock by symbol
+  const fetchPage = useCallback(
+    (offset: number, signal?: AbortSignal) => {
+      const params = new URLSearchParams({
+        q: query.trim(),
+        limit: String(PAGE_SIZE),
+        offset: String(offset),
+      });
+      return fetch(`${API_BASE}/symbols/search?${params}`, { signal }).then((r) =>
+        r.json()
+      );
+    },
+    [query]
+  );
+
+  // Search stocks on the backend (debounced), starting from the first page
   useEffect(() => {
-    fetch("/data/master-stock.json")
-      .then((r) => r.json())
-      .then((data: Stock[]) => setStocks(data))
-      .catch((err) => console.error("Error loading master-stock.json", err));
-  }, []);
+    queryRef.current = query;
+    const controller = new AbortController();
+    const timer = setTimeout(() => {
+      fetchPage(0, controller.signal)
+        .then((data) => {
+          if (Array.isArray(data.results)) {
+            setStocks(data.results);
+            setNextOffset(data.next_offset ?? null);
+          }
+        })
+        .catch((err) => {
+          if (err.name !== "AbortError") {
+            console.error("Error searching stocks", err);
+          }
+        });
+    }, 150);
+
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
+  }, [fetchPage, query]);
+
+  const loadMore = () => {
+    if (nextOffset === null || loadingMore) return;
+    const requestQuery = query;
+    setLoadingMore(true);
+    fetchPage(nextOffset)
+      .then((data) => {
+        if (requestQuery !== queryRef.current) return;
+        if (Array.isArray(data.results)) {
+          setStocks((prev) => [...prev, ...data.results]);
+          setNextOffset(data.next_offset ?? null);
+        }
+      })
+      .catch((err) => console.error("Error loading more stocks", err))
+      .finally(() => setLoadingMore(false));
+  };
 
   // Load wishlist from backend on mount
   useEffect(() => {
@@ -136,14 +191,6 @@ export default function MarketOverview() {
     }
   };
 
-  const filtered = stocks.filter((s) => {
-    const q = query.toLowerCase();
-    return (
-      s.security_name.toLowerCase().includes(q) ||
-      s.nse_symbol.toLowerCase().includes(q)
-    );
-  });
-
   return (
     <>
     <Header />
@@ -183,7 +230,7 @@ export default function MarketOverview() {
       {/* GRID */}
       <div className="max-w-7xl mx-auto px-6 pb-24">
         <div className="grid sm:grid-cols-2 md:grid-cols-3 lg:grid-cols-4 gap-6">
-          {filtered.map((stock) => {
+          {stocks.map((stock) => {
             const yahooSymbol = toYahooSymbol(stock.nse_symbol);
             const isInWishlist = wishlist.includes(yahooSymbol);
 
@@ -288,6 +335,21 @@ export default function MarketOverview() {
             );
           })}
         </div>
+
+        {/* LOAD MORE */}
+        {nextOffset !== null && (
+          <div className="flex justify-center mt-10">
+            <button
+              onClick={loadMore}
+              disabled={loadingMore}
+              className="px-6 py-3 rounded-2xl bg-white border border-slate-200 text-slate-700 font-semibold
+                         shadow-[0_10px_40px_rgba(15,23,42,0.06)] hover:border-blue-300 hover:text-blue-600
+                         transition disabled:opacity-60 cursor-pointer"
+            >
+              {loadingMore ? "Loading…" : "Load more"}
+            </button>
+          </div>
+        )}
       </div>
     </div>
     </>